@@ -4,14 +4,27 @@ import argparse
 import json
 import shutil
 import logging
+import time
+import hashlib
+import threading
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, get_jwt_identity, get_jwt
 from werkzeug.utils import secure_filename
 
-from database.db import init_db, get_connection
-from database.attendance_db import mark_attendance_db
+from database import write_queue
+from database.archive import start_archive_scheduler
+from database.db import (
+    init_db,
+    get_connection,
+    open_request_connection,
+    close_request_connection,
+    rebuild_daily_stats,
+)
+from database.attendance_db import mark_student_attendance
+from database.query_profile import PROFILE_ENABLED, SLOW_QUERY_MS, STATS as QUERY_STATS
+from backend.embedding_jobs import EMBEDDING_MODELS, queue_student_embeddings
 from backend.auth import (
     authenticate_user,
     generate_token,
@@ -30,6 +43,7 @@ from modules.driver_manager import (
     get_driver_stats,
     get_daily_summary,
 )
+from face_engine.gallery_bundle import DTYPES as GALLERY_DTYPES, average_embeddings, encode_bundle
 from modules.alerts import send_boarded_alert_for_student, evaluate_not_boarded_alerts, send_absent_alerts_for_trip
 
 app = Flask(__name__)
@@ -40,6 +54,24 @@ jwt = JWTManager(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Started with the app so it also runs under gunicorn; off unless
+# ARCHIVE_INTERVAL_HOURS is set (see database/archive.py).
+start_archive_scheduler()
+
+
+@app.before_request
+def _open_db():
+    # One pooled connection per request; get_connection() in handlers and
+    # the modules they call borrows it instead of opening its own.
+    g.db = open_request_connection()
+
+
+@app.teardown_request
+def _close_db(error):
+    db = g.pop("db", None)
+    if db is not None:
+        close_request_connection(db)
+
 
 @jwt.invalid_token_loader
 def invalid_token_callback(error_string):
@@ -596,6 +628,9 @@ def approve_request(request_id):
             (reviewer, notes, request_id),
         )
         conn.commit()
+        if req["request_type"] == "STUDENT_ADD":
+            # Requests carry no photo today; embeds one if already uploaded.
+            queue_student_embeddings(student_id, os.path.join(UPLOAD_DIR, student_id))
         return jsonify({"status": "approved"}), 200
     finally:
         conn.close()
@@ -647,39 +682,10 @@ def mark_attendance():
     if not student_id:
         return jsonify({"error": "student_id missing"}), 400
 
-    conn = get_connection()
-    try:
-        student = conn.execute(
-            "SELECT id, bus_number FROM students WHERE student_id = ?", (student_id,)
-        ).fetchone()
-        if not student:
-            return jsonify({"error": "unknown student_id"}), 404
-
-        trip = None
-        if student["bus_number"]:
-            trip = conn.execute(
-                """
-                SELECT id, trip_type
-                FROM bus_trips
-                WHERE bus_number = ? AND status = 'ACTIVE'
-                ORDER BY started_at DESC
-                LIMIT 1
-                """,
-                (student["bus_number"],),
-            ).fetchone()
-    finally:
-        conn.close()
-
-    effective_trip_type = trip["trip_type"] if trip else "TO_HOME"
-    marked = mark_attendance_db(
-        student_id,
-        trip_id=trip["id"] if trip else None,
-        trip_type=effective_trip_type,
-        bus_number=student["bus_number"] if student else None,
-    )
-    if marked:
-        return jsonify({"status": "Attendance marked", "trip_type": effective_trip_type}), 200
-    return jsonify({"status": "Already marked today", "trip_type": effective_trip_type}), 200
+    result = mark_student_attendance(student_id)
+    if result is None:
+        return jsonify({"error": "unknown student_id"}), 404
+    return jsonify(result), 200
 
 
 @app.route("/attendance", methods=["GET"])
@@ -687,7 +693,7 @@ def get_attendance():
     conn = get_connection()
     try:
         rows = conn.execute(
-            "SELECT student_id, date, time, direction, trip_type FROM attendance ORDER BY date DESC, time DESC"
+            "SELECT student_id, date, time, direction, trip_type FROM attendance ORDER BY ts_epoch DESC, id DESC"
         ).fetchall()
     finally:
         conn.close()
@@ -795,6 +801,7 @@ def add_student():
             ),
         )
         conn.commit()
+        queue_student_embeddings(student_id, folder)
 
         # Create login account with default password if missing.
         default_password = "pass123"
@@ -847,12 +854,34 @@ def delete_student(student_id):
         if not exists:
             return jsonify({"error": "Student not found"}), 404
 
+        # daily_trip_stats is maintained by insert triggers only; recount the
+        # days this student contributed to once their rows are gone.
+        log_days = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT date(timestamp, 'localtime') FROM driver_logs WHERE student_id = ?",
+                (student_id,),
+            ).fetchall()
+        ]
+        attendance_days = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT date FROM attendance WHERE student_id = ?", (student_id,)
+            ).fetchall()
+        ]
+
         conn.execute("DELETE FROM attendance WHERE student_id = ?", (student_id,))
         conn.execute("DELETE FROM driver_logs WHERE student_id = ?", (student_id,))
+        conn.execute("DELETE FROM student_presence WHERE student_id = ?", (student_id,))
         conn.execute("DELETE FROM notifications WHERE student_id = ?", (student_id,))
         conn.execute("DELETE FROM trip_student_state WHERE student_id = ?", (student_id,))
+        conn.execute("DELETE FROM student_embeddings WHERE student_id = ?", (student_id,))
         conn.execute("DELETE FROM users WHERE student_id = ?", (student_id,))
         conn.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
+        for day in log_days:
+            rebuild_daily_stats(conn, day, day, attendance=False)
+        for day in attendance_days:
+            rebuild_daily_stats(conn, day, day, boarding=False)
         conn.commit()
     finally:
         conn.close()
@@ -1074,6 +1103,7 @@ def update_student_photo(student_id):
             (photo_path, student_id),
         )
         conn.commit()
+        queue_student_embeddings(student_id, folder)
 
         return jsonify({"status": "updated", "photo_path": photo_path}), 200
     finally:
@@ -1209,7 +1239,7 @@ def bus_location_current():
             SELECT lat, lng, speed, heading, COALESCE(timestamp, recorded_at) AS ts
             FROM bus_locations
             WHERE trip_id = ?
-            ORDER BY COALESCE(timestamp, recorded_at) DESC
+            ORDER BY ts_epoch DESC, id DESC
             LIMIT 1
             """,
             (trip["id"],),
@@ -1233,6 +1263,162 @@ def bus_location_current():
         conn.close()
 
 
+def _active_trip_for_bus(bus_number):
+    conn = get_connection()
+    try:
+        return conn.execute(
+            """
+            SELECT id, trip_type, started_at
+            FROM bus_trips
+            WHERE bus_number = ? AND status = 'ACTIVE'
+            ORDER BY started_at DESC
+            LIMIT 1
+            """,
+            (bus_number,),
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+# Long-poll waiters of /bus/<n>/trip-state. Each holds a request worker, so
+# their number is capped; beyond the cap the request answers at once.
+TRIP_STATE_MAX_WAITERS = int(os.getenv("TRIP_STATE_MAX_WAITERS", "8"))
+# Trip changes made by other worker processes are only seen on a re-check.
+TRIP_STATE_RECHECK_SEC = float(os.getenv("TRIP_STATE_RECHECK_SEC", "5"))
+_trip_state_waiters = threading.BoundedSemaphore(max(TRIP_STATE_MAX_WAITERS, 1))
+_trip_state_changed = threading.Condition()
+
+
+def _notify_trip_state_changed():
+    with _trip_state_changed:
+        _trip_state_changed.notify_all()
+
+
+@app.route("/bus/<bus_number>/trip-state", methods=["GET"])
+def bus_trip_state(bus_number):
+    """
+    Cheap trip-state poll for on-bus recognizers.
+    Supports If-None-Match (304 when unchanged) and ?wait=<sec> long-polling.
+    """
+    wait = min(max(request.args.get("wait", 0, type=float), 0.0), 30.0)
+    client_etag = (request.headers.get("If-None-Match") or "").strip()
+
+    trip = _active_trip_for_bus(bus_number)
+    etag = f'"{trip["id"] if trip else 0}"'
+    if etag == client_etag and wait > 0 and _trip_state_waiters.acquire(blocking=False):
+        # Give the request's pooled connection back while waiting; each
+        # re-check borrows one briefly.
+        db = g.pop("db", None)
+        if db is not None:
+            close_request_connection(db)
+        try:
+            deadline = time.monotonic() + wait
+            while etag == client_etag:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Woken by trip start/end in this process; re-checks on a
+                # timer for changes made by other workers.
+                with _trip_state_changed:
+                    _trip_state_changed.wait(min(remaining, TRIP_STATE_RECHECK_SEC))
+                trip = _active_trip_for_bus(bus_number)
+                etag = f'"{trip["id"] if trip else 0}"'
+        finally:
+            _trip_state_waiters.release()
+
+    if etag == client_etag:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(
+            {
+                "bus_number": bus_number,
+                "active": bool(trip),
+                "trip_id": trip["id"] if trip else None,
+                "trip_type": trip["trip_type"] if trip else None,
+                "started_at": trip["started_at"] if trip else None,
+            }
+        )
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/bus/<bus_number>/gallery", methods=["GET"])
+def bus_gallery(bus_number):
+    """
+    Binary gallery bundle (face_engine/gallery_bundle.py) for the students on
+    a bus: ?model=<pack>&dtype=float16|float32&since=<version>.
+    Supports If-None-Match (304 when unchanged); with `since`, only students
+    whose vectors changed after that version are sent.
+    """
+    expected = os.getenv("GALLERY_DEVICE_SECRET", "")
+    if not expected:
+        return jsonify({"error": "Gallery device secret not configured"}), 500
+    if request.headers.get("X-DEVICE-SECRET", "") != expected:
+        return jsonify({"error": "Unauthorized device"}), 401
+
+    model_name = request.args.get("model") or EMBEDDING_MODELS[0]
+    dtype = request.args.get("dtype", "float16")
+    if dtype not in GALLERY_DTYPES:
+        return jsonify({"error": f"dtype must be one of {sorted(GALLERY_DTYPES)}"}), 400
+    since = request.args.get("since", type=int)
+
+    conn = get_connection()
+    try:
+        # One stamp per student (newest row id and row count) identifies the gallery state.
+        stamps = conn.execute(
+            """
+            SELECT e.student_id, MAX(e.id) AS last_id, COUNT(*) AS vectors
+            FROM student_embeddings e
+            JOIN students s ON s.student_id = e.student_id
+            WHERE s.bus_number = ? AND e.model_name = ?
+            GROUP BY e.student_id
+            ORDER BY e.student_id
+            """,
+            (bus_number, model_name),
+        ).fetchall()
+        members = {row["student_id"]: f"{row['last_id']}:{row['vectors']}" for row in stamps}
+        version = max((row["last_id"] for row in stamps), default=0)
+        digest = hashlib.sha1(
+            json.dumps([model_name, dtype, members], sort_keys=True).encode("utf-8")
+        ).hexdigest()[:20]
+        etag = f'"{digest}"'
+
+        if (request.headers.get("If-None-Match") or "").strip() == etag:
+            response = app.response_class(status=304)
+            response.headers["ETag"] = etag
+            return response
+
+        changed = [row["student_id"] for row in stamps if since is None or row["last_id"] > since]
+        rows = []
+        # Chunked to stay under SQLite's bound-parameter limit.
+        for start in range(0, len(changed), 500):
+            chunk = changed[start:start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows.extend(
+                conn.execute(
+                    f"""
+                    SELECT student_id, dim, vector
+                    FROM student_embeddings
+                    WHERE model_name = ? AND student_id IN ({placeholders})
+                    ORDER BY student_id, id
+                    """,
+                    (model_name, *chunk),
+                ).fetchall()
+            )
+    finally:
+        conn.close()
+
+    ids, matrix = average_embeddings(rows)
+    data = encode_bundle(
+        model_name, ids, matrix, version, members, dtype=dtype, since=since, etag=etag
+    )
+    response = app.response_class(data, mimetype="application/octet-stream")
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 # ============================================================================
 # DRIVER ROUTES
 # ============================================================================
@@ -1344,18 +1530,11 @@ def driver_get_students_on_bus():
         
         # Get students currently on the bus (last action was 'IN')
         boarded_students = conn.execute("""
-            SELECT DISTINCT s.student_id
-            FROM students s
-            WHERE s.bus_number = ? AND s.student_id IN (
-                SELECT student_id FROM driver_logs
-                WHERE driver_id = ? AND action = 'IN'
-                GROUP BY student_id
-                HAVING MAX(timestamp) = (
-                    SELECT MAX(timestamp) FROM driver_logs
-                    WHERE student_id = driver_logs.student_id AND driver_id = ?
-                )
-            )
-        """, (bus_number, driver_id, driver_id)).fetchall()
+            SELECT p.student_id
+            FROM student_presence p
+            JOIN students s ON s.student_id = p.student_id
+            WHERE p.driver_id = ? AND p.state = 'IN' AND s.bus_number = ?
+        """, (driver_id, bus_number)).fetchall()
         
         boarded_ids = {row[0] for row in boarded_students}
         
@@ -1516,6 +1695,7 @@ def start_driver_trip():
             (driver_id, driver["bus_number"], trip_type, now, service_date),
         )
         conn.commit()
+        _notify_trip_state_changed()
         trip_id = cur.lastrowid
 
         row = conn.execute("SELECT * FROM bus_trips WHERE id = ?", (trip_id,)).fetchone()
@@ -1546,6 +1726,7 @@ def end_driver_trip():
             (_utc_iso(), trip["id"]),
         )
         conn.commit()
+        _notify_trip_state_changed()
 
         updated = conn.execute("SELECT * FROM bus_trips WHERE id = ?", (trip["id"],)).fetchone()
         if trip["trip_type"] == "TO_SCHOOL":
@@ -1604,7 +1785,7 @@ def current_driver_trip():
             SELECT lat, lng, speed, heading, COALESCE(timestamp, recorded_at) AS ts, source
             FROM bus_locations
             WHERE trip_id = ?
-            ORDER BY COALESCE(timestamp, recorded_at) DESC
+            ORDER BY ts_epoch DESC, id DESC
             LIMIT 1
             """,
             (trip["id"],),
@@ -1645,13 +1826,15 @@ def ingest_driver_location():
         if not trip:
             return jsonify({"error": "No active trip. Start a trip first."}), 400
 
-        conn.execute(
+        # Group-committed by the writer thread; nothing here waits for it.
+        # A failed insert is logged and counted in write_queue.dropped.
+        write_queue.submit_nowait(
             """
             INSERT INTO bus_locations (
                 trip_id, driver_id, bus_number, source,
-                lat, lng, speed, heading, recorded_at, timestamp
+                lat, lng, speed, heading, recorded_at, timestamp, ts_epoch
             )
-            VALUES (?, ?, ?, 'DRIVER_PHONE', ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, 'DRIVER_PHONE', ?, ?, ?, ?, ?, ?, CAST(strftime('%s', ?) AS INTEGER))
             """,
             (
                 trip["id"],
@@ -1663,9 +1846,10 @@ def ingest_driver_location():
                 heading,
                 ts,
                 ts,
+                ts,
             ),
+            label="bus_locations",
         )
-        conn.commit()
     finally:
         conn.close()
 
@@ -1710,13 +1894,15 @@ def ingest_gps_device_location():
         if not trip:
             return jsonify({"error": "No active trip for this bus"}), 404
 
-        conn.execute(
+        # Group-committed by the writer thread; nothing here waits for it.
+        # A failed insert is logged and counted in write_queue.dropped.
+        write_queue.submit_nowait(
             """
             INSERT INTO bus_locations (
                 trip_id, driver_id, bus_number, source,
-                lat, lng, speed, heading, recorded_at, timestamp
+                lat, lng, speed, heading, recorded_at, timestamp, ts_epoch
             )
-            VALUES (?, ?, ?, 'GPS_DEVICE', ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, 'GPS_DEVICE', ?, ?, ?, ?, ?, ?, CAST(strftime('%s', ?) AS INTEGER))
             """,
             (
                 trip["id"],
@@ -1728,9 +1914,10 @@ def ingest_gps_device_location():
                 heading,
                 ts,
                 ts,
+                ts,
             ),
+            label="bus_locations",
         )
-        conn.commit()
     finally:
         conn.close()
 
@@ -1767,7 +1954,7 @@ def admin_notifications():
     if event_type:
         query += " AND n.event_type = ?"
         params.append(event_type)
-    query += " ORDER BY n.created_at DESC LIMIT ?"
+    query += " ORDER BY n.ts_epoch DESC, n.id DESC LIMIT ?"
     params.append(limit)
 
     conn = get_connection()
@@ -1795,7 +1982,7 @@ def driver_notifications_recent():
             JOIN bus_trips t ON t.id = n.trip_id
             LEFT JOIN students s ON s.student_id = n.student_id
             WHERE t.driver_id = ?
-            ORDER BY n.created_at DESC
+            ORDER BY n.ts_epoch DESC, n.id DESC
             LIMIT 100
             """,
             (driver_id,),
@@ -1818,7 +2005,7 @@ def driver_current_shift():
             """
             SELECT * FROM driver_shifts
             WHERE driver_id = ? AND status = 'ACTIVE'
-            ORDER BY punch_in_at DESC LIMIT 1
+            ORDER BY ts_epoch DESC LIMIT 1
             """,
             (driver_id,),
         ).fetchone()
@@ -1848,9 +2035,11 @@ def driver_punch_in():
         today = datetime.utcnow().date().isoformat()
         today_shift = conn.execute(
             """SELECT id FROM driver_shifts 
-               WHERE driver_id = ? AND date(punch_in_at) = ? AND status = 'CLOSED' AND punch_out_at IS NULL
-               ORDER BY punch_in_at DESC LIMIT 1""",
-            (driver_id, today),
+               WHERE driver_id = ? AND status = 'CLOSED' AND punch_out_at IS NULL
+                 AND ts_epoch >= CAST(strftime('%s', ?) AS INTEGER)
+                 AND ts_epoch < CAST(strftime('%s', ?, '+1 day') AS INTEGER)
+               ORDER BY ts_epoch DESC LIMIT 1""",
+            (driver_id, today, today),
         ).fetchone()
         
         if today_shift:
@@ -1862,7 +2051,10 @@ def driver_punch_in():
         else:
             # Create new shift
             conn.execute(
-                "INSERT INTO driver_shifts (driver_id, status) VALUES (?, 'ACTIVE')",
+                """
+                INSERT INTO driver_shifts (driver_id, status, ts_epoch)
+                VALUES (?, 'ACTIVE', CAST(strftime('%s', 'now') AS INTEGER))
+                """,
                 (driver_id,),
             )
         
@@ -1885,9 +2077,11 @@ def driver_punch_out():
         today = datetime.utcnow().date().isoformat()
         active = conn.execute(
             """SELECT id FROM driver_shifts 
-               WHERE driver_id = ? AND date(punch_in_at) = ? AND status = 'ACTIVE'
-               ORDER BY punch_in_at DESC LIMIT 1""",
-            (driver_id, today),
+               WHERE driver_id = ? AND status = 'ACTIVE'
+                 AND ts_epoch >= CAST(strftime('%s', ?) AS INTEGER)
+                 AND ts_epoch < CAST(strftime('%s', ?, '+1 day') AS INTEGER)
+               ORDER BY ts_epoch DESC LIMIT 1""",
+            (driver_id, today, today),
         ).fetchone()
         if not active:
             return jsonify({"error": "No active shift"}), 400
@@ -1921,10 +2115,12 @@ def driver_shifts_today():
             """
             SELECT id, driver_id, punch_in_at, punch_out_at, status
             FROM driver_shifts
-            WHERE driver_id = ? AND date(punch_in_at) = ?
-            ORDER BY punch_in_at DESC
+            WHERE driver_id = ?
+              AND ts_epoch >= CAST(strftime('%s', ?) AS INTEGER)
+              AND ts_epoch < CAST(strftime('%s', ?, '+1 day') AS INTEGER)
+            ORDER BY ts_epoch DESC
             """,
-            (driver_id, date),
+            (driver_id, date, date),
         ).fetchall()
         return jsonify({"date": date, "shifts": [dict(r) for r in rows]}), 200
     finally:
@@ -1946,16 +2142,53 @@ def admin_driver_shifts():
                    d.name AS driver_name, d.bus_number AS bus_number
             FROM driver_shifts s
             LEFT JOIN drivers d ON d.driver_id = s.driver_id
-            WHERE date(s.punch_in_at) = ?
-            ORDER BY s.punch_in_at DESC
+            WHERE s.ts_epoch >= CAST(strftime('%s', ?) AS INTEGER)
+              AND s.ts_epoch < CAST(strftime('%s', ?, '+1 day') AS INTEGER)
+            ORDER BY s.ts_epoch DESC
             """,
-            (date,),
+            (date, date),
         ).fetchall()
         return jsonify({"date": date, "shifts": [dict(r) for r in rows]}), 200
     finally:
         conn.close()
 
 
+@app.route('/admin/daily-stats', methods=['GET'])
+@require_auth
+@require_role("admin")
+def admin_daily_stats():
+    """
+    Boarded/alighted/attended counts per day, bus, driver and trip type from
+    the daily_trip_stats rollup (local days). ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    (default today) and optional ?bus_number=.
+    """
+    start = request.args.get("from") or datetime.now().date().isoformat()
+    end = request.args.get("to") or start
+    bus_number = request.args.get("bus_number")
+
+    query = """
+        SELECT date, bus_number, driver_id, trip_type, boarded, alighted, attended
+        FROM daily_trip_stats
+        WHERE date BETWEEN ? AND ?
+    """
+    params = [start, end]
+    if bus_number:
+        query += " AND bus_number = ?"
+        params.append(bus_number)
+    query += " ORDER BY date, bus_number, driver_id, trip_type"
+
+    conn = get_connection()
+    try:
+        rows = [dict(r) for r in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+
+    totals = {
+        key: sum(r[key] for r in rows) for key in ("boarded", "alighted", "attended")
+    }
+    return jsonify({"from": start, "to": end, "rows": rows, "totals": totals}), 200
+
+
 @app.route('/student/notifications', methods=['GET'])
 @require_auth
 def student_notifications():
@@ -1986,7 +2219,7 @@ def student_notifications():
             """
             SELECT * FROM notifications
             WHERE student_id = ?
-            ORDER BY created_at DESC
+            ORDER BY ts_epoch DESC, id DESC
             LIMIT 100
             """,
             (student_id,),
@@ -1996,6 +2229,30 @@ def student_notifications():
         conn.close()
 
 
+@app.route('/admin/query-stats', methods=['GET', 'DELETE'])
+@require_auth
+@require_role("admin")
+def admin_query_stats():
+    """
+    Per-query-shape latency/row aggregates from database/query_profile.py.
+    ?sort=total_ms|max_ms|mean_ms|count|slow|rows&limit=N; DELETE resets them.
+    """
+    if request.method == "DELETE":
+        QUERY_STATS.reset()
+        return jsonify({"status": "reset"}), 200
+
+    sort = request.args.get("sort", "total_ms")
+    if sort not in ("total_ms", "max_ms", "mean_ms", "count", "slow", "rows"):
+        return jsonify({"error": "invalid sort"}), 400
+    limit = min(request.args.get("limit", 50, type=int), 500)
+    return jsonify({
+        "profiling": PROFILE_ENABLED,
+        "slow_query_ms": SLOW_QUERY_MS,
+        "dropped_writes": dict(write_queue.dropped),
+        "queries": QUERY_STATS.snapshot(sort=sort, limit=limit),
+    }), 200
+
+
 @app.route('/health')
 def health():
     return jsonify({"status": "ok"})
@@ -9,3 +9,44 @@ def mark_attendance(student_id):
         json={"student_id": student_id}
     )
     return response.json()
+
+
+def get_trip_state(bus_number, etag=None, wait=0):
+    """
+    Polls /bus/<bus_number>/trip-state.
+    Returns (state or None if unchanged, etag).
+    """
+    headers = {"If-None-Match": etag} if etag else {}
+    response = requests.get(
+        f"{BACKEND_URL}/bus/{bus_number}/trip-state",
+        params={"wait": wait} if wait else None,
+        headers=headers,
+        timeout=wait + 10,
+    )
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    return response.json(), response.headers.get("ETag")
+
+
+def get_gallery_bundle(bus_number, model_name, etag=None, since=None, dtype="float16"):
+    """
+    Downloads /bus/<bus_number>/gallery (see face_engine/gallery_bundle.py).
+    Returns (bundle bytes or None if unchanged, etag).
+    """
+    headers = {"X-DEVICE-SECRET": os.getenv("GALLERY_DEVICE_SECRET", "")}
+    if etag:
+        headers["If-None-Match"] = etag
+    params = {"model": model_name, "dtype": dtype}
+    if since is not None:
+        params["since"] = since
+    response = requests.get(
+        f"{BACKEND_URL}/bus/{bus_number}/gallery",
+        params=params,
+        headers=headers,
+        timeout=30,
+    )
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    return response.content, response.headers.get("ETag")
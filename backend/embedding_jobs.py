@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from database.db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Recognition packs to precompute; the first one's detector finds the face.
+EMBEDDING_MODELS = [
+    m.strip() for m in os.getenv("EMBEDDING_MODELS", "buffalo_s").split(",") if m.strip()
+]
+EMBEDDING_JOBS_ENABLED = os.getenv("EMBEDDING_JOBS", "1") == "1"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# One worker: the models aren't thread-safe and enrollment is rare.
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_face_model = None
+_embedders: Dict[str, object] = {}
+
+
+def photo_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _student_photos(folder: str) -> List[str]:
+    if not os.path.isdir(folder):
+        return []
+    return [
+        os.path.join(folder, name)
+        for name in sorted(os.listdir(folder))
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def _load_models():
+    global _face_model
+    from face_engine.face_model import FaceEmbedder, FaceModel
+
+    if _face_model is None:
+        _face_model = FaceModel(model_name=EMBEDDING_MODELS[0])
+        _embedders[EMBEDDING_MODELS[0]] = _face_model
+    for model_name in EMBEDDING_MODELS[1:]:
+        if model_name not in _embedders:
+            _embedders[model_name] = FaceEmbedder(model_name)
+    return _face_model, _embedders
+
+
+def compute_student_embeddings(student_id: str, folder: str) -> int:
+    """
+    Embeds every photo in the student's folder with each EMBEDDING_MODELS
+    pack and stores the vectors in student_embeddings. Photos already
+    embedded (same hash) are skipped; rows for photos no longer in the
+    folder are removed. Photos without exactly one face are skipped.
+    Returns the number of rows written.
+    """
+    import cv2
+    import numpy as np
+
+    face_model, embedders = _load_models()
+    photos = [(path, photo_hash(path)) for path in _student_photos(folder)]
+    current_hashes = [h for _, h in photos]
+
+    conn = get_connection()
+    try:
+        existing = {
+            (row["model_name"], row["photo_hash"])
+            for row in conn.execute(
+                "SELECT model_name, photo_hash FROM student_embeddings WHERE student_id = ?",
+                (student_id,),
+            ).fetchall()
+        }
+    finally:
+        conn.close()
+
+    new_rows = []
+    for path, digest in photos:
+        missing = [m for m in EMBEDDING_MODELS if (m, digest) not in existing]
+        if not missing:
+            continue
+        image = cv2.imread(path)
+        if image is None:
+            logger.warning("Embedding job: unreadable photo %s", path)
+            continue
+        detections = face_model.detect(image)
+        if len(detections) != 1:
+            logger.warning(
+                "Embedding job: %s has %d faces, expected 1", path, len(detections)
+            )
+            continue
+        for model_name in missing:
+            item = embedders[model_name].embed(image, [dict(detections[0])])[0]
+            vector = np.asarray(item["embedding"], dtype="<f4")
+            new_rows.append((student_id, model_name, vector.size, vector.tobytes(), digest))
+
+    conn = get_connection()
+    try:
+        placeholders = ",".join("?" for _ in current_hashes) or "''"
+        conn.execute(
+            f"DELETE FROM student_embeddings WHERE student_id = ? AND photo_hash NOT IN ({placeholders})",
+            (student_id, *current_hashes),
+        )
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO student_embeddings (student_id, model_name, dim, vector, photo_hash)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            new_rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return len(new_rows)
+
+
+def _run_job(student_id: str, folder: str) -> int:
+    try:
+        written = compute_student_embeddings(student_id, folder)
+        logger.info("Embedding job: %s -> %d vector(s)", student_id, written)
+        return written
+    except ImportError as exc:
+        logger.warning("Embedding job skipped for %s: face engine unavailable (%s)", student_id, exc)
+    except Exception:
+        logger.exception("Embedding job failed for %s", student_id)
+    return 0
+
+
+def queue_student_embeddings(student_id: str, folder: str) -> Optional[Future]:
+    """
+    Schedules compute_student_embeddings in the background (no-op when
+    EMBEDDING_JOBS=0).
+    """
+    global _executor
+    if not EMBEDDING_JOBS_ENABLED:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embeddings")
+    return _executor.submit(_run_job, student_id, folder)
@@ -0,0 +1,280 @@
+"""
+Retention for the append-only tables (bus_locations, driver_logs,
+notifications).
+
+Rows older than ARCHIVE_RETENTION_DAYS (whole UTC days, by ts_epoch) are
+written to gzip-compressed JSON lines, one file per table and day:
+
+    database/archive/bus_locations/2026-03-14.jsonl.gz
+
+then deleted from the live database in batches of ARCHIVE_BATCH_ROWS (one
+short write transaction each), followed by an incremental vacuum. A day's
+file is written and renamed into place before any of its rows are deleted.
+If a run is interrupted between the two, the next run appends the same rows
+again as another gzip member; iter_archived() drops the duplicate ids.
+
+    python manage.py archive --days 30
+    python manage.py archive-export bus_locations --from 2026-03-01 --to 2026-03-31
+
+With ARCHIVE_INTERVAL_HOURS set (off by default), every backend process
+also runs archive_old_rows() on that interval; a lock file in ARCHIVE_DIR
+lets only one of several workers archive at a time.
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = db.project_path(os.getenv("ARCHIVE_DIR", os.path.join("database", "archive")))
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "30"))
+ARCHIVE_BATCH_ROWS = int(os.getenv("ARCHIVE_BATCH_ROWS", "5000"))
+# Opt-in: 0 (default) means archiving only runs from `manage.py archive`.
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "0"))
+
+ARCHIVE_TABLES = ("bus_locations", "driver_logs", "notifications")
+DAY_SECONDS = 86400
+
+
+def _day_name(day_index: int) -> str:
+    return datetime.fromtimestamp(day_index * DAY_SECONDS, tz=timezone.utc).date().isoformat()
+
+
+def _day_index(day: str) -> int:
+    return int(datetime.fromisoformat(day).replace(tzinfo=timezone.utc).timestamp()) // DAY_SECONDS
+
+
+def archive_path(table: str, day: str, archive_dir: Optional[str] = None) -> str:
+    return os.path.join(archive_dir or ARCHIVE_DIR, table, f"{day}.jsonl.gz")
+
+
+def _write_day(conn, table: str, day_index: int, path: str) -> Tuple[int, int]:
+    """
+    Appends the table's rows for one UTC day to `path` (a new gzip member);
+    returns (rows written, highest id written).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    start = day_index * DAY_SECONDS
+    cursor = conn.execute(
+        f"SELECT * FROM {table} WHERE ts_epoch >= ? AND ts_epoch < ? ORDER BY id",
+        (start, start + DAY_SECONDS),
+    )
+    written, last_id = 0, 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as out:
+        while True:
+            rows = cursor.fetchmany(ARCHIVE_BATCH_ROWS)
+            for row in rows:
+                out.write(json.dumps(dict(row), separators=(",", ":")) + "\n")
+            written += len(rows)
+            if rows:
+                last_id = rows[-1]["id"]
+            if len(rows) < ARCHIVE_BATCH_ROWS:
+                break
+        out.flush()
+        os.fsync(out.fileno())
+
+    # gzip files can be concatenated: appending keeps earlier runs' rows.
+    if os.path.exists(path):
+        with open(path, "ab") as dest, open(tmp_path, "rb") as src:
+            dest.write(src.read())
+            dest.flush()
+            os.fsync(dest.fileno())
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, path)
+    return written, last_id
+
+
+def _delete_day(conn, table: str, day_index: int, last_id: int) -> int:
+    """Deletes the day's rows up to `last_id`, one short transaction per batch."""
+    start = day_index * DAY_SECONDS
+    deleted = 0
+    while True:
+        count = conn.execute(
+            f"""
+            DELETE FROM {table}
+            WHERE id IN (
+                SELECT id FROM {table}
+                WHERE ts_epoch >= ? AND ts_epoch < ? AND id <= ?
+                LIMIT ?
+            )
+            """,
+            (start, start + DAY_SECONDS, last_id, ARCHIVE_BATCH_ROWS),
+        ).rowcount
+        conn.commit()
+        deleted += count
+        if count < ARCHIVE_BATCH_ROWS:
+            return deleted
+
+
+def _incremental_vacuum(conn) -> Optional[int]:
+    """
+    Returns the pages freed, or None when the database isn't in
+    auto_vacuum=INCREMENTAL mode (see enable_incremental_vacuum).
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return None
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # execute() would step the pragma once and free a single page;
+    # executescript() runs it to completion.
+    conn.executescript("PRAGMA incremental_vacuum;")
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def enable_incremental_vacuum() -> None:
+    """One-time switch of an existing database to auto_vacuum=INCREMENTAL (runs VACUUM)."""
+    conn = db.get_connection()
+    try:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def archive_old_rows(
+    retention_days: int = ARCHIVE_RETENTION_DAYS,
+    tables: Sequence[str] = ARCHIVE_TABLES,
+    archive_dir: Optional[str] = None,
+    dry_run: bool = False,
+) -> Dict[str, object]:
+    """
+    Archives and deletes rows from whole UTC days older than
+    `retention_days`. Returns {"cutoff", "tables": {table: {day: rows}},
+    "pages_freed"}.
+    """
+    cutoff_index = int(time.time()) // DAY_SECONDS - retention_days
+    report: Dict[str, object] = {"cutoff": _day_name(cutoff_index), "tables": {}, "pages_freed": None}
+
+    conn = db.get_connection()
+    try:
+        for table in tables:
+            if table not in ARCHIVE_TABLES:
+                raise ValueError(f"{table} is not archivable; expected one of {ARCHIVE_TABLES}")
+            days = [
+                row[0]
+                for row in conn.execute(
+                    f"""
+                    SELECT DISTINCT ts_epoch / {DAY_SECONDS}
+                    FROM {table}
+                    WHERE ts_epoch < ?
+                    ORDER BY 1
+                    """,
+                    (cutoff_index * DAY_SECONDS,),
+                ).fetchall()
+            ]
+            per_day: Dict[str, int] = {}
+            for day_index in days:
+                day = _day_name(day_index)
+                if dry_run:
+                    per_day[day] = conn.execute(
+                        f"SELECT COUNT(*) FROM {table} WHERE ts_epoch >= ? AND ts_epoch < ?",
+                        (day_index * DAY_SECONDS, (day_index + 1) * DAY_SECONDS),
+                    ).fetchone()[0]
+                    continue
+                path = archive_path(table, day, archive_dir)
+                written, last_id = _write_day(conn, table, day_index, path)
+                # Only rows that made it into the file are deleted; a late row
+                # for that day (higher id) waits for the next run.
+                _delete_day(conn, table, day_index, last_id)
+                per_day[day] = written
+            report["tables"][table] = per_day
+        if not dry_run:
+            report["pages_freed"] = _incremental_vacuum(conn)
+    finally:
+        conn.close()
+    return report
+
+
+def iter_archived(
+    table: str,
+    start_day: str,
+    end_day: Optional[str] = None,
+    archive_dir: Optional[str] = None,
+) -> Iterator[dict]:
+    """
+    Streams archived rows of `table` for start_day..end_day (inclusive,
+    'YYYY-MM-DD'), one dict per row, oldest day first. Days without a file
+    are skipped.
+    """
+    first = _day_index(start_day)
+    last = _day_index(end_day or start_day)
+    for day_index in range(first, last + 1):
+        path = archive_path(table, _day_name(day_index), archive_dir)
+        if not os.path.exists(path):
+            continue
+        seen = set()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if row["id"] in seen:
+                    continue
+                seen.add(row["id"])
+                yield row
+
+
+def archived_days(table: str, archive_dir: Optional[str] = None) -> List[str]:
+    folder = os.path.join(archive_dir or ARCHIVE_DIR, table)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name[: -len(".jsonl.gz")] for name in os.listdir(folder) if name.endswith(".jsonl.gz"))
+
+
+@contextmanager
+def _process_lock(name: str = ".lock"):
+    """Yields True if this process got the archive lock, False if another holds it."""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(ARCHIVE_DIR, name), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _run_scheduled(interval_sec: float) -> None:
+    while True:
+        try:
+            with _process_lock() as acquired:
+                if acquired:
+                    report = archive_old_rows()
+                    archived = {t: sum(days.values()) for t, days in report["tables"].items()}
+                    logger.info("[ARCHIVE] Before %s: %s", report["cutoff"], archived)
+        except Exception:
+            logger.exception("[ARCHIVE] Scheduled archive failed")
+        time.sleep(interval_sec)
+
+
+def start_archive_scheduler() -> Optional[threading.Thread]:
+    """
+    Runs archive_old_rows() now and every ARCHIVE_INTERVAL_HOURS in a daemon
+    thread; does nothing while ARCHIVE_INTERVAL_HOURS is 0.
+    """
+    if ARCHIVE_INTERVAL_HOURS <= 0:
+        return None
+    thread = threading.Thread(
+        target=_run_scheduled, args=(ARCHIVE_INTERVAL_HOURS * 3600,), name="archive", daemon=True
+    )
+    thread.start()
+    return thread
@@ -1,35 +1,78 @@
+from database import write_queue
 from database.db import get_connection
 from datetime import datetime
 
 def mark_attendance_db(student_id, trip_id=None, trip_type=None, bus_number=None):
-    today = datetime.now().strftime("%Y-%m-%d")
-    now = datetime.now().strftime("%H:%M:%S")
+    """
+    Inserts today's attendance row in one statement; returns False if the
+    student is already marked for this trip type (any trip type when
+    trip_type is None). Duplicates are rejected by the unique index on
+    (student_id, date, trip_type), so concurrent marks can't both land.
+    """
+    marked_at = datetime.now().replace(microsecond=0)
+    today = marked_at.strftime("%Y-%m-%d")
+    now = marked_at.strftime("%H:%M:%S")
+    # ts_epoch is set here rather than by the migration-018 trigger, which
+    # would cost a second write of the row.
+    row = (student_id, today, now, trip_id, trip_type, bus_number, int(marked_at.timestamp()))
 
-    conn = get_connection()
-
-    # prevent duplicate attendance for same day
     if trip_type:
-        existing = conn.execute(
-            "SELECT * FROM attendance WHERE student_id=? AND date=? AND trip_type=?",
-            (student_id, today, trip_type),
-        ).fetchone()
+        inserted = write_queue.execute(
+            """
+            INSERT INTO attendance (student_id, date, time, trip_id, trip_type, bus_number, ts_epoch)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+            """,
+            row,
+        )
     else:
-        existing = conn.execute(
-            "SELECT * FROM attendance WHERE student_id=? AND date=?",
-            (student_id, today),
+        inserted = write_queue.execute(
+            """
+            INSERT INTO attendance (student_id, date, time, trip_id, trip_type, bus_number, ts_epoch)
+            SELECT ?, ?, ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM attendance WHERE student_id = ? AND date = ?)
+            """,
+            row + (student_id, today),
+        )
+    return inserted == 1
+
+
+def mark_student_attendance(student_id):
+    """
+    Marks a recognized student against their bus's ACTIVE trip (TO_HOME when
+    no trip is running). Shared by the /mark_attendance route and the
+    recognizer's direct mode.
+    Returns {"status", "trip_type"}, or None for an unknown student_id.
+    """
+    conn = get_connection()
+    try:
+        student = conn.execute(
+            "SELECT id, bus_number FROM students WHERE student_id = ?", (student_id,)
         ).fetchone()
+        if not student:
+            return None
 
-    if existing:
+        trip = None
+        if student["bus_number"]:
+            trip = conn.execute(
+                """
+                SELECT id, trip_type
+                FROM bus_trips
+                WHERE bus_number = ? AND status = 'ACTIVE'
+                ORDER BY started_at DESC
+                LIMIT 1
+                """,
+                (student["bus_number"],),
+            ).fetchone()
+    finally:
         conn.close()
-        return False  # already marked
 
-    conn.execute(
-        """
-        INSERT INTO attendance (student_id, date, time, trip_id, trip_type, bus_number)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (student_id, today, now, trip_id, trip_type, bus_number),
+    effective_trip_type = trip["trip_type"] if trip else "TO_HOME"
+    marked = mark_attendance_db(
+        student_id,
+        trip_id=trip["id"] if trip else None,
+        trip_type=effective_trip_type,
+        bus_number=student["bus_number"],
     )
-    conn.commit()
-    conn.close()
-    return True
+    status = "Attendance marked" if marked else "Already marked today"
+    return {"status": status, "trip_type": effective_trip_type}
@@ -1,12 +1,214 @@
+import os
 import sqlite3
+import threading
 
-DB_PATH = "database/bus.db"
+from database.query_profile import PROFILE_ENABLED, ProfilingCursor
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def project_path(path):
+    """`path`, taken from the project root when relative."""
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+
+def resolve_db_path(path):
+    """
+    Relative paths are taken from the project root, so the app and
+    manage.py work from any directory. `memory` (or `:memory:`) and
+    `memory:<name>` select a shared-cache in-memory database; `file:` URIs
+    are passed through.
+    """
+    if path in ("memory", ":memory:"):
+        return "memory:bus"
+    if path.startswith(("memory:", "file:")):
+        return path
+    return project_path(path)
+
+
+DB_PATH = resolve_db_path(os.getenv("DB_PATH", os.path.join("database", "bus.db")))
+SCHEMA_PATH = project_path(os.getenv("DB_SCHEMA_PATH", os.path.join("database", "schema.sql")))
+
+# Connection settings, applied once when a pooled connection is opened.
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+# Idle connections kept per database file.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+_pool = {}
+_pool_lock = threading.Lock()
+_scope = threading.local()
+
+
+class PooledConnection:
+    """
+    sqlite3.Connection proxy handed out by get_connection().
+
+    close() gives the connection back to the pool instead of closing it.
+    Inside a request scope (open_request_connection) every get_connection()
+    on that thread borrows the same connection; a borrower that returns it
+    with a transaction it opened itself still uncommitted has that
+    transaction rolled back, as closing a plain connection would.
+    """
+
+    def __init__(self, conn, path):
+        self._conn = conn
+        self.path = path
+        self._borrows = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, factory=None):
+        if factory is None and PROFILE_ENABLED:
+            factory = ProfilingCursor
+        return self._conn.cursor(factory) if factory else self._conn.cursor()
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __enter__(self):
+        # Transaction scope only (commit/rollback on exit); the block gets the
+        # proxy, so close() and cursor() keep their pooled behaviour.
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def _borrow(self):
+        self._borrows.append(self._conn.in_transaction)
+        return self
+
+    def close(self):
+        if not self._borrows:
+            return
+        had_transaction = self._borrows.pop()
+        if self._conn.in_transaction and not had_transaction:
+            self._conn.rollback()
+        if not self._borrows:
+            _release(self)
+
+
+def configure(db_path=None, schema_path=None):
+    """
+    Points get_connection()/init_db() at another database or schema file
+    (same forms as the DB_PATH / DB_SCHEMA_PATH environment variables).
+    Returns the previous (db_path, schema_path).
+    """
+    global DB_PATH, SCHEMA_PATH
+    previous = (DB_PATH, SCHEMA_PATH)
+    if db_path is not None:
+        DB_PATH = resolve_db_path(db_path)
+    if schema_path is not None:
+        SCHEMA_PATH = project_path(schema_path)
+    return previous
+
+
+def is_memory_path(path):
+    return path.startswith("memory:") or (path.startswith("file:") and "mode=memory" in path)
+
+
+# One open connection per in-memory database: SQLite drops a shared-cache
+# memory database when its last connection closes.
+_memory_keepers = {}
+
+
+def _sqlite_target(path):
+    if path.startswith("memory:"):
+        return f"file:{path[len('memory:'):]}?mode=memory&cache=shared", True
+    return path, path.startswith("file:")
+
+
+def _connect(path):
+    target, uri = _sqlite_target(path)
+    conn = sqlite3.connect(
+        target,
+        timeout=BUSY_TIMEOUT_MS / 1000.0,
+        cached_statements=STATEMENT_CACHE,
+        check_same_thread=False,
+        uri=uri,
+    )
+    if is_memory_path(path):
+        with _pool_lock:
+            if path not in _memory_keepers:
+                _memory_keepers[path] = sqlite3.connect(target, uri=uri, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    # Only takes effect on a brand-new file (before WAL and the first table);
+    # existing databases switch with `manage.py archive --vacuum`.
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return PooledConnection(conn, path)
+
+
+def _acquire(path):
+    with _pool_lock:
+        idle = _pool.get(path)
+        pooled = idle.pop() if idle else None
+    return (pooled or _connect(path))._borrow()
+
+
+def _release(pooled):
+    if pooled._conn.in_transaction:
+        pooled._conn.rollback()
+    with _pool_lock:
+        idle = _pool.setdefault(pooled.path, [])
+        if len(idle) < POOL_SIZE:
+            idle.append(pooled)
+            return
+    pooled._conn.close()
+
+
+def get_connection():
+    scoped = getattr(_scope, "conn", None)
+    if scoped is not None and scoped.path == DB_PATH:
+        return scoped._borrow()
+    return _acquire(DB_PATH)
+
+
+def open_request_connection():
+    """
+    Binds one pooled connection to the current thread until
+    close_request_connection(); get_connection() calls in between share it.
+    """
+    conn = _acquire(DB_PATH)
+    _scope.conn = conn
     return conn
 
+
+def close_request_connection(conn):
+    if getattr(_scope, "conn", None) is conn:
+        _scope.conn = None
+    conn.close()
+
+
+def close_pool(path=None):
+    """
+    Closes idle pooled connections (tests, shutdown): all of them, or only
+    those for `path`, which also releases that in-memory database.
+    """
+    with _pool_lock:
+        if path is None:
+            idle = [pooled for conns in _pool.values() for pooled in conns]
+            _pool.clear()
+        else:
+            idle = _pool.pop(path, [])
+            keeper = _memory_keepers.pop(path, None)
+            if keeper is not None:
+                keeper.close()
+    for pooled in idle:
+        pooled._conn.close()
+
 def _table_columns(conn, table_name):
     rows = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
     return [r[1] for r in rows]
@@ -26,6 +228,141 @@ def _ensure_index(conn, index_name, index_sql, report):
         conn.execute(index_sql)
         report["indexes_added"].append(index_name)
 
+def _ensure_epoch_column(conn, table_name, source_sql, source_columns, report):
+    """
+    Adds `ts_epoch` (UTC unix seconds) to `table_name`, backfills it from
+    `source_sql` (a template; {row} is the row prefix) and keeps it in sync
+    with triggers on insert and on updates of `source_columns`. The app's
+    INSERTs set ts_epoch themselves; the insert trigger only fills it for
+    writers that don't (a second write of the row).
+    """
+    _ensure_column(conn, table_name, "ts_epoch", "ts_epoch INTEGER", report)
+    conn.execute(
+        f"UPDATE {table_name} SET ts_epoch = {source_sql.format(row='')} WHERE ts_epoch IS NULL"
+    )
+    new_value = source_sql.format(row="NEW.")
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table_name}_epoch_insert
+        AFTER INSERT ON {table_name}
+        WHEN NEW.ts_epoch IS NULL
+        BEGIN
+            UPDATE {table_name} SET ts_epoch = {new_value} WHERE id = NEW.id;
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table_name}_epoch_update
+        AFTER UPDATE OF {", ".join(source_columns)} ON {table_name}
+        BEGIN
+            UPDATE {table_name} SET ts_epoch = {new_value} WHERE id = NEW.id;
+        END
+        """
+    )
+
+def rebuild_student_presence(conn):
+    """
+    Rebuilds student_presence from each student's latest driver_logs row;
+    returns the number of students written. The caller commits.
+    """
+    conn.execute("DELETE FROM student_presence")
+    return conn.execute(
+        """
+        INSERT INTO student_presence (student_id, driver_id, bus_number, state, since, log_id)
+        SELECT dl.student_id, dl.driver_id, d.bus_number, dl.action, dl.ts_epoch, dl.id
+        FROM (
+            SELECT id, driver_id, student_id, action, ts_epoch,
+                   ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY ts_epoch DESC, id DESC) AS rn
+            FROM driver_logs
+        ) dl
+        LEFT JOIN drivers d ON d.driver_id = dl.driver_id
+        WHERE dl.rn = 1
+        """
+    ).rowcount
+
+def rebuild_daily_stats(conn, start=None, end=None, boarding=True, attendance=True):
+    """
+    Recomputes daily_trip_stats from driver_logs and attendance for days
+    start..end ('YYYY-MM-DD', inclusive). Days are local dates, as in
+    attendance.date; driver_logs' UTC timestamps are converted. Without
+    `start`, boarding counts are rebuilt from the oldest driver_logs day
+    still in the database and attendance counts from the oldest attendance
+    day, so days whose logs were archived keep their counts. `boarding`/`attendance` limit the
+    rebuild to one of the two. Returns the number of rows written.
+    The caller commits.
+    """
+    end = end or "9999-12-31"
+    written = 0
+
+    log_start = None
+    if boarding:
+        log_start = start or conn.execute(
+            "SELECT MIN(date(timestamp, 'localtime')) FROM driver_logs"
+        ).fetchone()[0]
+    if log_start:
+        conn.execute(
+            "UPDATE daily_trip_stats SET boarded = 0, alighted = 0 WHERE date BETWEEN ? AND ?",
+            (log_start, end),
+        )
+        # Trip type of the driver's trip that was running at the log's time.
+        written += conn.execute(
+            """
+            INSERT INTO daily_trip_stats (date, bus_number, driver_id, trip_type, boarded, alighted)
+            SELECT date(dl.timestamp, 'localtime'),
+                   d.bus_number,
+                   dl.driver_id,
+                   COALESCE((
+                       SELECT t.trip_type FROM bus_trips t
+                       WHERE t.driver_id = dl.driver_id
+                         AND CAST(strftime('%s', t.started_at) AS INTEGER) <= dl.ts_epoch
+                         AND (t.ended_at IS NULL OR CAST(strftime('%s', t.ended_at) AS INTEGER) > dl.ts_epoch)
+                       ORDER BY t.started_at DESC
+                       LIMIT 1
+                   ), ''),
+                   SUM(dl.action = 'IN'),
+                   SUM(dl.action = 'OUT')
+            FROM driver_logs dl
+            JOIN drivers d ON d.driver_id = dl.driver_id
+            JOIN students s ON s.student_id = dl.student_id
+            WHERE s.bus_number = d.bus_number AND date(dl.timestamp, 'localtime') BETWEEN ? AND ?
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT(date, bus_number, driver_id, trip_type) DO UPDATE SET
+                boarded = excluded.boarded,
+                alighted = excluded.alighted
+            """,
+            (log_start, end),
+        ).rowcount
+
+    attendance_start = None
+    if attendance:
+        attendance_start = start or conn.execute("SELECT MIN(date) FROM attendance").fetchone()[0]
+    if attendance_start:
+        conn.execute(
+            "UPDATE daily_trip_stats SET attended = 0 WHERE date BETWEEN ? AND ?",
+            (attendance_start, end),
+        )
+        written += conn.execute(
+            """
+            INSERT INTO daily_trip_stats (date, bus_number, driver_id, trip_type, attended)
+            SELECT a.date,
+                   COALESCE(a.bus_number, ''),
+                   COALESCE(t.driver_id, ''),
+                   COALESCE(a.trip_type, ''),
+                   COUNT(*)
+            FROM attendance a
+            LEFT JOIN bus_trips t ON t.id = a.trip_id
+            WHERE a.date BETWEEN ? AND ?
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT(date, bus_number, driver_id, trip_type) DO UPDATE SET
+                attended = excluded.attended
+            """,
+            (attendance_start, end),
+        ).rowcount
+
+    conn.execute("DELETE FROM daily_trip_stats WHERE boarded = 0 AND alighted = 0 AND attended = 0")
+    return written
+
 def _ensure_migrations_table(conn):
     conn.execute(
         """
@@ -50,322 +387,605 @@ def _mark_migration_applied(conn, name):
         (name,),
     )
 
-def init_db():
-    report = {
-        "migrations_applied": [],
-        "columns_added": [],
-        "indexes_added": [],
-    }
-    conn = get_connection()
-
-    _ensure_migrations_table(conn)
-
-    # Base schema (idempotent)
-    with open('database/schema.sql', 'r') as f:
-        conn.executescript(f.read())
-    
-    # Migration 001: students columns required by current app and driver module
-    migration = "001_students_columns"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(conn, "students", "bus_stop", "bus_stop TEXT", report)
-        _ensure_column(conn, "students", "bus_number", "bus_number TEXT", report)
-        _ensure_column(conn, "students", "on_leave", "on_leave INTEGER DEFAULT 0", report)
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 002: attendance direction
-    migration = "002_attendance_direction"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(conn, "attendance", "direction", "direction TEXT DEFAULT 'IN'", report)
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 003: indexes for driver + attendance flows
-    migration = "003_indexes"
-    if not _is_migration_applied(conn, migration):
-        _ensure_index(
-            conn,
-            "idx_students_bus_number",
-            "CREATE INDEX IF NOT EXISTS idx_students_bus_number ON students(bus_number)",
-            report,
-        )
-        _ensure_index(
-            conn,
-            "idx_drivers_driver_id",
-            "CREATE INDEX IF NOT EXISTS idx_drivers_driver_id ON drivers(driver_id)",
-            report,
+# Migration 001: students columns required by current app and driver module
+def _migrate_001_students_columns(conn, report):
+    _ensure_column(conn, "students", "bus_stop", "bus_stop TEXT", report)
+    _ensure_column(conn, "students", "bus_number", "bus_number TEXT", report)
+    _ensure_column(conn, "students", "on_leave", "on_leave INTEGER DEFAULT 0", report)
+
+
+# Migration 002: attendance direction
+def _migrate_002_attendance_direction(conn, report):
+    _ensure_column(conn, "attendance", "direction", "direction TEXT DEFAULT 'IN'", report)
+
+
+# Migration 003: indexes for driver + attendance flows
+def _migrate_003_indexes(conn, report):
+    _ensure_index(
+        conn,
+        "idx_students_bus_number",
+        "CREATE INDEX IF NOT EXISTS idx_students_bus_number ON students(bus_number)",
+        report,
+    )
+    _ensure_index(
+        conn,
+        "idx_drivers_driver_id",
+        "CREATE INDEX IF NOT EXISTS idx_drivers_driver_id ON drivers(driver_id)",
+        report,
+    )
+    _ensure_index(
+        conn,
+        "idx_driver_logs_driver_time",
+        "CREATE INDEX IF NOT EXISTS idx_driver_logs_driver_time ON driver_logs(driver_id, timestamp)",
+        report,
+    )
+    _ensure_index(
+        conn,
+        "idx_driver_logs_student_time",
+        "CREATE INDEX IF NOT EXISTS idx_driver_logs_student_time ON driver_logs(student_id, timestamp)",
+        report,
+    )
+    _ensure_index(
+        conn,
+        "idx_attendance_student_date",
+        "CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance(student_id, date)",
+        report,
+    )
+
+
+# Migration 004: student alert profile columns
+def _migrate_004_student_alert_columns(conn, report):
+    _ensure_column(conn, "students", "parent_name", "parent_name TEXT", report)
+    _ensure_column(conn, "students", "parent_phone", "parent_phone TEXT", report)
+    _ensure_column(conn, "students", "alerts_enabled", "alerts_enabled INTEGER DEFAULT 1", report)
+    _ensure_column(conn, "students", "bus_stop_lat", "bus_stop_lat REAL", report)
+    _ensure_column(conn, "students", "bus_stop_lng", "bus_stop_lng REAL", report)
+    _ensure_column(conn, "students", "bus_stop_label", "bus_stop_label TEXT", report)
+
+
+# Migration 010: student academic fields
+def _migrate_010_student_academic_fields(conn, report):
+    _ensure_column(conn, "students", "education_type", "education_type TEXT", report)
+    _ensure_column(conn, "students", "college_year", "college_year TEXT", report)
+    _ensure_column(conn, "students", "college_department", "college_department TEXT", report)
+    _ensure_column(conn, "students", "school_class", "school_class TEXT", report)
+    _ensure_column(conn, "students", "school_division", "school_division TEXT", report)
+
+
+# Migration 011: college type field
+def _migrate_011_student_college_type(conn, report):
+    _ensure_column(conn, "students", "college_type", "college_type TEXT", report)
+
+
+# Migration 012: admin requests queue
+def _migrate_012_admin_requests(conn, report):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS admin_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_type TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            requester_role TEXT,
+            requester_id TEXT,
+            payload TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            reviewed_at TIMESTAMP,
+            reviewed_by TEXT,
+            reviewed_notes TEXT
         )
-        _ensure_index(
-            conn,
-            "idx_driver_logs_driver_time",
-            "CREATE INDEX IF NOT EXISTS idx_driver_logs_driver_time ON driver_logs(driver_id, timestamp)",
-            report,
+        """
+    )
+
+
+# Migration 013: driver shifts
+def _migrate_013_driver_shifts(conn, report):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS driver_shifts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            driver_id TEXT NOT NULL,
+            punch_in_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            punch_out_at TIMESTAMP,
+            status TEXT NOT NULL DEFAULT 'ACTIVE',
+            FOREIGN KEY (driver_id) REFERENCES drivers(driver_id)
         )
-        _ensure_index(
-            conn,
-            "idx_driver_logs_student_time",
-            "CREATE INDEX IF NOT EXISTS idx_driver_logs_student_time ON driver_logs(student_id, timestamp)",
-            report,
+        """
+    )
+
+
+# Migration 014: attendance trip fields
+def _migrate_014_attendance_trip_fields(conn, report):
+    _ensure_column(conn, "attendance", "trip_id", "trip_id INTEGER", report)
+    _ensure_column(conn, "attendance", "trip_type", "trip_type TEXT", report)
+    _ensure_column(conn, "attendance", "bus_number", "bus_number TEXT", report)
+
+
+# Migration 015: notification absent templates
+def _migrate_015_notification_absent_templates(conn, report):
+    _ensure_column(
+        conn,
+        "notification_settings",
+        "absent_school_template",
+        "absent_school_template TEXT",
+        report,
+    )
+    _ensure_column(
+        conn,
+        "notification_settings",
+        "absent_home_template",
+        "absent_home_template TEXT",
+        report,
+    )
+    conn.execute("INSERT OR IGNORE INTO notification_settings (id) VALUES (1)")
+
+
+# Migration 005: trips + locations + notifications tables
+def _migrate_005_trip_and_alert_tables(conn, report):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bus_trips (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            driver_id TEXT NOT NULL,
+            bus_number TEXT NOT NULL,
+            trip_type TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'ACTIVE',
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ended_at TIMESTAMP,
+            service_date TEXT NOT NULL
         )
-        _ensure_index(
-            conn,
-            "idx_attendance_student_date",
-            "CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance(student_id, date)",
-            report,
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bus_locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trip_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            lat REAL NOT NULL,
+            lng REAL NOT NULL,
+            speed REAL,
+            heading REAL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (trip_id) REFERENCES bus_trips(id)
         )
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 004: student alert profile columns
-    migration = "004_student_alert_columns"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(conn, "students", "parent_name", "parent_name TEXT", report)
-        _ensure_column(conn, "students", "parent_phone", "parent_phone TEXT", report)
-        _ensure_column(conn, "students", "alerts_enabled", "alerts_enabled INTEGER DEFAULT 1", report)
-        _ensure_column(conn, "students", "bus_stop_lat", "bus_stop_lat REAL", report)
-        _ensure_column(conn, "students", "bus_stop_lng", "bus_stop_lng REAL", report)
-        _ensure_column(conn, "students", "bus_stop_label", "bus_stop_label TEXT", report)
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 010: student academic fields
-    migration = "010_student_academic_fields"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(conn, "students", "education_type", "education_type TEXT", report)
-        _ensure_column(conn, "students", "college_year", "college_year TEXT", report)
-        _ensure_column(conn, "students", "college_department", "college_department TEXT", report)
-        _ensure_column(conn, "students", "school_class", "school_class TEXT", report)
-        _ensure_column(conn, "students", "school_division", "school_division TEXT", report)
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 011: college type field
-    migration = "011_student_college_type"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(conn, "students", "college_type", "college_type TEXT", report)
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 012: admin requests queue
-    migration = "012_admin_requests"
-    if not _is_migration_applied(conn, migration):
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS admin_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                request_type TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'PENDING',
-                requester_role TEXT,
-                requester_id TEXT,
-                payload TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                reviewed_at TIMESTAMP,
-                reviewed_by TEXT,
-                reviewed_notes TEXT
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            trip_id INTEGER NOT NULL,
+            trip_type TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            provider_sid TEXT,
+            error_message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(student_id, trip_id, event_type)
         )
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 013: driver shifts
-    migration = "013_driver_shifts"
-    if not _is_migration_applied(conn, migration):
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS driver_shifts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                driver_id TEXT NOT NULL,
-                punch_in_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                punch_out_at TIMESTAMP,
-                status TEXT NOT NULL DEFAULT 'ACTIVE',
-                FOREIGN KEY (driver_id) REFERENCES drivers(driver_id)
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notification_settings (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            stop_radius_meters INTEGER DEFAULT 150,
+            timezone TEXT DEFAULT 'Asia/Kolkata',
+            boarded_template TEXT DEFAULT 'Bus update: {student_name} boarded bus {bus_number}.',
+            missed_template TEXT DEFAULT 'Alert: {student_name} has not boarded bus {bus_number} after the stop was passed.',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 014: attendance trip fields
-    migration = "014_attendance_trip_fields"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(conn, "attendance", "trip_id", "trip_id INTEGER", report)
-        _ensure_column(conn, "attendance", "trip_type", "trip_type TEXT", report)
-        _ensure_column(conn, "attendance", "bus_number", "bus_number TEXT", report)
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 015: notification absent templates
-    migration = "015_notification_absent_templates"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(
-            conn,
-            "notification_settings",
-            "absent_school_template",
-            "absent_school_template TEXT",
-            report,
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO notification_settings (id) VALUES (1)
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS trip_student_state (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trip_id INTEGER NOT NULL,
+            student_id TEXT NOT NULL,
+            last_distance_m REAL,
+            min_distance_m REAL,
+            reached_stop INTEGER DEFAULT 0,
+            passed_stop INTEGER DEFAULT 0,
+            last_evaluated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(trip_id, student_id)
         )
-        _ensure_column(
-            conn,
-            "notification_settings",
-            "absent_home_template",
-            "absent_home_template TEXT",
-            report,
+        """
+    )
+
+
+# Migration 006: indexes for trip/location/notification performance
+def _migrate_006_trip_alert_indexes(conn, report):
+    _ensure_index(
+        conn,
+        "idx_bus_trips_driver_status",
+        "CREATE INDEX IF NOT EXISTS idx_bus_trips_driver_status ON bus_trips(driver_id, status)",
+        report,
+    )
+    _ensure_index(
+        conn,
+        "idx_bus_trips_bus_status",
+        "CREATE INDEX IF NOT EXISTS idx_bus_trips_bus_status ON bus_trips(bus_number, status)",
+        report,
+    )
+    _ensure_index(
+        conn,
+        "idx_bus_locations_trip_time",
+        "CREATE INDEX IF NOT EXISTS idx_bus_locations_trip_time ON bus_locations(trip_id, timestamp)",
+        report,
+    )
+    _ensure_index(
+        conn,
+        "idx_notifications_student_time",
+        "CREATE INDEX IF NOT EXISTS idx_notifications_student_time ON notifications(student_id, created_at)",
+        report,
+    )
+    _ensure_index(
+        conn,
+        "idx_notifications_trip_type",
+        "CREATE INDEX IF NOT EXISTS idx_notifications_trip_type ON notifications(trip_id, event_type)",
+        report,
+    )
+
+
+# Migration 007: ensure bus_locations.timestamp exists (older DBs)
+def _migrate_007_bus_locations_timestamp(conn, report):
+    # SQLite cannot add a column with non-constant default via ALTER TABLE.
+    _ensure_column(conn, "bus_locations", "timestamp", "timestamp TEXT", report)
+
+
+# Migration 008: ensure bus_locations driver metadata columns exist
+def _migrate_008_bus_locations_metadata(conn, report):
+    _ensure_column(conn, "bus_locations", "driver_id", "driver_id TEXT", report)
+    _ensure_column(conn, "bus_locations", "bus_number", "bus_number TEXT", report)
+    _ensure_column(conn, "bus_locations", "recorded_at", "recorded_at TEXT", report)
+
+
+# Migration 009: ensure notification_settings columns exist on older DBs
+def _migrate_009_notification_settings_columns(conn, report):
+    _ensure_column(conn, "notification_settings", "stop_radius_meters", "stop_radius_meters INTEGER DEFAULT 150", report)
+    _ensure_column(conn, "notification_settings", "timezone", "timezone TEXT DEFAULT 'Asia/Kolkata'", report)
+    _ensure_column(conn, "notification_settings", "boarded_template", "boarded_template TEXT", report)
+    _ensure_column(conn, "notification_settings", "missed_template", "missed_template TEXT", report)
+    _ensure_column(conn, "notification_settings", "updated_at", "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP", report)
+    conn.execute("INSERT OR IGNORE INTO notification_settings (id) VALUES (1)")
+
+
+# Migration 016: precomputed face embeddings per student photo and model
+def _migrate_016_student_embeddings(conn, report):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS student_embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            model_name TEXT NOT NULL,
+            dim INTEGER NOT NULL,
+            vector BLOB NOT NULL,
+            photo_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(student_id, model_name, photo_hash)
         )
-        conn.execute("INSERT OR IGNORE INTO notification_settings (id) VALUES (1)")
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
+        """
+    )
+    _ensure_index(
+        conn,
+        "idx_student_embeddings_model",
+        "CREATE INDEX IF NOT EXISTS idx_student_embeddings_model ON student_embeddings(model_name, student_id)",
+        report,
+    )
 
-    # Migration 005: trips + locations + notifications tables
-    migration = "005_trip_and_alert_tables"
-    if not _is_migration_applied(conn, migration):
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS bus_trips (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                driver_id TEXT NOT NULL,
-                bus_number TEXT NOT NULL,
-                trip_type TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'ACTIVE',
-                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ended_at TIMESTAMP,
-                service_date TEXT NOT NULL
-            )
-            """
+
+# Migration 017: one attendance row per (student, day, trip type), enforced by the schema
+def _migrate_017_attendance_unique(conn, report):
+    # Keep the first mark of each duplicate group. Legacy rows without a
+    # trip_type never conflict in a UNIQUE index and are left alone.
+    removed = conn.execute(
+        """
+        DELETE FROM attendance
+        WHERE trip_type IS NOT NULL
+          AND id NOT IN (
+              SELECT MIN(id) FROM attendance
+              WHERE trip_type IS NOT NULL
+              GROUP BY student_id, date, trip_type
+          )
+        """
+    ).rowcount
+    report["attendance_duplicates_removed"] = removed
+    _ensure_index(
+        conn,
+        "idx_attendance_student_date_trip",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_student_date_trip ON attendance(student_id, date, trip_type)",
+        report,
+    )
+
+
+# Migration 018: integer epoch columns so time-range queries can use indexes
+def _migrate_018_epoch_timestamps(conn, report):
+    _ensure_epoch_column(
+        conn, "driver_logs",
+        "CAST(strftime('%s', {row}timestamp) AS INTEGER)",
+        ["timestamp"], report,
+    )
+    _ensure_epoch_column(
+        conn, "bus_locations",
+        "CAST(strftime('%s', COALESCE({row}timestamp, {row}recorded_at)) AS INTEGER)",
+        ["timestamp", "recorded_at"], report,
+    )
+    _ensure_epoch_column(
+        conn, "driver_shifts",
+        "CAST(strftime('%s', {row}punch_in_at) AS INTEGER)",
+        ["punch_in_at"], report,
+    )
+    _ensure_epoch_column(
+        conn, "notifications",
+        "CAST(strftime('%s', {row}created_at) AS INTEGER)",
+        ["created_at"], report,
+    )
+    # attendance date/time are server-local wall clock (datetime.now()).
+    _ensure_epoch_column(
+        conn, "attendance",
+        "CAST(strftime('%s', {row}date || ' ' || COALESCE({row}time, '00:00:00'), 'utc') AS INTEGER)",
+        ["date", "time"], report,
+    )
+    for index_name, index_sql in (
+        ("idx_driver_logs_driver_epoch", "CREATE INDEX IF NOT EXISTS idx_driver_logs_driver_epoch ON driver_logs(driver_id, ts_epoch)"),
+        ("idx_driver_logs_student_epoch", "CREATE INDEX IF NOT EXISTS idx_driver_logs_student_epoch ON driver_logs(student_id, ts_epoch)"),
+        ("idx_bus_locations_trip_epoch", "CREATE INDEX IF NOT EXISTS idx_bus_locations_trip_epoch ON bus_locations(trip_id, ts_epoch)"),
+        ("idx_driver_shifts_driver_epoch", "CREATE INDEX IF NOT EXISTS idx_driver_shifts_driver_epoch ON driver_shifts(driver_id, ts_epoch)"),
+        ("idx_driver_shifts_epoch", "CREATE INDEX IF NOT EXISTS idx_driver_shifts_epoch ON driver_shifts(ts_epoch)"),
+        ("idx_notifications_epoch", "CREATE INDEX IF NOT EXISTS idx_notifications_epoch ON notifications(ts_epoch)"),
+        ("idx_notifications_student_epoch", "CREATE INDEX IF NOT EXISTS idx_notifications_student_epoch ON notifications(student_id, ts_epoch)"),
+        ("idx_attendance_epoch", "CREATE INDEX IF NOT EXISTS idx_attendance_epoch ON attendance(ts_epoch)"),
+    ):
+        _ensure_index(conn, index_name, index_sql, report)
+
+
+# Migration 019: day-range scans for the archiver (database/archive.py)
+def _migrate_019_archive_epoch_indexes(conn, report):
+    for index_name, index_sql in (
+        ("idx_bus_locations_epoch", "CREATE INDEX IF NOT EXISTS idx_bus_locations_epoch ON bus_locations(ts_epoch)"),
+        ("idx_driver_logs_epoch", "CREATE INDEX IF NOT EXISTS idx_driver_logs_epoch ON driver_logs(ts_epoch)"),
+    ):
+        _ensure_index(conn, index_name, index_sql, report)
+
+
+# Migration 020: current on-bus state per student, kept with each driver_logs insert
+def _migrate_020_student_presence(conn, report):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS student_presence (
+            student_id TEXT PRIMARY KEY,
+            driver_id TEXT NOT NULL,
+            bus_number TEXT,
+            state TEXT NOT NULL,
+            since INTEGER NOT NULL,
+            log_id INTEGER NOT NULL
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS bus_locations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                trip_id INTEGER NOT NULL,
-                source TEXT NOT NULL,
-                lat REAL NOT NULL,
-                lng REAL NOT NULL,
-                speed REAL,
-                heading REAL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (trip_id) REFERENCES bus_trips(id)
+        """
+    )
+    for index_name, index_sql in (
+        ("idx_student_presence_driver_state", "CREATE INDEX IF NOT EXISTS idx_student_presence_driver_state ON student_presence(driver_id, state)"),
+        ("idx_student_presence_bus_state", "CREATE INDEX IF NOT EXISTS idx_student_presence_bus_state ON student_presence(bus_number, state)"),
+    ):
+        _ensure_index(conn, index_name, index_sql, report)
+    # Runs inside the inserting statement, so the log row and the
+    # presence row commit (or roll back) together. ts_epoch may not be
+    # filled yet when this fires, hence the fallback.
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_driver_logs_presence
+        AFTER INSERT ON driver_logs
+        BEGIN
+            INSERT INTO student_presence (student_id, driver_id, bus_number, state, since, log_id)
+            VALUES (
+                NEW.student_id,
+                NEW.driver_id,
+                (SELECT bus_number FROM drivers WHERE driver_id = NEW.driver_id),
+                NEW.action,
+                COALESCE(NEW.ts_epoch, CAST(strftime('%s', NEW.timestamp) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)),
+                NEW.id
             )
-            """
+            ON CONFLICT(student_id) DO UPDATE SET
+                driver_id = excluded.driver_id,
+                bus_number = excluded.bus_number,
+                state = excluded.state,
+                since = excluded.since,
+                log_id = excluded.log_id
+            WHERE (excluded.since, excluded.log_id) >= (student_presence.since, student_presence.log_id);
+        END
+        """
+    )
+    rebuild_student_presence(conn)
+
+
+# Migration 021: per-day boarding/attendance counters for dashboards and reports
+def _migrate_021_daily_trip_stats(conn, report):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_trip_stats (
+            date TEXT NOT NULL,
+            bus_number TEXT NOT NULL DEFAULT '',
+            driver_id TEXT NOT NULL DEFAULT '',
+            trip_type TEXT NOT NULL DEFAULT '',
+            boarded INTEGER NOT NULL DEFAULT 0,
+            alighted INTEGER NOT NULL DEFAULT 0,
+            attended INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, bus_number, driver_id, trip_type)
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id TEXT NOT NULL,
-                trip_id INTEGER NOT NULL,
-                trip_type TEXT NOT NULL,
-                event_type TEXT NOT NULL,
-                status TEXT NOT NULL,
-                provider_sid TEXT,
-                error_message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(student_id, trip_id, event_type)
+        """
+    )
+    _ensure_index(
+        conn,
+        "idx_daily_trip_stats_driver_date",
+        "CREATE INDEX IF NOT EXISTS idx_daily_trip_stats_driver_date ON daily_trip_stats(driver_id, date)",
+        report,
+    )
+    # Counters move inside the inserting statement, like student_presence.
+    # Boarding counts only students assigned to the driver's bus, as the
+    # dashboard queries did; the trip type is the driver's ACTIVE trip.
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_driver_logs_daily_stats
+        AFTER INSERT ON driver_logs
+        WHEN (SELECT bus_number FROM students WHERE student_id = NEW.student_id)
+           = (SELECT bus_number FROM drivers WHERE driver_id = NEW.driver_id)
+        BEGIN
+            INSERT INTO daily_trip_stats (date, bus_number, driver_id, trip_type, boarded, alighted)
+            VALUES (
+                date(NEW.timestamp),
+                (SELECT bus_number FROM drivers WHERE driver_id = NEW.driver_id),
+                NEW.driver_id,
+                COALESCE((
+                    SELECT trip_type FROM bus_trips
+                    WHERE driver_id = NEW.driver_id AND status = 'ACTIVE'
+                    ORDER BY started_at DESC
+                    LIMIT 1
+                ), ''),
+                NEW.action = 'IN',
+                NEW.action = 'OUT'
             )
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS notification_settings (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                stop_radius_meters INTEGER DEFAULT 150,
-                timezone TEXT DEFAULT 'Asia/Kolkata',
-                boarded_template TEXT DEFAULT 'Bus update: {student_name} boarded bus {bus_number}.',
-                missed_template TEXT DEFAULT 'Alert: {student_name} has not boarded bus {bus_number} after the stop was passed.',
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ON CONFLICT(date, bus_number, driver_id, trip_type) DO UPDATE SET
+                boarded = boarded + excluded.boarded,
+                alighted = alighted + excluded.alighted;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_attendance_daily_stats
+        AFTER INSERT ON attendance
+        BEGIN
+            INSERT INTO daily_trip_stats (date, bus_number, driver_id, trip_type, attended)
+            VALUES (
+                NEW.date,
+                COALESCE(NEW.bus_number, ''),
+                COALESCE((SELECT driver_id FROM bus_trips WHERE id = NEW.trip_id), ''),
+                COALESCE(NEW.trip_type, ''),
+                1
             )
-            """
-        )
-        conn.execute(
-            """
-            INSERT OR IGNORE INTO notification_settings (id) VALUES (1)
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS trip_student_state (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                trip_id INTEGER NOT NULL,
-                student_id TEXT NOT NULL,
-                last_distance_m REAL,
-                min_distance_m REAL,
-                reached_stop INTEGER DEFAULT 0,
-                passed_stop INTEGER DEFAULT 0,
-                last_evaluated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(trip_id, student_id)
+            ON CONFLICT(date, bus_number, driver_id, trip_type) DO UPDATE SET
+                attended = attended + 1;
+        END
+        """
+    )
+    rebuild_daily_stats(conn)
+
+
+def _migrate_022_daily_stats_local_day(conn, report):
+    # Boardings were keyed by the UTC date of driver_logs.timestamp while
+    # attendance uses the local date; key both by the local day.
+    conn.execute("DROP TRIGGER IF EXISTS trg_driver_logs_daily_stats")
+    conn.execute(
+        """
+        CREATE TRIGGER trg_driver_logs_daily_stats
+        AFTER INSERT ON driver_logs
+        WHEN (SELECT bus_number FROM students WHERE student_id = NEW.student_id)
+           = (SELECT bus_number FROM drivers WHERE driver_id = NEW.driver_id)
+        BEGIN
+            INSERT INTO daily_trip_stats (date, bus_number, driver_id, trip_type, boarded, alighted)
+            VALUES (
+                date(NEW.timestamp, 'localtime'),
+                (SELECT bus_number FROM drivers WHERE driver_id = NEW.driver_id),
+                NEW.driver_id,
+                COALESCE((
+                    SELECT trip_type FROM bus_trips
+                    WHERE driver_id = NEW.driver_id AND status = 'ACTIVE'
+                    ORDER BY started_at DESC
+                    LIMIT 1
+                ), ''),
+                NEW.action = 'IN',
+                NEW.action = 'OUT'
             )
-            """
-        )
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 006: indexes for trip/location/notification performance
-    migration = "006_trip_alert_indexes"
-    if not _is_migration_applied(conn, migration):
-        _ensure_index(
-            conn,
-            "idx_bus_trips_driver_status",
-            "CREATE INDEX IF NOT EXISTS idx_bus_trips_driver_status ON bus_trips(driver_id, status)",
-            report,
-        )
-        _ensure_index(
-            conn,
-            "idx_bus_trips_bus_status",
-            "CREATE INDEX IF NOT EXISTS idx_bus_trips_bus_status ON bus_trips(bus_number, status)",
-            report,
-        )
-        _ensure_index(
-            conn,
-            "idx_bus_locations_trip_time",
-            "CREATE INDEX IF NOT EXISTS idx_bus_locations_trip_time ON bus_locations(trip_id, timestamp)",
-            report,
-        )
-        _ensure_index(
-            conn,
-            "idx_notifications_student_time",
-            "CREATE INDEX IF NOT EXISTS idx_notifications_student_time ON notifications(student_id, created_at)",
-            report,
-        )
-        _ensure_index(
-            conn,
-            "idx_notifications_trip_type",
-            "CREATE INDEX IF NOT EXISTS idx_notifications_trip_type ON notifications(trip_id, event_type)",
-            report,
-        )
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 007: ensure bus_locations.timestamp exists (older DBs)
-    migration = "007_bus_locations_timestamp"
-    if not _is_migration_applied(conn, migration):
-        # SQLite cannot add a column with non-constant default via ALTER TABLE.
-        _ensure_column(conn, "bus_locations", "timestamp", "timestamp TEXT", report)
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 008: ensure bus_locations driver metadata columns exist
-    migration = "008_bus_locations_metadata"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(conn, "bus_locations", "driver_id", "driver_id TEXT", report)
-        _ensure_column(conn, "bus_locations", "bus_number", "bus_number TEXT", report)
-        _ensure_column(conn, "bus_locations", "recorded_at", "recorded_at TEXT", report)
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    # Migration 009: ensure notification_settings columns exist on older DBs
-    migration = "009_notification_settings_columns"
-    if not _is_migration_applied(conn, migration):
-        _ensure_column(conn, "notification_settings", "stop_radius_meters", "stop_radius_meters INTEGER DEFAULT 150", report)
-        _ensure_column(conn, "notification_settings", "timezone", "timezone TEXT DEFAULT 'Asia/Kolkata'", report)
-        _ensure_column(conn, "notification_settings", "boarded_template", "boarded_template TEXT", report)
-        _ensure_column(conn, "notification_settings", "missed_template", "missed_template TEXT", report)
-        _ensure_column(conn, "notification_settings", "updated_at", "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP", report)
-        conn.execute("INSERT OR IGNORE INTO notification_settings (id) VALUES (1)")
-        _mark_migration_applied(conn, migration)
-        report["migrations_applied"].append(migration)
-
-    conn.commit()
-    conn.close()
+            ON CONFLICT(date, bus_number, driver_id, trip_type) DO UPDATE SET
+                boarded = boarded + excluded.boarded,
+                alighted = alighted + excluded.alighted;
+        END
+        """
+    )
+    # Days whose logs were already archived keep their UTC-keyed counts.
+    rebuild_daily_stats(conn)
+
+
+# Applied in this order (not by number: 005-009 were added after 010-015).
+# Add new migrations at the end; the list length is the schema version
+# stamped into PRAGMA user_version.
+MIGRATIONS = [
+    ("001_students_columns", _migrate_001_students_columns),
+    ("002_attendance_direction", _migrate_002_attendance_direction),
+    ("003_indexes", _migrate_003_indexes),
+    ("004_student_alert_columns", _migrate_004_student_alert_columns),
+    ("010_student_academic_fields", _migrate_010_student_academic_fields),
+    ("011_student_college_type", _migrate_011_student_college_type),
+    ("012_admin_requests", _migrate_012_admin_requests),
+    ("013_driver_shifts", _migrate_013_driver_shifts),
+    ("014_attendance_trip_fields", _migrate_014_attendance_trip_fields),
+    ("015_notification_absent_templates", _migrate_015_notification_absent_templates),
+    ("005_trip_and_alert_tables", _migrate_005_trip_and_alert_tables),
+    ("006_trip_alert_indexes", _migrate_006_trip_alert_indexes),
+    ("007_bus_locations_timestamp", _migrate_007_bus_locations_timestamp),
+    ("008_bus_locations_metadata", _migrate_008_bus_locations_metadata),
+    ("009_notification_settings_columns", _migrate_009_notification_settings_columns),
+    ("016_student_embeddings", _migrate_016_student_embeddings),
+    ("017_attendance_unique", _migrate_017_attendance_unique),
+    ("018_epoch_timestamps", _migrate_018_epoch_timestamps),
+    ("019_archive_epoch_indexes", _migrate_019_archive_epoch_indexes),
+    ("020_student_presence", _migrate_020_student_presence),
+    ("021_daily_trip_stats", _migrate_021_daily_trip_stats),
+    ("022_daily_stats_local_day", _migrate_022_daily_stats_local_day),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def init_db(path=None):
+    """
+    Creates/migrates the database at `path` (default DB_PATH). A database
+    whose user_version already equals SCHEMA_VERSION is left untouched;
+    otherwise schema.sql and every pending migration run in one
+    transaction, which also stamps the new user_version.
+    """
+    report = {
+        "migrations_applied": [],
+        "columns_added": [],
+        "indexes_added": [],
+    }
+    conn = get_connection() if path is None else _acquire(resolve_db_path(path))
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            return report
+
+        with open(SCHEMA_PATH, 'r') as f:
+            schema_sql = f.read()
+        # Base schema (idempotent). executescript() commits any open
+        # transaction before it runs, so the transaction is opened by the
+        # script itself and stays open for the migrations. IMMEDIATE makes a
+        # second process starting at the same time wait here, then find the
+        # work already done.
+        conn.executescript("BEGIN IMMEDIATE;\n" + schema_sql)
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            conn.rollback()
+            return report
+
+        _ensure_migrations_table(conn)
+
+        for migration, migrate in MIGRATIONS:
+            if not _is_migration_applied(conn, migration):
+                migrate(conn, report)
+                _mark_migration_applied(conn, migration)
+                report["migrations_applied"].append(migration)
+
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
     return report
 
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+"""
+Per-statement latency and row counts for pooled connections.
+
+Every statement run through get_connection() is timed from execute()
+until its rows have been fetched, and aggregated by query shape (the SQL
+with literals and IN-lists collapsed). Statements slower than
+SLOW_QUERY_MS are logged with their EXPLAIN QUERY PLAN; plans that SCAN a
+table are flagged. GET /admin/query-stats serves the aggregates.
+
+Off by default (the wrapper costs a few microseconds per call);
+DB_QUERY_PROFILE=1 turns it on.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+PROFILE_ENABLED = os.getenv("DB_QUERY_PROFILE", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def query_shape(sql: str) -> str:
+    shape = _STRING_RE.sub("?", sql)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("(?, ...)", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shapes: Dict[str, dict] = {}
+
+    def record(
+        self, conn: sqlite3.Connection, sql: str, params, elapsed_ms: float, rows: int
+    ) -> None:
+        shape = query_shape(sql)
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                entry = self._shapes[shape] = {
+                    "query": shape,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "slow": 0,
+                    "plan": None,
+                    "full_scan": False,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["rows"] += max(rows, 0)
+            slow = elapsed_ms >= SLOW_QUERY_MS
+            if slow:
+                entry["slow"] += 1
+            need_plan = slow and entry["plan"] is None
+
+        if not slow:
+            return
+        if need_plan:
+            plan = _explain(conn, sql, params)
+            with self._lock:
+                entry["plan"] = plan
+                entry["full_scan"] = any(step.startswith("SCAN ") for step in plan)
+        logger.warning(
+            "[SLOW SQL] %.1f ms, %d row(s)%s: %s | plan: %s",
+            elapsed_ms,
+            rows,
+            " (full scan)" if entry["full_scan"] else "",
+            shape,
+            "; ".join(entry["plan"] or []),
+        )
+
+    def snapshot(self, sort: str = "total_ms", limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            entries = [dict(entry) for entry in self._shapes.values()]
+        for entry in entries:
+            entry["mean_ms"] = entry["total_ms"] / entry["count"]
+        entries.sort(key=lambda entry: entry.get(sort) or 0, reverse=True)
+        return entries[:limit] if limit else entries
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+
+
+STATS = QueryStats()
+
+
+def _explain(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+    if params is None:
+        return ["not explained (executemany)"]
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    except sqlite3.Error as exc:
+        return [f"unavailable: {exc}"]
+    return [row[3] for row in rows]
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    Times each statement from execute() until its result is exhausted (or
+    the cursor is reused, closed or dropped) and reports it to STATS.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sql = None
+        self._params = None
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _finish(self) -> None:
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        rows = self._rows if self.description is not None else self.rowcount
+        STATS.record(self.connection, sql, self._params, self._elapsed * 1000.0, rows)
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._elapsed = 0.0
+        self._rows = 0
+        self._timed(super().execute, sql, parameters)
+        self._sql, self._params = sql, parameters
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._elapsed = 0.0
+        self._rows = 0
+        self._timed(super().executemany, sql, seq_of_parameters)
+        # A batch isn't explainable with one parameter set.
+        STATS.record(self.connection, sql, None, self._elapsed * 1000.0, self.rowcount)
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size or self.arraysize)
+        self._rows += len(rows)
+        if len(rows) < (size or self.arraysize):
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
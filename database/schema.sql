@@ -40,7 +40,8 @@ CREATE TABLE IF NOT EXISTS attendance (
     direction TEXT DEFAULT 'IN',
     trip_id INTEGER,
     trip_type TEXT,
-    bus_number TEXT
+    bus_number TEXT,
+    ts_epoch INTEGER -- UTC unix seconds of date + time (kept by trigger)
 );
 
 -- Drivers table
@@ -61,10 +62,34 @@ CREATE TABLE IF NOT EXISTS driver_logs (
     student_id TEXT NOT NULL,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     action TEXT NOT NULL DEFAULT 'IN',
+    ts_epoch INTEGER, -- UTC unix seconds of timestamp (kept by trigger)
     FOREIGN KEY (driver_id) REFERENCES drivers(driver_id),
     FOREIGN KEY (student_id) REFERENCES students(student_id)
 );
 
+-- Latest driver_logs entry per student (kept by trigger trg_driver_logs_presence)
+CREATE TABLE IF NOT EXISTS student_presence (
+    student_id TEXT PRIMARY KEY,
+    driver_id TEXT NOT NULL,
+    bus_number TEXT,
+    state TEXT NOT NULL, -- IN | OUT
+    since INTEGER NOT NULL, -- ts_epoch of that log
+    log_id INTEGER NOT NULL -- driver_logs.id, breaks ties within a second
+);
+
+-- Per-day counters (kept by triggers on driver_logs and attendance; see
+-- rebuild_daily_stats). Empty strings stand in for missing keys.
+CREATE TABLE IF NOT EXISTS daily_trip_stats (
+    date TEXT NOT NULL, -- local day: of driver_logs.timestamp (UTC) / attendance.date
+    bus_number TEXT NOT NULL DEFAULT '',
+    driver_id TEXT NOT NULL DEFAULT '',
+    trip_type TEXT NOT NULL DEFAULT '',
+    boarded INTEGER NOT NULL DEFAULT 0,
+    alighted INTEGER NOT NULL DEFAULT 0,
+    attended INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, bus_number, driver_id, trip_type)
+);
+
 CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance(student_id, date);
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_students_bus_number ON students(bus_number);
@@ -97,6 +122,7 @@ CREATE TABLE IF NOT EXISTS bus_locations (
     heading REAL,
     recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     timestamp TEXT,
+    ts_epoch INTEGER, -- UTC unix seconds of COALESCE(timestamp, recorded_at) (kept by trigger)
     FOREIGN KEY (trip_id) REFERENCES bus_trips(id)
 );
 
@@ -111,6 +137,7 @@ CREATE TABLE IF NOT EXISTS notifications (
     provider_sid TEXT,
     error_message TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ts_epoch INTEGER, -- UTC unix seconds of created_at (kept by trigger)
     UNIQUE(student_id, trip_id, event_type)
 );
 
@@ -160,11 +187,25 @@ CREATE TABLE IF NOT EXISTS driver_shifts (
     punch_in_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     punch_out_at TIMESTAMP,
     status TEXT NOT NULL DEFAULT 'ACTIVE', -- ACTIVE | CLOSED
+    ts_epoch INTEGER, -- UTC unix seconds of punch_in_at (kept by trigger)
     FOREIGN KEY (driver_id) REFERENCES drivers(driver_id)
 );
 
+-- Face embeddings precomputed from students' photos (one row per photo per model)
+CREATE TABLE IF NOT EXISTS student_embeddings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT NOT NULL,
+    model_name TEXT NOT NULL, -- recognition pack, e.g. buffalo_s
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL, -- little-endian float32[dim]
+    photo_hash TEXT NOT NULL, -- sha256 of the source photo
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(student_id, model_name, photo_hash)
+);
+
 CREATE INDEX IF NOT EXISTS idx_bus_trips_driver_status ON bus_trips(driver_id, status);
 CREATE INDEX IF NOT EXISTS idx_bus_trips_bus_status ON bus_trips(bus_number, status);
 CREATE INDEX IF NOT EXISTS idx_bus_locations_trip_time ON bus_locations(trip_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_notifications_student_time ON notifications(student_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_notifications_trip_type ON notifications(trip_id, event_type);
+CREATE INDEX IF NOT EXISTS idx_student_embeddings_model ON student_embeddings(model_name, student_id);
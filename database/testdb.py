@@ -0,0 +1,90 @@
+"""
+Throwaway databases for tests and benchmarks.
+
+The schema and every migration are applied once per process to a template
+in memory; each new database is a page copy of it (sqlite3 backup API), so
+creating one costs milliseconds regardless of how many migrations exist.
+
+    with isolated_database() as path:   # file in /dev/shm, DB_PATH points at it
+        ...
+
+    path = new_database()   # one per worker
+    db.configure(db_path=path)
+    ...
+    drop_database(path)
+"""
+
+import itertools
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from database import db, write_queue
+
+_counter = itertools.count()
+_template_lock = threading.Lock()
+_template: Optional[str] = None
+
+# RAM-backed where available: file databases get WAL and real locking, so
+# concurrent connections wait on busy_timeout instead of failing with
+# SQLITE_LOCKED as shared-cache memory databases do.
+DEFAULT_DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def _template_path() -> str:
+    global _template
+    with _template_lock:
+        if _template is None:
+            path = f"memory:template_{os.getpid()}"
+            db.init_db(path)
+            _template = path
+        return _template
+
+
+def new_database(memory: bool = False, directory: Optional[str] = None) -> str:
+    """
+    Creates a migrated, empty database and returns its DB_PATH value: a file
+    in `directory` (default DEFAULT_DIRECTORY), or `memory:<name>` when
+    `memory`. Memory databases are for single-connection use only.
+    """
+    name = f"bus_{os.getpid()}_{next(_counter)}"
+    if memory:
+        path = f"memory:{name}"
+    else:
+        path = os.path.join(directory or DEFAULT_DIRECTORY, f"{name}.db")
+
+    source = db._acquire(_template_path())
+    target = db._acquire(path)
+    try:
+        source._conn.backup(target._conn)
+    finally:
+        source.close()
+        target.close()
+    return path
+
+
+def drop_database(path: str) -> None:
+    """Stops the writer and closes pooled connections for `path`, then deletes it."""
+    write_queue.close_writer(path)
+    db.close_pool(path)
+    if db.is_memory_path(path):
+        return
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def isolated_database(memory: bool = False, directory: Optional[str] = None) -> Iterator[str]:
+    """Points DB_PATH at a fresh database for the block, then drops it."""
+    path = new_database(memory=memory, directory=directory)
+    previous_path, _ = db.configure(db_path=path)
+    try:
+        yield path
+    finally:
+        db.configure(db_path=previous_path)
+        drop_database(path)
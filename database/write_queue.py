@@ -0,0 +1,204 @@
+"""
+Single-writer group commit for high-frequency inserts.
+
+GPS pings (bus_locations), boarding logs (driver_logs) and attendance rows
+are handed to one writer thread instead of each request opening its own
+write transaction. The writer takes everything queued (up to
+WRITE_BATCH_ROWS statements, for at most WRITE_BATCH_MS milliseconds) into
+one transaction and commits it. Under load, the writes that arrive while one
+batch commits form the next one, so a burst of requests shares a few
+commits and request threads stop contending for the writer lock; a lone
+write on an idle queue commits at once.
+
+    future = submit("INSERT INTO bus_locations (...) VALUES (...)", params)
+    future.result()   # only when the caller needs the row to be committed
+
+The future resolves to the statement's rowcount once its batch has
+committed, or raises the statement's error (a failing statement doesn't
+affect the rest of its batch). DB_WRITE_QUEUE=0 runs every statement
+inline on a pooled connection instead.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Sequence, Tuple
+
+from database import db
+
+WRITE_QUEUE_ENABLED = os.getenv("DB_WRITE_QUEUE", "1") == "1"
+WRITE_BATCH_ROWS = int(os.getenv("DB_WRITE_BATCH_ROWS", "200"))
+WRITE_BATCH_MS = float(os.getenv("DB_WRITE_BATCH_MS", "20"))
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+# Fire-and-forget writes (submit_nowait) that failed, by label.
+dropped = {}
+_dropped_lock = threading.Lock()
+
+
+class WriteQueue:
+    """
+    One writer thread and its own connection for the database at `path`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_rows: int = WRITE_BATCH_ROWS,
+        batch_ms: float = WRITE_BATCH_MS,
+    ):
+        self.path = path
+        self.batch_rows = max(1, batch_rows)
+        self.batch_ms = batch_ms
+        self.stats = {"statements": 0, "batches": 0, "errors": 0}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params: Sequence = (), many: bool = False) -> Future:
+        future: Future = Future()
+        self._queue.put((sql, params, many, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Waits until everything submitted so far is committed."""
+        self.submit("SELECT 1").result(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _next_batch(self) -> Tuple[List[tuple], bool]:
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_ms / 1000.0
+        # Take what is already queued (jobs that arrived during the previous
+        # commit); don't sit idle waiting for more.
+        while len(batch) < self.batch_rows and time.monotonic() < deadline:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run(self) -> None:
+        pooled = db._connect(self.path)
+        conn = pooled._conn
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+            results = []
+            for sql, params, many, future in batch:
+                try:
+                    cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+                    results.append((future, cursor.rowcount, None))
+                except Exception as exc:
+                    self.stats["errors"] += 1
+                    results.append((future, None, exc))
+            try:
+                conn.commit()
+            except Exception as exc:
+                conn.rollback()
+                self.stats["errors"] += len(batch)
+                results = [(future, None, exc) for future, _, _ in results]
+            self.stats["statements"] += len(batch)
+            self.stats["batches"] += 1
+            for future, rowcount, exc in results:
+                if exc is not None:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(rowcount)
+        conn.close()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteQueue:
+    """The writer for the current db.DB_PATH, started on first use."""
+    with _queues_lock:
+        writer = _queues.get(db.DB_PATH)
+        if writer is None:
+            writer = _queues[db.DB_PATH] = WriteQueue(db.DB_PATH)
+        return writer
+
+
+def submit(sql: str, params: Sequence = (), many: bool = False) -> Future:
+    """
+    Queues one write. The returned future resolves to its rowcount after
+    commit; callers that don't need durability can ignore it.
+    """
+    if WRITE_QUEUE_ENABLED:
+        return get_write_queue().submit(sql, params, many)
+
+    future: Future = Future()
+    conn = db.get_connection()
+    try:
+        cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+        conn.commit()
+        future.set_result(cursor.rowcount)
+    except Exception as exc:
+        future.set_exception(exc)
+    finally:
+        conn.close()
+    return future
+
+
+def _log_dropped(label: str, future: Future) -> None:
+    exc = future.exception()
+    if exc is None:
+        return
+    with _dropped_lock:
+        dropped[label] = dropped.get(label, 0) + 1
+        count = dropped[label]
+    logger.error("[WRITE QUEUE] %s write dropped (%d so far): %s", label, count, exc)
+
+
+def submit_nowait(sql: str, params: Sequence = (), label: str = "write") -> Future:
+    """
+    submit() for callers that don't wait: a failure is logged and counted
+    in `dropped[label]` instead of disappearing with the unread future.
+    """
+    future = submit(sql, params)
+    future.add_done_callback(lambda done: _log_dropped(label, done))
+    return future
+
+
+def execute(sql: str, params: Sequence = (), timeout: Optional[float] = None) -> int:
+    """submit() and wait for the commit; returns the rowcount."""
+    return submit(sql, params).result(timeout)
+
+
+def close_writer(path: str, timeout: Optional[float] = 5.0) -> None:
+    """Commits what's queued for `path` and stops its writer, if one is running."""
+    with _queues_lock:
+        writer = _queues.pop(path, None)
+    if writer is not None:
+        writer.close(timeout)
+
+
+def close_all(timeout: Optional[float] = 5.0) -> None:
+    """Commits what's queued and stops the writers (runs at exit)."""
+    with _queues_lock:
+        writers = list(_queues.values())
+        _queues.clear()
+    for writer in writers:
+        writer.close(timeout)
+
+
+atexit.register(close_all)
@@ -0,0 +1,141 @@
+"""
+Detector backend benchmark on a recording.
+
+    python -m face_engine.detector_bench recordings/run1 \
+        --backends insightface,yunet,onnx --reference insightface
+
+Every frame is resized like the live loop (FRAME_SCALE) and passed to each
+backend. Reports per-backend latency percentiles, and recall / extra
+detections against the reference backend (IoU >= --iou counts as found).
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+
+from face_engine.detectors import DETECTOR_BACKENDS, build_detector
+from face_engine.pipeline import box_iou
+from face_engine.recorder import ReplaySource
+from face_engine.stage_timer import StageHistogram
+
+FRAME_SCALE = 0.5
+
+Box = Tuple[int, int, int, int]
+
+
+def _match_boxes(reference: List[Box], found: List[Box], iou_threshold: float) -> int:
+    """
+    Greedy one-to-one matching; returns how many reference boxes were found.
+    """
+    pairs = sorted(
+        ((box_iou(r, f), ri, fi) for ri, r in enumerate(reference) for fi, f in enumerate(found)),
+        reverse=True,
+    )
+    used_r, used_f = set(), set()
+    for iou, ri, fi in pairs:
+        if iou < iou_threshold:
+            break
+        if ri in used_r or fi in used_f:
+            continue
+        used_r.add(ri)
+        used_f.add(fi)
+    return len(used_r)
+
+
+def run_benchmark(
+    recording: str,
+    backends: Sequence[str],
+    reference: str,
+    frame_scale: float = FRAME_SCALE,
+    iou_threshold: float = 0.5,
+    limit: int = 0,
+    warmup: int = 5,
+) -> Dict[str, Dict[str, object]]:
+    names = list(dict.fromkeys([reference] + list(backends)))
+    detectors = {name: build_detector(name) for name in names}
+    latency = {name: StageHistogram() for name in names}
+    found = {name: 0 for name in names}
+    total = {name: 0 for name in names}
+    reference_faces = 0
+    frames = 0
+
+    source = ReplaySource(recording)
+    if not source.isOpened():
+        raise SystemExit(f"No frames in recording {recording}")
+
+    while True:
+        ret, frame = source.read()
+        if not ret or (limit and frames >= limit):
+            break
+        small_frame = cv2.resize(frame, (0, 0), fx=frame_scale, fy=frame_scale)
+
+        boxes: Dict[str, List[Box]] = {}
+        for name, detector in detectors.items():
+            started = time.perf_counter()
+            detections = detector.detect(small_frame)
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            if frames >= warmup:
+                latency[name].add(elapsed_ms)
+            boxes[name] = [item["bbox"] for item in detections]
+
+        reference_faces += len(boxes[reference])
+        for name in names:
+            total[name] += len(boxes[name])
+            found[name] += _match_boxes(boxes[reference], boxes[name], iou_threshold)
+        frames += 1
+    source.release()
+
+    results: Dict[str, Dict[str, object]] = {}
+    for name in names:
+        recall = found[name] / reference_faces if reference_faces else None
+        results[name] = {
+            "frames": frames,
+            "faces": total[name],
+            "recall": round(recall, 4) if recall is not None else None,
+            "extra": total[name] - found[name],
+            "latency": latency[name].summary(),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare face detector backends on a recording")
+    parser.add_argument("recording")
+    parser.add_argument("--backends", default=",".join(DETECTOR_BACKENDS))
+    parser.add_argument("--reference", default="insightface", help="backend treated as ground truth")
+    parser.add_argument("--scale", type=float, default=FRAME_SCALE, help="frame resize factor")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed to count a face as found")
+    parser.add_argument("--limit", type=int, default=0, help="only use the first N frames")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    results = run_benchmark(
+        args.recording,
+        backends,
+        args.reference,
+        frame_scale=args.scale,
+        iou_threshold=args.iou,
+        limit=args.limit,
+    )
+
+    print(f"{'backend':<12} {'p50 ms':>8} {'p90 ms':>8} {'mean ms':>8} {'faces':>6} {'recall':>7} {'extra':>6}")
+    for name, item in results.items():
+        lat = item["latency"]
+        recall = f"{item['recall']:.3f}" if item["recall"] is not None else "-"
+        print(
+            f"{name:<12} {lat['p50_ms']:>8.2f} {lat['p90_ms']:>8.2f} {lat['mean_ms']:>8.2f} "
+            f"{item['faces']:>6} {recall:>7} {item['extra']:>6}"
+        )
+    print(f"(recall/extra relative to '{args.reference}', IoU >= {args.iou})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
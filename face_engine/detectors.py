@@ -0,0 +1,164 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Backend used when FaceModel isn't told otherwise.
+DETECTOR_BACKEND = os.environ.get("FACE_DETECTOR", "insightface")
+# Model file (yunet) or file / InsightFace pack name (onnx) for the backend.
+DETECTOR_MODEL = os.environ.get("FACE_DETECTOR_MODEL", "")
+DETECTOR_SCORE_THRESHOLD = float(os.environ.get("FACE_DETECTOR_THRESHOLD", "0.5"))
+
+DEFAULT_YUNET_MODEL = os.path.join(BASE_DIR, "models", "face_detection_yunet_2023mar.onnx")
+# InsightFace pack with the small SCRFD-500MF detector.
+DEFAULT_ONNX_PACK = "buffalo_sc"
+
+DETECTOR_BACKENDS = ("insightface", "yunet", "onnx")
+
+
+def _to_detections(bboxes: np.ndarray, kpss: Optional[np.ndarray]) -> List[Dict[str, np.ndarray]]:
+    detections: List[Dict[str, np.ndarray]] = []
+    for i in range(bboxes.shape[0]):
+        x1, y1, x2, y2 = bboxes[i, 0:4].astype(int)
+        detections.append(
+            {
+                "bbox": (int(x1), int(y1), int(x2), int(y2)),
+                "kps": kpss[i].astype(np.float32) if kpss is not None else None,
+                "det_score": float(bboxes[i, 4]),
+            }
+        )
+    return detections
+
+
+class ScrfdDetector:
+    """
+    InsightFace SCRFD detector (the one bundled in a FaceAnalysis pack, or a
+    standalone ONNX file such as the 500MF model from buffalo_sc).
+    """
+
+    def __init__(self, det_model, name: str = "insightface"):
+        self.name = name
+        self._model = det_model
+
+    def detect(
+        self,
+        frame_bgr: np.ndarray,
+        threshold: Optional[float] = None,
+        native: bool = False,
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        threshold: score cut-off for this call (default: the model's).
+        native: run at the image's own size instead of det_size (for small
+            crops, which would otherwise be upscaled to det_size).
+        """
+        input_size = None
+        if native:
+            h, w = frame_bgr.shape[:2]
+            input_size = ((w + 31) // 32 * 32, (h + 31) // 32 * 32)
+        saved = self._model.det_thresh
+        if threshold is not None:
+            self._model.det_thresh = threshold
+        try:
+            bboxes, kpss = self._model.detect(
+                frame_bgr, input_size=input_size, max_num=0, metric="default"
+            )
+        finally:
+            self._model.det_thresh = saved
+        return _to_detections(bboxes, kpss)
+
+
+class YuNetDetector:
+    """
+    OpenCV's DNN face detector (cv2.FaceDetectorYN, YuNet).
+
+    Gives the same 5 landmarks as SCRFD (eyes, nose, mouth corners, in image
+    left-to-right order), so the aligned crops for the recognizer don't change.
+    Inputs larger than `max_size` are downscaled first.
+    """
+
+    def __init__(
+        self,
+        model_path: str = DEFAULT_YUNET_MODEL,
+        max_size: int = 640,
+        score_threshold: float = DETECTOR_SCORE_THRESHOLD,
+    ):
+        if not os.path.exists(model_path):
+            raise RuntimeError(
+                f"YuNet model not found at {model_path}; download "
+                "face_detection_yunet_2023mar.onnx from the OpenCV model zoo "
+                "or set FACE_DETECTOR_MODEL"
+            )
+        self.name = "yunet"
+        self.max_size = max_size
+        self._detector = cv2.FaceDetectorYN.create(
+            model_path, "", (320, 320), score_threshold, 0.3, 5000
+        )
+        self._input_size: Optional[Tuple[int, int]] = None
+        self._threshold = score_threshold
+
+    def detect(
+        self,
+        frame_bgr: np.ndarray,
+        threshold: Optional[float] = None,
+        native: bool = False,
+    ) -> List[Dict[str, np.ndarray]]:
+        # Crops up to max_size already run at their native size.
+        h, w = frame_bgr.shape[:2]
+        scale = min(1.0, self.max_size / max(h, w))
+        image = frame_bgr
+        if scale < 1.0:
+            image = cv2.resize(frame_bgr, (int(w * scale), int(h * scale)))
+        size = (image.shape[1], image.shape[0])
+        if size != self._input_size:
+            self._detector.setInputSize(size)
+            self._input_size = size
+
+        if threshold is not None:
+            self._detector.setScoreThreshold(threshold)
+        try:
+            _, faces = self._detector.detect(image)
+        finally:
+            if threshold is not None:
+                self._detector.setScoreThreshold(self._threshold)
+        if faces is None or len(faces) == 0:
+            return []
+        # Row: x, y, w, h, 5 x (x, y) landmarks, score
+        faces = faces / np.array([scale] * 14 + [1.0], dtype=np.float32)
+        bboxes = np.empty((len(faces), 5), dtype=np.float32)
+        bboxes[:, 0:2] = faces[:, 0:2]
+        bboxes[:, 2:4] = faces[:, 0:2] + faces[:, 2:4]
+        bboxes[:, 4] = faces[:, 14]
+        return _to_detections(bboxes, faces[:, 4:14].reshape(-1, 5, 2))
+
+
+def build_detector(
+    backend: str,
+    det_size: Tuple[int, int] = (640, 640),
+    model: str = "",
+    pack: str = "buffalo_s",
+):
+    """
+    Creates a standalone detector. `model` is the YuNet file for "yunet" and
+    an ONNX file or InsightFace pack name for "onnx"; "insightface" uses the
+    detector from `pack`.
+    """
+    from face_engine.face_model import _load_pack_model
+
+    if backend == "yunet":
+        return YuNetDetector(model or DEFAULT_YUNET_MODEL, max_size=max(det_size))
+    if backend == "insightface":
+        return ScrfdDetector(_load_pack_model(pack, "detection", input_size=det_size))
+    if backend == "onnx":
+        model = model or DEFAULT_ONNX_PACK
+        if model.endswith(".onnx"):
+            from insightface.model_zoo import model_zoo
+
+            det_model = model_zoo.get_model(model, providers=["CPUExecutionProvider"])
+            det_model.prepare(ctx_id=0, input_size=det_size)
+        else:
+            det_model = _load_pack_model(model, "detection", input_size=det_size)
+        return ScrfdDetector(det_model, name="onnx")
+    raise ValueError(f"Unknown detector backend {backend!r}; expected one of {DETECTOR_BACKENDS}")
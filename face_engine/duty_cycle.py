@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from backend.client import get_trip_state
+
+
+class TripMonitor:
+    """
+    Tracks whether the bus has an ACTIVE trip, in a background thread.
+
+    Uses the backend's ETag/long-poll trip-state endpoint, so an unchanged
+    state costs one held request per `wait_sec`. If the backend can't be
+    reached the monitor reports the trip as active: attendance is never
+    skipped because of a network problem.
+    """
+
+    def __init__(self, bus_number: str, wait_sec: float = 25.0, retry_sec: float = 5.0):
+        self.bus_number = bus_number
+        self.wait_sec = wait_sec
+        self.retry_sec = retry_sec
+        self.active = True
+        self.trip_id: Optional[int] = None
+        self._etag: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "TripMonitor":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                state, self._etag = get_trip_state(
+                    self.bus_number, etag=self._etag, wait=self.wait_sec
+                )
+            except Exception:
+                self.active = True
+                self._etag = None
+                self._stop.wait(self.retry_sec)
+                continue
+
+            if state is None:
+                continue
+            was_active = self.active
+            self.active = bool(state.get("active"))
+            self.trip_id = state.get("trip_id")
+            if self.active != was_active:
+                mode = "full speed" if self.active else "idle"
+                print(f"[DUTY] Bus {self.bus_number}: trip {'started' if self.active else 'ended'}, {mode}")
+
+
+def monitor_from_env() -> Optional[TripMonitor]:
+    """
+    Enabled when FACE_BUS_NUMBER is set (FACE_TRIP_AWARE=0 turns it off).
+    """
+    bus_number = os.environ.get("FACE_BUS_NUMBER", "").strip()
+    if not bus_number or os.environ.get("FACE_TRIP_AWARE", "1") != "1":
+        return None
+    return TripMonitor(bus_number).start()
+
+
+def idle_sleep(frame_started: float, idle_fps: float) -> None:
+    """
+    Sleeps out the rest of one idle-mode frame period.
+    """
+    remaining = 1.0 / idle_fps - (time.monotonic() - frame_started)
+    if remaining > 0:
+        time.sleep(remaining)
@@ -0,0 +1,204 @@
+"""
+Burst enrollment.
+
+    python -m face_engine.enroll ekc23cs004 ekc23cs005 ...
+
+For each student: press S with them in front of the camera and N frames are
+captured over a few seconds. Every frame is scored for face size, sharpness
+and pose. Bursts where any frame shows more than one face are rejected. The
+best K frames are saved under data/students/<id>/ together with their
+embeddings (embeddings_<model>.npz), so the recognizer picks the student up
+on its next start without re-embedding anything.
+"""
+
+import argparse
+import math
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from face_engine.face_model import FaceModel
+from face_engine.face_recognize import save_student_embeddings
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUDENTS_DIR = os.path.join(BASE_DIR, "data", "students")
+
+BURST_FRAMES = int(os.environ.get("FACE_ENROLL_FRAMES", "20"))
+BURST_SECONDS = float(os.environ.get("FACE_ENROLL_SECONDS", "3"))
+BURST_KEEP = int(os.environ.get("FACE_ENROLL_KEEP", "5"))
+# Face width (px) that counts as fully sized; smaller faces are rejected.
+TARGET_FACE_PX = 160
+MIN_FACE_PX = 60
+# Laplacian variance of the 112x112 face crop that counts as sharp.
+SHARP_LAPLACIAN_VAR = 150.0
+
+
+def face_quality(frame_bgr: np.ndarray, detection: dict) -> Dict[str, float]:
+    """
+    Scores one face for enrollment, each part in 0..1:
+    - size: face width against TARGET_FACE_PX
+    - blur: Laplacian variance of the face crop (higher = sharper)
+    - pose: frontal-ness from the 5 landmarks (nose centred between the
+      eyes, level eye line)
+    `score` is their product, so one bad aspect sinks the frame.
+    """
+    left, top, right, bottom = detection["bbox"]
+    side = min(right - left, bottom - top)
+    size = min(1.0, side / TARGET_FACE_PX) if side >= MIN_FACE_PX else 0.0
+
+    h, w = frame_bgr.shape[:2]
+    crop = frame_bgr[max(0, top):min(h, bottom), max(0, left):min(w, right)]
+    blur = 0.0
+    if crop.size:
+        gray = cv2.cvtColor(cv2.resize(crop, (112, 112)), cv2.COLOR_BGR2GRAY)
+        blur = min(1.0, cv2.Laplacian(gray, cv2.CV_64F).var() / SHARP_LAPLACIAN_VAR)
+
+    pose = 0.0
+    kps = detection.get("kps")
+    if kps is not None:
+        left_eye, right_eye, nose = kps[0], kps[1], kps[2]
+        eye_dist = float(np.linalg.norm(right_eye - left_eye)) + 1e-6
+        eye_mid = (left_eye + right_eye) / 2.0
+        yaw = abs(float(nose[0] - eye_mid[0])) / eye_dist
+        roll = abs(math.atan2(float(right_eye[1] - left_eye[1]), float(right_eye[0] - left_eye[0])))
+        pose = max(0.0, 1.0 - 2.0 * yaw - roll / 0.5)
+
+    return {"size": size, "blur": blur, "pose": pose, "score": size * blur * pose}
+
+
+def _capture_burst(
+    cap, frames: int, seconds: float, show: bool
+) -> List[np.ndarray]:
+    interval = seconds / max(1, frames)
+    captured: List[np.ndarray] = []
+    next_at = time.monotonic()
+    while len(captured) < frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if time.monotonic() >= next_at:
+            captured.append(frame.copy())
+            next_at += interval
+        if show:
+            cv2.putText(
+                frame, f"Capturing {len(captured)}/{frames}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2,
+            )
+            cv2.imshow("Enrollment", frame)
+            cv2.waitKey(1)
+    return captured
+
+
+def select_best(
+    face_model: FaceModel, burst: Sequence[np.ndarray], keep: int
+) -> Tuple[Optional[str], List[Tuple[float, np.ndarray, dict]]]:
+    """
+    Returns (error, best) where best is up to `keep` (score, frame, detection)
+    sorted by quality. error is set when the burst must be rejected.
+    """
+    scored: List[Tuple[float, np.ndarray, dict]] = []
+    for frame in burst:
+        detections = face_model.detect(frame)
+        if len(detections) > 1:
+            return "more than one face in view", []
+        if not detections:
+            continue
+        quality = face_quality(frame, detections[0])
+        if quality["score"] > 0:
+            detections[0]["quality"] = quality
+            scored.append((quality["score"], frame, detections[0]))
+    if not scored:
+        return "no usable face (too small, blurred or turned away)", []
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return None, scored[:keep]
+
+
+def enroll_student(
+    student_id: str,
+    face_model: FaceModel,
+    cap,
+    students_dir: str = STUDENTS_DIR,
+    frames: int = BURST_FRAMES,
+    seconds: float = BURST_SECONDS,
+    keep: int = BURST_KEEP,
+    show: bool = True,
+) -> bool:
+    """
+    Captures one burst for `student_id`, saves the best frames and their
+    embeddings. Returns False if the burst was rejected.
+    """
+    burst = _capture_burst(cap, frames, seconds, show)
+    error, best = select_best(face_model, burst, keep)
+    if error:
+        print(f"[ENROLL] {student_id}: burst rejected, {error}")
+        return False
+
+    student_dir = os.path.join(students_dir, student_id)
+    os.makedirs(student_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    detections = []
+    for i, (_, frame, detection) in enumerate(best):
+        image_name = f"burst_{stamp}_{i + 1}.jpg"
+        cv2.imwrite(os.path.join(student_dir, image_name), frame)
+        face_model.embed(frame, [detection])
+        detection["image"] = image_name
+        detections.append(detection)
+
+    save_student_embeddings(student_dir, face_model.model_name, detections)
+    scores = ", ".join(f"{d['quality']['score']:.2f}" for d in detections)
+    print(f"[ENROLL] {student_id}: kept {len(detections)}/{len(burst)} frames (quality {scores})")
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Burst enrollment from the camera")
+    parser.add_argument("student_ids", nargs="+")
+    parser.add_argument("--frames", type=int, default=BURST_FRAMES, help="frames per burst")
+    parser.add_argument("--seconds", type=float, default=BURST_SECONDS, help="burst length")
+    parser.add_argument("--keep", type=int, default=BURST_KEEP, help="best frames to keep")
+    parser.add_argument("--camera", type=int, default=0)
+    parser.add_argument("--students-dir", default=STUDENTS_DIR)
+    args = parser.parse_args()
+
+    face_model = FaceModel()
+    cap = cv2.VideoCapture(args.camera)
+    if not cap.isOpened():
+        print("Camera not accessible")
+        return
+
+    pending = list(args.student_ids)
+    print("S: capture burst, N: skip student, Q: quit")
+    while pending:
+        student_id = pending[0]
+        ret, frame = cap.read()
+        if not ret:
+            break
+        cv2.putText(
+            frame, f"{student_id}: press S", (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2,
+        )
+        cv2.imshow("Enrollment", frame)
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord("s"):
+            if enroll_student(
+                student_id, face_model, cap, args.students_dir,
+                frames=args.frames, seconds=args.seconds, keep=args.keep,
+            ):
+                pending.pop(0)
+        elif key == ord("n"):
+            print(f"[ENROLL] Skipped {student_id}")
+            pending.pop(0)
+        elif key == ord("q"):
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
+    if pending:
+        print("[ENROLL] Not enrolled:", ", ".join(pending))
+
+
+if __name__ == "__main__":
+    main()
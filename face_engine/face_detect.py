@@ -1,3 +1,5 @@
+import argparse
+import json
 import os
 import time
 from typing import List, Optional, Tuple
@@ -9,8 +11,17 @@ if "QT_QPA_PLATFORM" not in os.environ and "WAYLAND_DISPLAY" not in os.environ:
 import cv2
 import numpy as np
 
-from face_engine.face_model import FaceModel
-from face_engine.face_recognize import load_known_faces
+from face_engine.duty_cycle import idle_sleep, monitor_from_env
+from face_engine.face_model import FaceEmbedder, FaceModel
+from face_engine.face_recognize import load_known_faces, load_known_faces_db
+from face_engine.gallery_bundle import sync_gallery
+from face_engine.gallery_pca import build_index
+from face_engine.inference_pool import INFERENCE_WORKERS, InferencePool
+from face_engine.motion_gate import gate_from_env
+from face_engine.pipeline import detect_stage
+from face_engine.recorder import DECISIONS_FILE, STATS_FILE, FrameRecorder, ReplaySource
+from face_engine.roi import roi_from_env
+from face_engine.stage_timer import timer_from_env
 from modules.attendance_manager import mark_attendance
 
 
@@ -21,25 +32,47 @@ STUDENTS_DIR = os.path.join(BASE_DIR, "data", "students")
 SIMILARITY_THRESHOLD = float(os.environ.get("FACE_SIM_THRESHOLD", "0.45"))
 AMBIGUITY_MARGIN = float(os.environ.get("FACE_MIN_MARGIN", "0.05"))
 
+# Cascade: faces scoring within FACE_CASCADE_BAND of the threshold, or without
+# a clear winner, are re-embedded by FACE_CASCADE_MODEL (e.g. buffalo_l).
+CASCADE_MODEL = os.environ.get("FACE_CASCADE_MODEL", "")
+CASCADE_BAND = float(os.environ.get("FACE_CASCADE_BAND", "0.08"))
+CASCADE_SIM_THRESHOLD = float(
+    os.environ.get("FACE_CASCADE_SIM_THRESHOLD", str(SIMILARITY_THRESHOLD))
+)
+
+# Gallery: "files" embeds data/students photos locally (cached per student);
+# "db" loads the vectors the backend precomputed into student_embeddings;
+# "bundle" downloads FACE_BUS_NUMBER's gallery bundle from the backend.
+GALLERY_SOURCE = os.environ.get("FACE_GALLERY_SOURCE", "files")
+
 # Runtime behavior
 FRAME_SCALE = 0.5
 ATTENDANCE_COOLDOWN_SEC = 10
 DETECT_EVERY_N_FRAMES = 2
+# Between trips (FACE_BUS_NUMBER set, no ACTIVE trip) frames are only
+# captured (and recorded), at this rate.
+IDLE_FPS = float(os.environ.get("FACE_IDLE_FPS", "1"))
+
+# Per-stage timing (see face_engine/stage_timer.py for the dump/HTTP settings)
+RECOGNITION_STAGES = (
+    "capture", "resize", "motion", "detect", "refine", "embed", "match", "cascade",
+    "attendance", "draw", "display", "inference",
+)
+STATS_OVERLAY = os.environ.get("FACE_STATS_OVERLAY", "0") == "1"
 
 last_seen = {}
 
 
-def _match_embedding(
+def _score_embedding(
     embedding: np.ndarray,
     known_matrix: Optional[np.ndarray],
-    known_ids: List[str],
-) -> Tuple[str, Optional[float]]:
+) -> Tuple[int, Optional[float], float]:
     """
-    Returns (best_name, best_score) or ("Unknown", best_score/None).
-    Uses cosine similarity with a "clear winner" margin to reduce false matches.
+    Returns (best_idx, best_score, second_score) by cosine similarity;
+    (-1, None, -1.0) for an empty gallery.
     """
     if known_matrix is None or known_matrix.size == 0:
-        return "Unknown", None
+        return -1, None, -1.0
 
     emb = np.asarray(embedding, dtype=np.float32)
     emb = emb / (np.linalg.norm(emb) + 1e-8)
@@ -51,13 +84,53 @@ def _match_embedding(
         if len(similarities) > 1
         else -1.0
     )
+    return best_idx, best_score, second_score
+
+
+def _match_embedding(
+    embedding: np.ndarray,
+    known_matrix: Optional[np.ndarray],
+    known_ids: List[str],
+    threshold: float = SIMILARITY_THRESHOLD,
+) -> Tuple[str, Optional[float]]:
+    """
+    Returns (best_name, best_score) or ("Unknown", best_score/None).
+    Uses cosine similarity with a "clear winner" margin to reduce false matches.
+    """
+    best_idx, best_score, second_score = _score_embedding(embedding, known_matrix)
+    return _decide_match(best_idx, best_score, second_score, known_ids, threshold), best_score
+
+
+def _decide_match(
+    best_idx: int,
+    best_score: Optional[float],
+    second_score: float,
+    known_ids: List[str],
+    threshold: float = SIMILARITY_THRESHOLD,
+) -> str:
+    if best_score is None:
+        return "Unknown"
 
-    strong_match = best_score >= SIMILARITY_THRESHOLD
+    strong_match = best_score >= threshold
     clear_winner = (best_score - second_score) >= AMBIGUITY_MARGIN
 
     if strong_match and clear_winner:
-        return known_ids[best_idx], best_score
-    return "Unknown", best_score
+        return known_ids[best_idx]
+    return "Unknown"
+
+
+def _is_ambiguous(best_score: Optional[float], second_score: float) -> bool:
+    """
+    True when the fast model's decision is close enough to call to escalate.
+    """
+    if best_score is None:
+        return False
+    if abs(best_score - SIMILARITY_THRESHOLD) < CASCADE_BAND:
+        return True
+    return (
+        best_score >= SIMILARITY_THRESHOLD
+        and (best_score - second_score) < AMBIGUITY_MARGIN
+    )
 
 
 def capture_face_image(save_path: str) -> bool:
@@ -101,51 +174,210 @@ def capture_face_image(save_path: str) -> bool:
     return True
 
 
-def real_time_face_recognition() -> None:
+def _load_gallery(
+    face_model: FaceModel, embedder: Optional[FaceEmbedder] = None
+) -> Tuple[List[np.ndarray], List[str]]:
+    """
+    Gallery for `embedder` (or the main model) from GALLERY_SOURCE. "bundle"
+    falls back to the local photos when there's no bundle for the bus.
+    """
+    model_name = (embedder or face_model).model_name
+    if GALLERY_SOURCE == "db":
+        return load_known_faces_db(model_name)
+    if GALLERY_SOURCE == "bundle":
+        bus_number = os.environ.get("FACE_BUS_NUMBER", "").strip()
+        bundle = sync_gallery(bus_number, model_name) if bus_number else None
+        if bundle is not None:
+            return bundle.gallery()
+        print("[GALLERY] No gallery bundle (FACE_BUS_NUMBER unset?), embedding local photos")
+    return load_known_faces(STUDENTS_DIR, face_model=face_model, embedder=embedder)
+
+
+def real_time_face_recognition(
+    source: Optional[ReplaySource] = None,
+    record_dir: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    show: bool = True,
+    mark: bool = True,
+) -> None:
+    """
+    Runs the recognition loop on the camera, or on `source` (a recording).
+
+    record_dir: save every captured frame for later replay.
+    output_dir: write per-face decisions and stage timings (decisions.jsonl,
+        stats.jsonl) so two builds can be compared on the same recording.
+    mark: call the attendance backend (disable for replays).
+    """
     face_model = FaceModel()
-    known_encodings, known_ids = load_known_faces(STUDENTS_DIR, face_model=face_model)
+    known_encodings, known_ids = _load_gallery(face_model)
     known_matrix = (
         np.asarray(known_encodings, dtype=np.float32) if known_encodings else None
     )
+    # Optional PCA-reduced gallery (FACE_PCA_DIM); None means full-dimension matching.
+    known_index = build_index(face_model.model_name, known_matrix, known_ids)
+    if known_index is not None:
+        # The index re-ranks from its own float16 copy; keeping the float32
+        # gallery as well would cost more memory than no index at all.
+        known_encodings = known_matrix = None
+
+    # Second tier: accurate recognizer + matching gallery for ambiguous faces.
+    fine_embedder = None
+    fine_matrix, fine_ids = None, []
+    if CASCADE_MODEL:
+        fine_embedder = FaceEmbedder(CASCADE_MODEL)
+        fine_encodings, fine_ids = _load_gallery(face_model, embedder=fine_embedder)
+        fine_matrix = (
+            np.asarray(fine_encodings, dtype=np.float32) if fine_encodings else None
+        )
+    cascade_counts = {"faces": 0, "escalated": 0}
+
+    def match_item(item: dict, source_frame: np.ndarray) -> None:
+        # `source_frame` is the frame the detection came from (cascade crops).
+        if known_index is not None:
+            best_idx, score, second = known_index.score(item["embedding"])
+        else:
+            best_idx, score, second = _score_embedding(item["embedding"], known_matrix)
+        name = _decide_match(best_idx, score, second, known_ids)
+        timer.lap("match")
+        cascade_counts["faces"] += 1
+        if fine_embedder is not None and _is_ambiguous(score, second):
+            fine_item = fine_embedder.embed(source_frame, [dict(item)])[0]
+            name, score = _match_embedding(
+                fine_item["embedding"], fine_matrix, fine_ids,
+                threshold=CASCADE_SIM_THRESHOLD,
+            )
+            cascade_counts["escalated"] += 1
+            timer.lap("cascade")
+        item["match"] = (name, score)
+        item["new"] = True
 
-    cap = cv2.VideoCapture(0)
+    cap = source if source is not None else cv2.VideoCapture(0)
     if not cap.isOpened():
         print("Camera not accessible")
         return
 
-    print("Press Q to quit")
+    if show:
+        print("Press Q to quit")
+
+    recorder = FrameRecorder(record_dir) if record_dir else None
+    decisions_file = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        decisions_file = open(os.path.join(output_dir, DECISIONS_FILE), "w", encoding="utf-8")
 
     frame_count = 0
     last_detections = []
+    # Frame number of the last time last_detections was cleared; pool
+    # results for earlier frames arrive too late to be shown.
+    cleared_at = 0
+    timer = timer_from_env(
+        RECOGNITION_STAGES,
+        dump_path=os.path.join(output_dir, STATS_FILE) if output_dir else None,
+    )
+    motion_gate = gate_from_env()
+    roi = roi_from_env()
+    # Replays always run at full speed so results don't depend on the backend.
+    trip_monitor = monitor_from_env() if source is None else None
+    # Created once the frame size is known (FACE_INFERENCE_WORKERS > 0).
+    pool = None
 
     while True:
-        ret, frame = cap.read()
+        timer.begin_frame()
+        frame_started = time.monotonic()
+        idle = trip_monitor is not None and not trip_monitor.active
+        slot = None
+        if pool is not None:
+            ret, frame, slot = pool.capture(cap)
+        else:
+            ret, frame = cap.read()
         if not ret:
             break
-
-        # Resize frame for performance
-        small_frame = cv2.resize(frame, (0, 0), fx=FRAME_SCALE, fy=FRAME_SCALE)
-        if frame_count % DETECT_EVERY_N_FRAMES == 0:
-            last_detections = face_model.detect_and_embed(small_frame)
+        # Replays run on the recorded clock so decisions are reproducible.
+        now = source.timestamp if source is not None else time.monotonic()
+        timer.lap("capture")
+        if pool is None and INFERENCE_WORKERS > 0:
+            pool = InferencePool(INFERENCE_WORKERS, frame.shape, FRAME_SCALE)
+            timer.skip()
+        if recorder is not None:
+            recorder.write(frame, now)
+            timer.skip()
+
+        # Resize frame for performance (workers resize their own copy)
+        small_frame = None
+        if not idle and (pool is None or motion_gate is not None):
+            small_frame = cv2.resize(frame, (0, 0), fx=FRAME_SCALE, fy=FRAME_SCALE)
+            timer.lap("resize")
+
+        # Idle the detector while the doorway is empty. Between trips nothing
+        # runs at all; the gate restarts from a fresh reference frame when the
+        # trip starts.
+        motion = True
+        if idle:
+            last_detections, cleared_at = [], frame_count
+            if motion_gate is not None:
+                motion_gate.reset()
+        elif motion_gate is not None:
+            motion = motion_gate.update(small_frame, now)
+            timer.lap("motion")
+            if not motion:
+                last_detections, cleared_at = [], frame_count
+
+        run_detection = motion and not idle and frame_count % DETECT_EVERY_N_FRAMES == 0
+        if pool is not None:
+            if slot is not None:
+                if run_detection and pool.submit(slot, frame_count):
+                    # A worker is reading this slot; draw on a private copy.
+                    frame = frame.copy()
+                elif not run_detection:
+                    pool.release(slot)
+            for done_slot, done_seq, done_detections, inference_ms in pool.poll():
+                timer.record("inference", inference_ms)
+                timer.skip()
+                if done_seq < cleared_at:
+                    pool.release(done_slot)
+                    continue
+                for item in done_detections:
+                    match_item(item, pool.ring.slot(done_slot))
+                pool.release(done_slot)
+                last_detections = done_detections
+            timer.skip()
+        elif run_detection:
+            last_detections = detect_stage(
+                face_model, small_frame, FRAME_SCALE, roi, timer, frame=frame
+            )
         detections = last_detections
 
         for item in detections:
             left, top, right, bottom = item["bbox"]
-            face_embedding = item["embedding"]
-
-            # Scale back coordinates to original frame
-            scale = 1 / FRAME_SCALE
-            left = int(left * scale)
-            top = int(top * scale)
-            right = int(right * scale)
-            bottom = int(bottom * scale)
-            name, score = _match_embedding(face_embedding, known_matrix, known_ids)
+            # Detections are reused between detector runs; match them once.
+            if "match" not in item:
+                match_item(item, frame)
+            name, score = item["match"]
 
+            marked = False
             if name != "Unknown":
-                now = time.monotonic()
                 if name not in last_seen or now - last_seen[name] > ATTENDANCE_COOLDOWN_SEC:
-                    mark_attendance(name)
+                    if mark:
+                        mark_attendance(name)
                     last_seen[name] = now
+                    marked = True
+                    timer.lap("attendance")
+
+            if decisions_file is not None and (item.pop("new", False) or marked):
+                decisions_file.write(
+                    json.dumps(
+                        {
+                            "frame": frame_count,
+                            "ts": round(now, 6),
+                            "bbox": list(item["bbox"]),
+                            "student_id": name,
+                            "score": round(score, 4) if score is not None else None,
+                            "marked": marked,
+                        }
+                    )
+                    + "\n"
+                )
+                timer.skip()
 
             label = f"{name} ({score:.2f})" if score is not None else name
 
@@ -159,17 +391,65 @@ def real_time_face_recognition() -> None:
                 (0, 255, 0),
                 2,
             )
-
-        cv2.imshow("Real-Time Face Recognition", frame)
+            timer.lap("draw")
 
         frame_count += 1
-        key = cv2.waitKey(1) & 0xFF
+        key = -1
+        if show:
+            if STATS_OVERLAY:
+                timer.draw_overlay(frame)
+            cv2.imshow("Real-Time Face Recognition", frame)
+            key = cv2.waitKey(1) & 0xFF
+            timer.lap("display")
+        timer.maybe_flush()
         if key == ord("q"):
             break
-
+        if idle:
+            idle_sleep(frame_started, IDLE_FPS)
+            timer.skip()
+
+    timer.close()
+    if pool is not None:
+        pool.close()
+    if trip_monitor is not None:
+        trip_monitor.stop()
+    if recorder is not None:
+        recorder.close()
+    if decisions_file is not None:
+        decisions_file.close()
+    if fine_embedder is not None:
+        print(
+            f"[CASCADE] Escalated {cascade_counts['escalated']} of "
+            f"{cascade_counts['faces']} faces to {CASCADE_MODEL}"
+        )
     cap.release()
-    cv2.destroyAllWindows()
+    if show:
+        cv2.destroyAllWindows()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Real-time face recognition")
+    parser.add_argument("--record", metavar="DIR", help="save captured frames for replay")
+    parser.add_argument("--replay", metavar="DIR", help="run on a recording instead of the camera")
+    parser.add_argument("--realtime", action="store_true", help="replay at the recorded pace")
+    parser.add_argument("--out", metavar="DIR", help="write decisions.jsonl and stats.jsonl here")
+    parser.add_argument("--no-display", action="store_true", help="do not open a preview window")
+    parser.add_argument(
+        "--mark",
+        action="store_true",
+        help="call the attendance backend during a replay (off by default)",
+    )
+    args = parser.parse_args()
+
+    source = ReplaySource(args.replay, realtime=args.realtime) if args.replay else None
+    real_time_face_recognition(
+        source=source,
+        record_dir=args.record,
+        output_dir=args.out,
+        show=not args.no_display,
+        mark=source is None or args.mark,
+    )
 
 
 if __name__ == "__main__":
-    real_time_face_recognition()
+    main()
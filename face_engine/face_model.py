@@ -1,39 +1,153 @@
+import glob
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 
+from face_engine.detectors import DETECTOR_BACKEND, DETECTOR_MODEL, ScrfdDetector, build_detector
+
+# Recognition pack used when none is given ('buffalo_s': fast/real-time).
+DEFAULT_MODEL = "buffalo_s"
+
+
+def _normalize(vec: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        return vec
+    return vec / norm
+
+
+def _load_pack_model(
+    model_name: str, taskname: str, root: str = "~/.insightface", **prepare_kwargs
+):
+    """
+    Loads a single ONNX model of the given task from an InsightFace model pack.
+    """
+    from insightface.model_zoo import model_zoo
+    from insightface.utils import ensure_available
+
+    model_dir = ensure_available("models", model_name, root=root)
+    for onnx_file in sorted(glob.glob(os.path.join(model_dir, "*.onnx"))):
+        model = model_zoo.get_model(onnx_file, providers=["CPUExecutionProvider"])
+        if model is not None and model.taskname == taskname:
+            model.prepare(ctx_id=0, **prepare_kwargs)
+            return model
+    raise RuntimeError(f"No {taskname} model found in InsightFace pack '{model_name}'")
+
+
+class FaceEmbedder:
+    """
+    Recognition-only InsightFace model (no detector).
+
+    Embeds faces found by a FaceModel from their 5-point landmarks, e.g. the
+    accurate second tier of a cascade.
+    """
+
+    def __init__(self, model_name: str = "buffalo_l", recognizer=None):
+        from insightface.utils import face_align
+
+        self.model_name = model_name
+        self._recognizer = recognizer or _load_pack_model(model_name, "recognition")
+        self._norm_crop = face_align.norm_crop
+        if recognizer is None:
+            print(f"[FACE_MODEL] Loaded recognition model from '{model_name}'")
+
+    def embed(
+        self, frame_bgr: np.ndarray, detections: List[Dict[str, np.ndarray]]
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        Adds an L2-normalized "embedding" to each detection (in place).
+        All aligned crops of a frame go through the recognizer as one batch.
+        """
+        if not detections:
+            return detections
+        size = self._recognizer.input_size[0]
+        crops = [
+            self._norm_crop(frame_bgr, landmark=item["kps"], image_size=size)
+            for item in detections
+        ]
+        feats = self._recognizer.get_feat(crops).astype(np.float32)
+        for item, feat in zip(detections, feats):
+            item["embedding"] = _normalize(feat.ravel())
+        return detections
+
 
 class FaceModel:
     """
-    InsightFace face detector/embedding wrapper (CPU).
+    Face detector/embedding wrapper (CPU).
+
+    The detector backend is pluggable (see face_engine/detectors.py):
+    "insightface" (SCRFD from the model pack), "yunet" (OpenCV DNN) or
+    "onnx" (a smaller SCRFD, e.g. buffalo_sc's 500MF). Embeddings always come
+    from the `model_name` pack's recognizer.
 
     Expected input: BGR images (OpenCV default).
     Output: list of dicts with "bbox" and L2-normalized "embedding".
     """
 
-    def __init__(self, det_size: Tuple[int, int] = (640, 640), model_name: str = "buffalo_s"):
+    def __init__(
+        self,
+        det_size: Tuple[int, int] = (640, 640),
+        model_name: str = DEFAULT_MODEL,
+        detector: Optional[str] = None,
+        detector_model: Optional[str] = None,
+    ):
         # Model options: 'buffalo_l' (accurate/slow), 'buffalo_s' (fast/real-time)
         self.det_size = det_size
+        self.model_name = model_name
+        self.detector_name = detector or DETECTOR_BACKEND
         self._app = None
 
-        import insightface
+        if self.detector_name == "insightface":
+            import insightface
 
-        self._app = insightface.app.FaceAnalysis(
-            name=model_name,
-            providers=["CPUExecutionProvider"],
-        )
-        # InsightFace expects BGR images and handles detection + embedding.
-        self._app.prepare(ctx_id=0, det_size=det_size)
-        print("[FACE_MODEL] Using InsightFace backend (CPU)")
+            # Only detection + recognition are used; skip landmark/genderage packs.
+            self._app = insightface.app.FaceAnalysis(
+                name=model_name,
+                allowed_modules=["detection", "recognition"],
+                providers=["CPUExecutionProvider"],
+            )
+            # InsightFace expects BGR images and handles detection + embedding.
+            self._app.prepare(ctx_id=0, det_size=det_size)
+            self._detector = ScrfdDetector(self._app.det_model)
+            self._embedder = FaceEmbedder(model_name, recognizer=self._app.models["recognition"])
+        else:
+            self._detector = build_detector(
+                self.detector_name,
+                det_size=det_size,
+                model=detector_model if detector_model is not None else DETECTOR_MODEL,
+            )
+            self._embedder = FaceEmbedder(model_name)
+        print(f"[FACE_MODEL] Using {self.detector_name} detector, {model_name} recognizer (CPU)")
 
     @staticmethod
     def _normalize(vec: np.ndarray) -> np.ndarray:
-        norm = np.linalg.norm(vec)
-        if norm == 0:
-            return vec
-        return vec / norm
+        return _normalize(vec)
+
+    def detect(
+        self,
+        frame_bgr: np.ndarray,
+        threshold: Optional[float] = None,
+        native: bool = False,
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        Runs the face detector only. Returns list of detections:
+        - bbox: (left, top, right, bottom) int
+        - kps: 5-point landmarks (float32, shape (5, 2)) or None
+        - det_score: detector confidence
+        `threshold` overrides the score cut-off; `native` skips resizing to
+        det_size (used for small crops).
+        """
+        return self._detector.detect(frame_bgr, threshold=threshold, native=native)
+
+    def embed(
+        self, frame_bgr: np.ndarray, detections: List[Dict[str, np.ndarray]]
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        Adds an L2-normalized "embedding" to each detection (in place).
+        """
+        return self._embedder.embed(frame_bgr, detections)
 
     def detect_and_embed(self, frame_bgr: np.ndarray) -> List[Dict[str, np.ndarray]]:
         """
@@ -41,30 +155,21 @@ class FaceModel:
         - bbox: (left, top, right, bottom) int
         - embedding: L2-normalized embedding vector
         """
-        detections: List[Dict[str, np.ndarray]] = []
-
-        faces = self._app.get(frame_bgr)
-        for face in faces:
-            x1, y1, x2, y2 = face.bbox.astype(int)
-            emb = getattr(face, "normed_embedding", None)
-            if emb is None:
-                emb = self._normalize(face.embedding.astype(np.float32))
-            detections.append(
-                {
-                    "bbox": (int(x1), int(y1), int(x2), int(y2)),
-                    "embedding": emb.astype(np.float32),
-                }
-            )
-        return detections
+        return self.embed(frame_bgr, self.detect(frame_bgr))
 
-    def image_embeddings(self, image_path: str) -> List[np.ndarray]:
+    def image_embeddings(
+        self, image_path: str, embedder: Optional[FaceEmbedder] = None
+    ) -> List[np.ndarray]:
         """
         Returns a list of embeddings found in the image file.
         Empty list if file missing, unreadable, or no faces found.
+        `embedder` swaps in another recognition model (detection stays ours).
         """
         if not os.path.exists(image_path):
             return []
         image = cv2.imread(image_path)
         if image is None:
             return []
-        return [item["embedding"] for item in self.detect_and_embed(image)]
+        detections = self.detect(image)
+        (embedder or self).embed(image, detections)
+        return [item["embedding"] for item in detections]
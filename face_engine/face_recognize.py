@@ -1,10 +1,11 @@
 import os
 import pickle
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 
-from face_engine.face_model import FaceModel
+from face_engine.face_model import DEFAULT_MODEL, FaceEmbedder, FaceModel
+from face_engine.gallery_bundle import average_embeddings
 
 IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
 
@@ -17,24 +18,86 @@ def _list_images(folder: str) -> List[str]:
     return [os.path.join(folder, f) for f in files]
 
 
+def _student_cache_path(student_path: str, model_name: str) -> str:
+    return os.path.join(student_path, f"embeddings_{model_name}.npz")
+
+
+def save_student_embeddings(
+    student_path: str, model_name: str, detections: List[Dict[str, object]]
+) -> None:
+    """
+    Writes one student's per-image embeddings, merged with what is already
+    cached for other images still in the folder (entries for deleted photos
+    are dropped, or the cache would never look fresh again). Each detection
+    has "image" (file name) and "embedding" (None for an image without
+    exactly one face).
+    """
+    present = {os.path.basename(p) for p in _list_images(student_path)}
+    cached = {
+        name: emb
+        for name, emb in (_load_student_embeddings(student_path, model_name, check_fresh=False) or {}).items()
+        if name in present
+    }
+    for item in detections:
+        emb = item.get("embedding")
+        cached[item["image"]] = None if emb is None else np.asarray(emb, dtype=np.float32)
+    images = sorted(name for name, emb in cached.items() if emb is not None)
+    np.savez(
+        _student_cache_path(student_path, model_name),
+        images=np.asarray(images, dtype=str),
+        embeddings=np.asarray([cached[name] for name in images], dtype=np.float32),
+        rejected=np.asarray(sorted(name for name, emb in cached.items() if emb is None), dtype=str),
+    )
+
+
+def _load_student_embeddings(
+    student_path: str, model_name: str, check_fresh: bool = True
+) -> Optional[Dict[str, Optional[np.ndarray]]]:
+    """
+    Returns {image file name: embedding or None} from the student's cache.
+    None if there is no cache or (check_fresh) it doesn't cover exactly the
+    current images, or is older than one of them.
+    """
+    path = _student_cache_path(student_path, model_name)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        cached: Dict[str, Optional[np.ndarray]] = {
+            str(name): emb for name, emb in zip(data["images"], data["embeddings"])
+        }
+        cached.update({str(name): None for name in data["rejected"]})
+    if check_fresh:
+        image_paths = _list_images(student_path)
+        names = {os.path.basename(p) for p in image_paths}
+        cache_mtime = os.path.getmtime(path)
+        if names != set(cached) or any(os.path.getmtime(p) > cache_mtime for p in image_paths):
+            return None
+    return cached
+
+
 def load_known_faces(
     students_dir: str,
     face_model: FaceModel | None = None,
+    embedder: FaceEmbedder | None = None,
 ) -> Tuple[List[np.ndarray], List[str]]:
     """
     Loads all students' folders and returns averaged embeddings.
     Only images with exactly one face are used.
+    With `embedder`, faces found by `face_model` are embedded by that
+    recognition model instead (second gallery for the cascade).
     """
     known_encodings: List[np.ndarray] = []
     known_ids: List[str] = []
-    face_model = face_model or FaceModel()
 
     print("Looking for students in:", os.path.abspath(students_dir))
     if not os.path.exists(students_dir):
         print("❌ students directory does NOT exist")
         return known_encodings, known_ids
 
-    cache_path = os.path.join(students_dir, "encodings.pkl")
+    # One cache per recognition model: galleries of different models don't mix.
+    named = embedder or face_model
+    model_name = named.model_name if named is not None else DEFAULT_MODEL
+    cache_path = os.path.join(students_dir, f"encodings_{model_name}.pkl")
     use_cache = False
 
     if os.path.exists(cache_path):
@@ -61,16 +124,32 @@ def load_known_faces(
             print("  ⛔ Not a directory")
             continue
 
-        for image_path in _list_images(student_path):
-            print("  Loading image:", image_path)
-            encodings = face_model.image_embeddings(image_path)
-            print("  Faces found in image:", len(encodings))
-
-            # Only use clean enrollment images with exactly one face.
-            if len(encodings) == 1:
-                student_encodings.append(encodings[0])
-            elif len(encodings) > 1:
-                print("  ⛔ Skipping image with multiple faces")
+        # Burst enrollment (and earlier rebuilds) leave per-student embeddings.
+        cached = _load_student_embeddings(student_path, model_name)
+        if cached is not None:
+            student_encodings = [emb for emb in cached.values() if emb is not None]
+            print("  ⚡ Using cached embeddings for", len(student_encodings), "image(s)")
+        else:
+            face_model = face_model or FaceModel()
+            computed = []
+            for image_path in _list_images(student_path):
+                print("  Loading image:", image_path)
+                encodings = face_model.image_embeddings(image_path, embedder=embedder)
+                print("  Faces found in image:", len(encodings))
+
+                # Only use clean enrollment images with exactly one face.
+                if len(encodings) == 1:
+                    student_encodings.append(encodings[0])
+                elif len(encodings) > 1:
+                    print("  ⛔ Skipping image with multiple faces")
+                computed.append(
+                    {
+                        "image": os.path.basename(image_path),
+                        "embedding": encodings[0] if len(encodings) == 1 else None,
+                    }
+                )
+            if computed:
+                save_student_embeddings(student_path, model_name, computed)
 
         if student_encodings:
             avg_embedding = np.mean(np.asarray(student_encodings, dtype=np.float32), axis=0)
@@ -87,3 +166,33 @@ def load_known_faces(
 
     print("FINAL → Known faces loaded:", len(known_encodings))
     return known_encodings, known_ids
+
+
+def load_known_faces_db(model_name: str = DEFAULT_MODEL) -> Tuple[List[np.ndarray], List[str]]:
+    """
+    Loads the precomputed student_embeddings rows for `model_name` (filled by
+    the backend at enrollment) and returns averaged embeddings per student.
+    No model inference runs here.
+    """
+    from database.db import get_connection
+
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """
+            SELECT e.student_id, e.dim, e.vector
+            FROM student_embeddings e
+            JOIN students s ON s.student_id = e.student_id
+            WHERE e.model_name = ?
+            ORDER BY e.student_id
+            """,
+            (model_name,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    known_ids, matrix = average_embeddings(rows)
+    known_encodings = list(matrix)
+
+    print(f"⚡ Loaded {len(known_ids)} students ({len(rows)} vectors) from the database for {model_name}")
+    return known_encodings, known_ids
@@ -0,0 +1,54 @@
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class FrameRing:
+    """
+    Fixed number of frame slots in one multiprocessing.shared_memory block.
+
+    The owner creates the ring and hands out slot indices; other processes
+    attach by name and see the same pixels as NumPy views, so frames cross
+    the process boundary without pickling. Slot bookkeeping (which slot is
+    free) is the owner's job.
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        shape: Tuple[int, int, int],
+        name: Optional[str] = None,
+        create: bool = True,
+    ):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.frame_bytes = int(np.prod(self.shape))
+        self._owner = create
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=create, size=self.frame_bytes * slots
+        )
+        self._frames = np.ndarray(
+            (slots,) + self.shape, dtype=np.uint8, buffer=self._shm.buf
+        )
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @classmethod
+    def attach(cls, name: str, slots: int, shape: Tuple[int, int, int]) -> "FrameRing":
+        return cls(slots, shape, name=name, create=False)
+
+    def slot(self, index: int) -> np.ndarray:
+        return self._frames[index]
+
+    def write(self, index: int, frame: np.ndarray) -> None:
+        np.copyto(self._frames[index], frame)
+
+    def close(self) -> None:
+        # Views must go before the mapping can be closed.
+        self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
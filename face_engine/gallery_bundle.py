@@ -0,0 +1,276 @@
+"""
+Compact per-bus gallery bundle.
+
+The backend serves /bus/<bus_number>/gallery as one binary file that an edge
+device can store and mmap, instead of copying data/students and embedding
+the photos on the bus:
+
+    8 bytes   magic b"BUSGAL01"
+    4 bytes   header length N (uint32, little-endian)
+    N bytes   JSON header: model, dim, dtype, version, since, etag,
+              ids (one per matrix row) and members ({student_id: stamp}
+              for every student currently on the bus)
+    padding   to a 64-byte boundary
+    matrix    len(ids) x dim, little-endian float16 or float32, row-major
+
+`version` is the newest student_embeddings row in the bundle. With
+`since=<version>` the backend only sends rows for students whose vectors
+changed after it; `members` still lists everybody, so the device drops
+students who left the bus and keeps its own rows for the rest.
+
+    python -m face_engine.gallery_bundle sync --bus 12
+    python -m face_engine.gallery_bundle info data/gallery/gallery_12_buffalo_s.bin
+"""
+
+import argparse
+import json
+import os
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GALLERY_DIR = os.path.join(BASE_DIR, "data", "gallery")
+
+MAGIC = b"BUSGAL01"
+ALIGN = 64
+DTYPES = {"float16": "<f2", "float32": "<f4"}
+
+
+def average_embeddings(rows: Iterable) -> Tuple[List[str], np.ndarray]:
+    """
+    Averages and L2-normalises student_embeddings rows (student_id, dim,
+    vector) per student, in the order students first appear.
+    """
+    per_student: Dict[str, List[np.ndarray]] = {}
+    for row in rows:
+        vector = np.frombuffer(row["vector"], dtype="<f4", count=row["dim"])
+        per_student.setdefault(row["student_id"], []).append(vector)
+
+    ids = list(per_student)
+    matrix = np.zeros((len(ids), 0), dtype=np.float32)
+    if ids:
+        matrix = np.stack(
+            [np.mean(np.asarray(per_student[sid], dtype=np.float32), axis=0) for sid in ids]
+        )
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8
+    return ids, matrix
+
+
+def encode_bundle(
+    model_name: str,
+    ids: Sequence[str],
+    matrix: np.ndarray,
+    version: int,
+    members: Dict[str, str],
+    dtype: str = "float16",
+    since: Optional[int] = None,
+    etag: str = "",
+) -> bytes:
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {sorted(DTYPES)}")
+    dim = int(matrix.shape[1]) if len(ids) else 0
+    header = json.dumps(
+        {
+            "model": model_name,
+            "dim": dim,
+            "dtype": dtype,
+            "version": int(version),
+            "since": since,
+            "etag": etag,
+            "ids": list(ids),
+            "members": members,
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    padding = b"\0" * (-len(prefix) % ALIGN)
+    body = np.ascontiguousarray(matrix, dtype=DTYPES[dtype]).tobytes() if len(ids) else b""
+    return prefix + padding + body
+
+
+def _parse_header(prefix: bytes) -> Tuple[dict, int]:
+    if prefix[: len(MAGIC)] != MAGIC:
+        raise ValueError("not a gallery bundle")
+    (header_len,) = struct.unpack_from("<I", prefix, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(prefix[start : start + header_len].decode("utf-8"))
+    offset = start + header_len
+    return header, offset + (-offset % ALIGN)
+
+
+class GalleryBundle:
+    """
+    A decoded bundle. `matrix` is a read-only view of the file (np.memmap)
+    or of the downloaded bytes, in the bundle's dtype.
+    """
+
+    def __init__(self, header: dict, matrix: np.ndarray):
+        self.model_name: str = header["model"]
+        self.dim: int = header["dim"]
+        self.dtype: str = header["dtype"]
+        self.version: int = header["version"]
+        self.since: Optional[int] = header.get("since")
+        self.etag: str = header.get("etag") or ""
+        self.ids: List[str] = header["ids"]
+        self.members: Dict[str, str] = header["members"]
+        self.matrix = matrix
+
+    @property
+    def is_delta(self) -> bool:
+        return self.since is not None
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GalleryBundle":
+        header, offset = _parse_header(data)
+        matrix = np.frombuffer(
+            data, dtype=DTYPES[header["dtype"]], count=len(header["ids"]) * header["dim"],
+            offset=offset,
+        ).reshape(len(header["ids"]), header["dim"])
+        return cls(header, matrix)
+
+    @classmethod
+    def open(cls, path: str) -> "GalleryBundle":
+        with open(path, "rb") as f:
+            prefix = f.read(len(MAGIC) + 4)
+            (header_len,) = struct.unpack_from("<I", prefix, len(MAGIC))
+            header, offset = _parse_header(prefix + f.read(header_len))
+        rows = len(header["ids"])
+        if not rows:
+            return cls(header, np.zeros((0, header["dim"]), dtype=DTYPES[header["dtype"]]))
+        matrix = np.memmap(
+            path, dtype=DTYPES[header["dtype"]], mode="r", offset=offset,
+            shape=(rows, header["dim"]),
+        )
+        return cls(header, matrix)
+
+    def gallery(self) -> Tuple[List[np.ndarray], List[str]]:
+        """Same shape as load_known_faces(): (float32 encodings, ids)."""
+        matrix = np.asarray(self.matrix, dtype=np.float32)
+        matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8)
+        return list(matrix), list(self.ids)
+
+
+def apply_delta(base: GalleryBundle, delta: GalleryBundle) -> Optional[Tuple[List[str], np.ndarray]]:
+    """
+    Merges a delta bundle into `base`, in the delta's member order. Returns
+    None when a member is neither in the delta nor current in `base` (the
+    caller should then download the full bundle).
+    """
+    delta_rows = {sid: i for i, sid in enumerate(delta.ids)}
+    base_rows = {sid: i for i, sid in enumerate(base.ids)}
+    ids = sorted(delta.members)
+    rows = []
+    for sid in ids:
+        if sid in delta_rows:
+            rows.append(delta.matrix[delta_rows[sid]])
+        elif sid in base_rows and base.members.get(sid) == delta.members[sid]:
+            rows.append(base.matrix[base_rows[sid]])
+        else:
+            return None
+    dim = delta.dim or base.dim
+    matrix = np.asarray(rows, dtype=np.float32).reshape(len(ids), dim)
+    return ids, matrix
+
+
+def bundle_path(bus_number: str, model_name: str, cache_dir: str = GALLERY_DIR) -> str:
+    return os.path.join(cache_dir, f"gallery_{bus_number}_{model_name}.bin")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def sync_gallery(
+    bus_number: str,
+    model_name: str,
+    cache_dir: str = GALLERY_DIR,
+    dtype: str = "float16",
+) -> Optional[GalleryBundle]:
+    """
+    Brings the local bundle for `bus_number` up to date and returns it
+    memory-mapped. Sends the stored ETag and version, so an unchanged
+    gallery costs one 304 and a changed one only the students that changed.
+    Falls back to the stored bundle when the backend can't be reached;
+    None if there is neither.
+    """
+    from backend.client import get_gallery_bundle
+
+    path = bundle_path(bus_number, model_name, cache_dir)
+    local = GalleryBundle.open(path) if os.path.exists(path) else None
+
+    try:
+        data, etag = get_gallery_bundle(
+            bus_number, model_name, dtype=dtype,
+            etag=local.etag if local else None,
+            since=local.version if local else None,
+        )
+        if data is None:
+            print(f"[GALLERY] Bus {bus_number}: gallery unchanged (version {local.version})")
+            return local
+
+        received = GalleryBundle.from_bytes(data)
+        if received.is_delta:
+            merged = apply_delta(local, received)
+            if merged is None:
+                data, etag = get_gallery_bundle(bus_number, model_name, dtype=dtype)
+                received = GalleryBundle.from_bytes(data)
+            else:
+                ids, matrix = merged
+                data = encode_bundle(
+                    model_name, ids, matrix, received.version, received.members,
+                    dtype=dtype, etag=etag or received.etag,
+                )
+                print(
+                    f"[GALLERY] Bus {bus_number}: applied {len(received.ids)} changed "
+                    f"student(s), {len(ids)} total"
+                )
+        if not received.is_delta:
+            print(f"[GALLERY] Bus {bus_number}: downloaded {len(received.ids)} students ({len(data)} bytes)")
+    except Exception as exc:
+        if local is None:
+            print(f"[GALLERY] Bus {bus_number}: download failed and no local bundle ({exc})")
+            return None
+        print(f"[GALLERY] Bus {bus_number}: download failed, using local version {local.version} ({exc})")
+        return local
+
+    # Drop the old mapping before replacing the file under it.
+    local = None
+    _write_atomic(path, data)
+    return GalleryBundle.open(path)
+
+
+def main() -> None:
+    from face_engine.face_model import DEFAULT_MODEL
+
+    parser = argparse.ArgumentParser(description="Per-bus gallery bundles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="download or refresh a bus's gallery")
+    sync.add_argument("--bus", required=True)
+    sync.add_argument("--model", default=DEFAULT_MODEL)
+    sync.add_argument("--dtype", choices=sorted(DTYPES), default="float16")
+    sync.add_argument("--cache-dir", default=GALLERY_DIR)
+    info = sub.add_parser("info", help="print a bundle's header")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        bundle = sync_gallery(args.bus, args.model, args.cache_dir, args.dtype)
+        if bundle is None:
+            raise SystemExit(1)
+    else:
+        bundle = GalleryBundle.open(args.path)
+    print(
+        f"model={bundle.model_name} dim={bundle.dim} dtype={bundle.dtype} "
+        f"version={bundle.version} students={len(bundle.ids)} "
+        f"matrix={bundle.matrix.nbytes} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+PCA-reduced gallery for matching.
+
+The projection (basis) is fitted once per recognition model on a large set
+of face embeddings, not on the gallery: every per-photo vector in
+student_embeddings across all buses, the per-student embedding caches, or
+an .npy file. D is then independent of, and much smaller than, the number
+of students on one bus. The basis is stored as models/pca_<model>.npz:
+
+    python -m face_engine.gallery_pca fit --model buffalo_s --from-db --dim 256
+
+Matching scans the reduced gallery (n x D float32), then re-scores the top
+`rerank_k` candidates at full dimension from a float16 copy, so the
+decision uses full-dimension cosine scores. Per student that is D*4 + 1024
+bytes instead of 2048 (512-d). Per query it costs D*512 for the projection
+plus n*D for the scan, instead of n*512: the index only pays off for
+galleries well above D students. The basis itself (D x 512 float32) is a
+fixed cost shared by every gallery of that model.
+
+    python -m face_engine.gallery_pca report --dims 32,64,128,256
+
+compares each D with plain full-dimension matching on the enrollment photos
+(or on the faces in a recording with --recording).
+"""
+
+import argparse
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASIS_DIR = os.environ.get("FACE_PCA_BASIS_DIR", os.path.join(BASE_DIR, "models"))
+
+# 0 disables the projection (plain full-dimension matching).
+PCA_DIM = int(os.environ.get("FACE_PCA_DIM", "0"))
+PCA_RERANK_K = int(os.environ.get("FACE_PCA_RERANK_K", "5"))
+
+
+def _l2_rows(matrix: np.ndarray) -> np.ndarray:
+    return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8)
+
+
+def basis_path(model_name: str, basis_dir: Optional[str] = None) -> str:
+    return os.path.join(basis_dir or BASIS_DIR, f"pca_{model_name}.npz")
+
+
+def fit_basis(embeddings: np.ndarray, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (mean, components) of the first `dim` principal axes of the
+    L2-normalised `embeddings`. Needs more samples than `dim`.
+    """
+    samples = _l2_rows(np.asarray(embeddings, dtype=np.float32))
+    if samples.shape[0] <= dim:
+        raise ValueError(f"Need more than {dim} embeddings to fit a {dim}-d basis, got {samples.shape[0]}")
+    mean = samples.mean(axis=0)
+    _, _, vt = np.linalg.svd(samples - mean, full_matrices=False)
+    return mean, vt[:dim]
+
+
+def save_basis(path: str, model_name: str, mean: np.ndarray, components: np.ndarray, samples: int) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(
+        path,
+        model=np.asarray(model_name),
+        samples=np.asarray(samples),
+        mean=mean.astype(np.float32),
+        components=components.astype(np.float32),
+    )
+
+
+def load_basis(path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(mean, components) from a saved basis, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return data["mean"], data["components"]
+
+
+class GalleryIndex:
+    """
+    Gallery projected onto a pre-fitted basis.
+
+    Holds the reduced gallery for the scan and the full vectors in float16
+    for re-ranking; it is the only copy of the gallery a caller needs to
+    keep. `components` may be a slice of a larger saved basis.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        mean: np.ndarray,
+        components: np.ndarray,
+        full: np.ndarray,
+        rerank_k: int = PCA_RERANK_K,
+    ):
+        self.ids = list(ids)
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # (D, dim)
+        self.full = full.astype(np.float16)
+        self.reduced = _l2_rows((full - self.mean) @ self.components.T).astype(np.float32)
+        self.rerank_k = max(2, rerank_k)
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+
+    def score(self, embedding: np.ndarray) -> Tuple[int, Optional[float], float]:
+        """
+        Same contract as face_detect._score_embedding: (best_idx, best, second)
+        with full-dimension cosine scores of the re-ranked candidates.
+        """
+        emb = np.asarray(embedding, dtype=np.float32)
+        emb = emb / (np.linalg.norm(emb) + 1e-8)
+        query = (emb - self.mean) @ self.components.T
+        coarse = self.reduced @ query
+
+        k = min(self.rerank_k, len(coarse))
+        candidates = np.argpartition(coarse, -k)[-k:] if k < len(coarse) else np.arange(len(coarse))
+        exact = self.full[candidates].astype(np.float32) @ emb
+        order = np.argsort(exact)[::-1]
+        best_idx = int(candidates[order[0]])
+        best_score = float(exact[order[0]])
+        second_score = float(exact[order[1]]) if len(order) > 1 else -1.0
+        return best_idx, best_score, second_score
+
+    def nbytes(self) -> int:
+        """Bytes that grow with the gallery (reduced scan + float16 re-rank copy)."""
+        return self.reduced.nbytes + self.full.nbytes
+
+    def basis_nbytes(self) -> int:
+        """Fixed cost of the projection, shared by every gallery of the model."""
+        return self.components.nbytes + self.mean.nbytes
+
+
+def build_index(
+    model_name: str,
+    matrix: Optional[np.ndarray],
+    ids: List[str],
+    dim: int = PCA_DIM,
+    path: Optional[str] = None,
+) -> Optional[GalleryIndex]:
+    """
+    Returns the gallery projected onto the model's saved basis, or None when
+    disabled, when no basis has been fitted, or when the gallery is too small
+    for the index to be cheaper than full-dimension matching (n <= D).
+    """
+    if dim <= 0 or matrix is None:
+        return None
+    path = path or basis_path(model_name)
+    basis = load_basis(path)
+    if basis is None:
+        print(f"[PCA] No basis at {path}; run `python -m face_engine.gallery_pca fit`. Using full dimension.")
+        return None
+    mean, components = basis
+    if components.shape[0] < dim or components.shape[1] != np.asarray(matrix).shape[1]:
+        print(f"[PCA] Basis {path} is {components.shape}, can't give {dim}-d; using full dimension.")
+        return None
+    if len(ids) <= dim:
+        print(f"[PCA] {len(ids)} students <= D={dim}: full-dimension matching is cheaper.")
+        return None
+    index = GalleryIndex(ids, mean, components[:dim], np.asarray(matrix, dtype=np.float32))
+    full_bytes = np.asarray(matrix, dtype=np.float32).nbytes
+    print(
+        f"[PCA] Gallery resident: {index.nbytes() / 1024:.1f} KiB "
+        f"({index.reduced.nbytes / 1024:.1f} KiB {index.dim}-d scan + "
+        f"{index.full.nbytes / 1024:.1f} KiB float16 re-rank copy) + "
+        f"{index.basis_nbytes() / 1024:.1f} KiB basis, "
+        f"vs {full_bytes / 1024:.1f} KiB for full-dimension float32 matching"
+    )
+    return index
+
+
+def _training_embeddings(model_name: str, from_db: bool, students_dir: str, npy: Optional[str]) -> np.ndarray:
+    """Per-photo vectors (not per-student averages) to fit the basis on."""
+    if npy:
+        return np.load(npy)
+    if from_db:
+        from database.db import get_connection
+
+        conn = get_connection()
+        try:
+            rows = conn.execute(
+                "SELECT dim, vector FROM student_embeddings WHERE model_name = ?", (model_name,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return np.asarray(
+            [np.frombuffer(row["vector"], dtype="<f4", count=row["dim"]) for row in rows], dtype=np.float32
+        )
+
+    from face_engine.face_recognize import _load_student_embeddings
+
+    vectors = []
+    for student_id in sorted(os.listdir(students_dir)):
+        cached = _load_student_embeddings(os.path.join(students_dir, student_id), model_name, check_fresh=False)
+        vectors.extend(emb for emb in (cached or {}).values() if emb is not None)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _query_embeddings(students_dir: str, recording: Optional[str], limit: int) -> List[np.ndarray]:
+    """
+    Query faces for the report: every enrollment photo, or every face the
+    detector finds in a recording.
+    """
+    import cv2
+
+    from face_engine.face_detect import FRAME_SCALE
+    from face_engine.face_model import FaceModel
+    from face_engine.face_recognize import _list_images
+
+    face_model = FaceModel()
+    queries: List[np.ndarray] = []
+    if recording:
+        from face_engine.recorder import ReplaySource
+
+        source = ReplaySource(recording)
+        while not limit or len(queries) < limit:
+            ret, frame = source.read()
+            if not ret:
+                break
+            small_frame = cv2.resize(frame, (0, 0), fx=FRAME_SCALE, fy=FRAME_SCALE)
+            queries.extend(item["embedding"] for item in face_model.detect_and_embed(small_frame))
+        source.release()
+        return queries
+
+    for student_id in sorted(os.listdir(students_dir)):
+        for image_path in _list_images(os.path.join(students_dir, student_id)):
+            queries.extend(face_model.image_embeddings(image_path))
+    return queries[:limit] if limit else queries
+
+
+def accuracy_report(
+    students_dir: str,
+    dims: Sequence[int],
+    recording: Optional[str] = None,
+    limit: int = 0,
+    rerank_k: int = PCA_RERANK_K,
+    path: Optional[str] = None,
+) -> None:
+    from face_engine.face_detect import _decide_match, _score_embedding
+    from face_engine.face_model import DEFAULT_MODEL
+    from face_engine.face_recognize import load_known_faces
+
+    path = path or basis_path(DEFAULT_MODEL)
+    basis = load_basis(path)
+    if basis is None:
+        raise SystemExit(f"No basis at {path}; run `python -m face_engine.gallery_pca fit` first")
+    mean, components = basis
+    encodings, ids = load_known_faces(students_dir)
+    if len(ids) < 2:
+        raise SystemExit("Need at least 2 enrolled students for a PCA report")
+    matrix = np.asarray(encodings, dtype=np.float32)
+    queries = _query_embeddings(students_dir, recording, limit)
+    if not queries:
+        raise SystemExit("No query faces found")
+
+    started = time.perf_counter()
+    reference = [_score_embedding(q, matrix) for q in queries]
+    full_us = (time.perf_counter() - started) / len(queries) * 1e6
+    ref_names = [_decide_match(b, s, sec, ids) for b, s, sec in reference]
+
+    print(f"{len(queries)} query faces, {len(ids)} students, re-rank top {rerank_k}")
+    # KiB: the gallery the matcher keeps resident (for a D row, the index
+    # alone; the float32 gallery is dropped once the index is built). The
+    # basis comes on top, once per model.
+    print(f"{'D':>5} {'same top-1':>10} {'same decision':>13} {'max |dscore|':>12} {'us/query':>9} {'KiB':>8}")
+    print(
+        f"{matrix.shape[1]:>5} {1.0:>10.4f} {1.0:>13.4f} {0.0:>12.4f} "
+        f"{full_us:>9.1f} {matrix.nbytes / 1024:>8.1f}"
+    )
+    for dim in dims:
+        if dim > components.shape[0]:
+            print(f"{dim:>5} skipped: the basis only has {components.shape[0]} components")
+            continue
+        index = GalleryIndex(ids, mean, components[:dim], matrix, rerank_k=rerank_k)
+        started = time.perf_counter()
+        results = [index.score(q) for q in queries]
+        us = (time.perf_counter() - started) / len(queries) * 1e6
+        same_top1 = np.mean([r[0] == ref[0] for r, ref in zip(results, reference)])
+        names = [_decide_match(b, s, sec, ids) for b, s, sec in results]
+        same_decision = np.mean([a == b for a, b in zip(names, ref_names)])
+        max_diff = max(abs(r[1] - ref[1]) for r, ref in zip(results, reference))
+        print(
+            f"{index.dim:>5} {same_top1:>10.4f} {same_decision:>13.4f} {max_diff:>12.4f} "
+            f"{us:>9.1f} {index.nbytes() / 1024:>8.1f}  (+{index.basis_nbytes() / 1024:.1f} KiB basis)"
+        )
+
+
+def fit_command(model_name: str, dim: int, from_db: bool, students_dir: str, npy: Optional[str]) -> None:
+    embeddings = _training_embeddings(model_name, from_db, students_dir, npy)
+    try:
+        mean, components = fit_basis(embeddings, dim)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    path = basis_path(model_name)
+    save_basis(path, model_name, mean, components, len(embeddings))
+    print(f"[PCA] Fitted {components.shape[0]}-d basis on {len(embeddings)} embeddings -> {path}")
+
+
+def main() -> None:
+    from face_engine.face_detect import STUDENTS_DIR
+    from face_engine.face_model import DEFAULT_MODEL
+
+    parser = argparse.ArgumentParser(description="PCA gallery tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit = sub.add_parser("fit", help="Fit a model's basis on many per-photo embeddings")
+    fit.add_argument("--model", default=DEFAULT_MODEL)
+    fit.add_argument("--dim", type=int, default=256, help="components kept (FACE_PCA_DIM <= this)")
+    fit.add_argument("--from-db", action="store_true", help="every student_embeddings row of the model")
+    fit.add_argument("--embeddings", help=".npy file of embeddings (N x dim)")
+    fit.add_argument("--students-dir", default=STUDENTS_DIR, help="per-student embedding caches")
+    report = sub.add_parser("report", help="Compare PCA dimensions against full-dimension matching")
+    report.add_argument("--dims", default="32,64,128,256")
+    report.add_argument("--students-dir", default=STUDENTS_DIR)
+    report.add_argument("--recording", help="use faces from a recording as queries")
+    report.add_argument("--limit", type=int, default=0, help="max query faces")
+    report.add_argument("--rerank-k", type=int, default=PCA_RERANK_K)
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        fit_command(args.model, args.dim, args.from_db, args.students_dir, args.embeddings)
+        return
+    dims = [int(d) for d in args.dims.split(",") if d.strip()]
+    accuracy_report(args.students_dir, dims, args.recording, args.limit, args.rerank_k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import multiprocessing as mp
+import os
+import queue
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from face_engine.frame_ring import FrameRing
+from face_engine.pipeline import detect_stage
+
+# 0 runs detection/embedding in the capture process (the default).
+INFERENCE_WORKERS = int(os.environ.get("FACE_INFERENCE_WORKERS", "0"))
+# Minimum gap between restarts of dead workers, so a worker that can't
+# start (e.g. a missing model) doesn't respawn on every frame.
+WORKER_RESTART_SEC = float(os.environ.get("FACE_WORKER_RESTART_SEC", "5"))
+
+# (slot, frame_seq, detections, inference_ms)
+InferenceResult = Tuple[int, int, List[dict], float]
+
+
+def _worker_main(ring_name, slots, shape, frame_scale, tasks, results, generation) -> None:
+    """
+    Worker process: owns its own FaceModel and reads frames straight out of
+    the shared ring. Only slot numbers and the (small) detections travel
+    through the queues. Tasks from an older generation than `generation`
+    were given up by the pool and are skipped without running inference.
+    """
+    from face_engine.face_model import FaceModel
+    from face_engine.roi import roi_from_env
+
+    ring = FrameRing.attach(ring_name, slots, shape)
+    face_model = FaceModel()
+    roi = roi_from_env()
+    print(f"[INFER] Worker {os.getpid()} ready")
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        slot, seq, task_generation = task
+        if task_generation != generation.value:
+            continue
+        started = time.perf_counter()
+        frame = ring.slot(slot)
+        small_frame = cv2.resize(frame, (0, 0), fx=frame_scale, fy=frame_scale)
+        detections = detect_stage(face_model, small_frame, frame_scale, roi, frame=frame)
+        results.put((slot, seq, detections, (time.perf_counter() - started) * 1000.0))
+
+    ring.close()
+
+
+class InferencePool:
+    """
+    Runs detection + embedding in worker processes fed from a FrameRing.
+
+    The capture loop reads each camera frame directly into a free ring slot.
+    If a worker is idle the slot is submitted and stays reserved until its
+    result has been collected; otherwise the frame is simply not inferred
+    and the slot is reused. Capture never waits on inference, so it keeps
+    the camera's rate however slow the model is.
+
+    A worker that dies is replaced on a later capture() (at most every
+    WORKER_RESTART_SEC). The frames in flight at that moment are given up
+    (their slots return to the ring and any late results for them are
+    dropped), since the shared task queue doesn't say which of them the dead
+    worker held. Giving them up also starts a new task generation: tasks
+    still queued are drained, and any a live worker picks up anyway are
+    skipped, so they don't keep workers busy that in_flight counts as free.
+    """
+
+    def __init__(self, workers: int, frame_shape: Tuple[int, int, int], frame_scale: float):
+        self.workers = workers
+        # One slot per in-flight frame, one being captured, one spare.
+        self.ring = FrameRing(workers + 2, frame_shape)
+        self._free = list(range(self.ring.slots))
+        # Submitted slots awaiting a result: slot -> frame seq.
+        self._pending = {}
+        self.frame_scale = frame_scale
+        self._next_restart = 0.0
+
+        # Spawn: onnxruntime/OpenCV thread pools don't survive fork().
+        self._ctx = mp.get_context("spawn")
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        # Bumped whenever in-flight tasks are given up; workers skip older ones.
+        self._generation = self._ctx.Value("i", 0)
+        self._procs = [self._start_worker() for _ in range(workers)]
+        self._alive = workers
+        print(f"[INFER] Started {workers} inference worker(s)")
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def _start_worker(self):
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self.ring.name, self.ring.slots, self.ring.shape, self.frame_scale,
+                  self._tasks, self._results, self._generation),
+            daemon=True,
+        )
+        proc.start()
+        return proc
+
+    def _replace_dead_workers(self) -> None:
+        dead = [i for i, proc in enumerate(self._procs) if not proc.is_alive()]
+        self._alive = len(self._procs) - len(dead)
+        if not dead:
+            return
+        # Reclaim every in-flight slot; results that still arrive for them
+        # no longer match _pending and are dropped by poll().
+        if self._pending:
+            self._free.extend(self._pending)
+            self._pending.clear()
+            self._generation.value += 1
+            self._drain_tasks()
+        now = time.monotonic()
+        if now < self._next_restart:
+            return
+        self._next_restart = now + WORKER_RESTART_SEC
+        for i in dead:
+            print(f"[INFER] Worker {self._procs[i].pid} exited ({self._procs[i].exitcode}), restarting")
+            self._procs[i] = self._start_worker()
+        self._alive = len(self._procs)
+
+    def _drain_tasks(self) -> None:
+        """
+        Drops queued tasks of the old generation. Best effort: a task still
+        in the queue's feeder thread is missed here and skipped by the worker.
+        """
+        while True:
+            try:
+                self._tasks.get_nowait()
+            except queue.Empty:
+                break
+
+    def capture(self, cap) -> Tuple[bool, Optional[np.ndarray], Optional[int]]:
+        """
+        Reads the next frame into a free slot. Returns (ret, frame, slot);
+        `frame` is a view of the shared slot. When every slot is reserved
+        the frame is read into a private buffer and `slot` is None (the
+        frame can't be submitted).
+        """
+        self._replace_dead_workers()
+        if not self._free:
+            ret, frame = cap.read()
+            return ret, frame if ret else None, None
+        slot = self._free.pop()
+        view = self.ring.slot(slot)
+        ret, frame = cap.read(view)
+        if not ret:
+            self._free.append(slot)
+            return False, None, None
+        if frame is not view:
+            # Source couldn't decode in place (e.g. size changed): fall back.
+            if frame.shape != view.shape:
+                frame = cv2.resize(frame, (view.shape[1], view.shape[0]))
+            np.copyto(view, frame)
+        return True, view, slot
+
+    def submit(self, slot: int, seq: int) -> bool:
+        """
+        Hands a captured slot to a worker. False (and the slot is released)
+        when every live worker is already busy.
+        """
+        if self.in_flight >= self._alive:
+            self.release(slot)
+            return False
+        self._tasks.put((slot, seq, self._generation.value))
+        self._pending[slot] = seq
+        return True
+
+    def release(self, slot: int) -> None:
+        self._free.append(slot)
+
+    def poll(self) -> List[InferenceResult]:
+        """
+        Finished results, oldest first. Their slots stay reserved until
+        release() so the caller can still read the frame they came from.
+        """
+        done = []
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            slot, seq = result[0], result[1]
+            if self._pending.get(slot) != seq:
+                continue  # given up when a worker died; the slot was reclaimed
+            del self._pending[slot]
+            done.append(result)
+        done.sort(key=lambda item: item[1])
+        return done
+
+    def close(self) -> None:
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self.ring.close()
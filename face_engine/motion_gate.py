@@ -0,0 +1,81 @@
+import os
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from face_engine.roi import NormRect, parse_norm_rect
+
+
+class MotionGate:
+    """
+    Cheap frame-differencing gate in front of the face detector.
+
+    Each frame is cropped to the optional door ROI, shrunk to a tiny grayscale
+    image and compared with the previous one. The gate opens when enough
+    pixels changed and stays open for `keepalive_sec` after the last motion,
+    so a student who stops in the doorway is still detected.
+    """
+
+    def __init__(
+        self,
+        roi: Optional[NormRect] = None,
+        width: int = 64,
+        pixel_threshold: int = 20,
+        min_changed_fraction: float = 0.01,
+        keepalive_sec: float = 2.0,
+    ):
+        self.roi = roi
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.keepalive_sec = keepalive_sec
+        self._prev: Optional[np.ndarray] = None
+        self._last_motion: Optional[float] = None
+        self.motion_fraction = 0.0
+
+    def _tiny_gray(self, frame_bgr: np.ndarray) -> np.ndarray:
+        if self.roi is not None:
+            h, w = frame_bgr.shape[:2]
+            x1, y1, x2, y2 = self.roi
+            frame_bgr = frame_bgr[int(y1 * h):int(y2 * h), int(x1 * w):int(x2 * w)]
+        h, w = frame_bgr.shape[:2]
+        height = max(1, int(round(h * self.width / float(w))))
+        tiny = cv2.resize(frame_bgr, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(tiny, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+
+    def update(self, frame_bgr: np.ndarray, now: float) -> bool:
+        """
+        Feeds one frame; returns True when the detector should run.
+        """
+        gray = self._tiny_gray(frame_bgr)
+        prev, self._prev = self._prev, gray
+        if prev is None or prev.shape != gray.shape:
+            self._last_motion = now
+            return True
+
+        diff = cv2.absdiff(gray, prev)
+        changed = int(np.count_nonzero(diff > self.pixel_threshold))
+        self.motion_fraction = changed / float(diff.size)
+        if self.motion_fraction >= self.min_changed_fraction:
+            self._last_motion = now
+
+        return self.is_open(now)
+
+    def is_open(self, now: float) -> bool:
+        return self._last_motion is not None and now - self._last_motion <= self.keepalive_sec
+
+    def reset(self) -> None:
+        self._prev = None
+        self._last_motion = None
+
+
+def gate_from_env() -> Optional[MotionGate]:
+    if os.environ.get("FACE_MOTION_GATE", "1") != "1":
+        return None
+    return MotionGate(
+        roi=parse_norm_rect(os.environ.get("FACE_MOTION_ROI")),
+        min_changed_fraction=float(os.environ.get("FACE_MOTION_MIN_FRACTION", "0.01")),
+        keepalive_sec=float(os.environ.get("FACE_MOTION_KEEPALIVE_SEC", "2.0")),
+    )
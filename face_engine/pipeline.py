@@ -0,0 +1,193 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from face_engine.detectors import DETECTOR_SCORE_THRESHOLD
+from face_engine.face_model import FaceModel
+from face_engine.roi import NormRect, RegionOfInterest, parse_norm_rect
+from face_engine.stage_timer import StageTimer
+
+# Coarse-to-fine detection: pass 1 on the resized frame with a lower score
+# cut-off; small or weak candidates (and FACE_REFINE_ZONE, e.g. the back of
+# the queue) are re-detected on native-resolution crops of the full frame.
+COARSE_TO_FINE = os.environ.get("FACE_COARSE_TO_FINE", "0") == "1"
+COARSE_THRESHOLD = float(os.environ.get("FACE_COARSE_THRESHOLD", "0.3"))
+# Faces narrower than this (full-frame pixels) get a second look.
+SMALL_FACE_PX = int(os.environ.get("FACE_SMALL_FACE_PX", "64"))
+REFINE_PAD = float(os.environ.get("FACE_REFINE_PAD", "1.0"))
+REFINE_MIN_SIDE = int(os.environ.get("FACE_REFINE_MIN_SIDE", "128"))
+# Cap on candidate crops per frame; FACE_REFINE_ZONE is always refined on top.
+REFINE_MAX_REGIONS = int(os.environ.get("FACE_REFINE_MAX_REGIONS", "4"))
+REFINE_ZONE: Optional[NormRect] = parse_norm_rect(os.environ.get("FACE_REFINE_ZONE"))
+NMS_IOU = 0.4
+
+# Candidate regions skipped because of REFINE_MAX_REGIONS, since start.
+refine_dropped_regions = 0
+
+Box = Tuple[int, int, int, int]
+
+
+def box_iou(a: Box, b: Box) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def to_frame_coords(detections: List[dict], scale: float) -> List[dict]:
+    """
+    Maps bbox/kps from the resized detector input back to the full frame.
+    """
+    for item in detections:
+        left, top, right, bottom = item["bbox"]
+        item["bbox"] = (int(left * scale), int(top * scale), int(right * scale), int(bottom * scale))
+        if item.get("kps") is not None:
+            item["kps"] = item["kps"] * scale
+    return detections
+
+
+def _expand(bbox: Box, frame_w: int, frame_h: int) -> Box:
+    """
+    Square region around a candidate, REFINE_PAD face-widths on each side.
+    """
+    left, top, right, bottom = bbox
+    cx, cy = (left + right) / 2.0, (top + bottom) / 2.0
+    side = max(right - left, bottom - top) * (1 + 2 * REFINE_PAD)
+    half = max(side, REFINE_MIN_SIDE) / 2.0
+    return (
+        max(0, int(cx - half)),
+        max(0, int(cy - half)),
+        min(frame_w, int(cx + half)),
+        min(frame_h, int(cy + half)),
+    )
+
+
+def _merge_regions(regions: List[Box]) -> List[Box]:
+    """
+    Unions overlapping regions so no pixel is detected twice.
+    """
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    merged[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+def _nms(detections: List[dict], iou_threshold: float = NMS_IOU) -> List[dict]:
+    kept: List[dict] = []
+    for item in sorted(detections, key=lambda d: d["det_score"], reverse=True):
+        if all(box_iou(item["bbox"], other["bbox"]) < iou_threshold for other in kept):
+            kept.append(item)
+    return kept
+
+
+def refine_detections(
+    face_model: FaceModel,
+    frame: np.ndarray,
+    detections: List[dict],
+    zone: Optional[NormRect] = REFINE_ZONE,
+    roi: Optional[RegionOfInterest] = None,
+) -> List[dict]:
+    """
+    Second pass of coarse-to-fine detection. `detections` are pass-1 results
+    in full-frame coordinates. Confident, large faces are kept as they are.
+    Small or weak ones are re-detected on native-resolution crops of `frame`,
+    together with `zone`. Crop results are shifted back to frame coordinates,
+    dropped when centred outside `roi`, and merged with NMS. Weak candidates
+    the second pass doesn't confirm are dropped.
+    """
+    global refine_dropped_regions
+    frame_h, frame_w = frame.shape[:2]
+    kept: List[dict] = []
+    regions: List[Box] = []
+    if zone is not None:
+        # First, so the merged region holding the zone stays at index 0.
+        x1, y1, x2, y2 = zone
+        regions.append((int(x1 * frame_w), int(y1 * frame_h), int(x2 * frame_w), int(y2 * frame_h)))
+    for item in sorted(detections, key=lambda d: d["det_score"], reverse=True):
+        left, top, right, bottom = item["bbox"]
+        small = min(right - left, bottom - top) < SMALL_FACE_PX
+        if small or item["det_score"] < DETECTOR_SCORE_THRESHOLD:
+            regions.append(_expand(item["bbox"], frame_w, frame_h))
+        else:
+            kept.append(item)
+
+    merged = _merge_regions(regions)
+    limit = REFINE_MAX_REGIONS + (1 if zone is not None else 0)
+    if len(merged) > limit:
+        if refine_dropped_regions % 100 == 0:
+            print(
+                f"[REFINE] {len(merged) - limit} candidate region(s) over FACE_REFINE_MAX_REGIONS="
+                f"{REFINE_MAX_REGIONS} skipped ({refine_dropped_regions} before)"
+            )
+        refine_dropped_regions += len(merged) - limit
+
+    for x1, y1, x2, y2 in merged[:limit]:
+        if x2 - x1 < 16 or y2 - y1 < 16:
+            continue
+        for item in face_model.detect(frame[y1:y2, x1:x2], native=True):
+            left, top, right, bottom = item["bbox"]
+            item["bbox"] = (left + x1, top + y1, right + x1, bottom + y1)
+            if item.get("kps") is not None:
+                item["kps"] = item["kps"] + np.array([x1, y1], dtype=np.float32)
+            cx, cy = (item["bbox"][0] + item["bbox"][2]) / 2.0, (item["bbox"][1] + item["bbox"][3]) / 2.0
+            if roi is not None and not roi.contains(cx, cy, frame_w, frame_h):
+                continue
+            kept.append(item)
+    return _nms(kept)
+
+
+def detect_stage(
+    face_model: FaceModel,
+    small_frame: np.ndarray,
+    frame_scale: float,
+    roi: Optional[RegionOfInterest] = None,
+    timer: Optional[StageTimer] = None,
+    frame: Optional[np.ndarray] = None,
+) -> List[Dict[str, np.ndarray]]:
+    """
+    Detects and embeds faces on the resized frame and returns them in
+    full-frame coordinates. Only the region of interest goes through the
+    detector; faces centred outside it are dropped before embedding.
+
+    With FACE_COARSE_TO_FINE=1 and the full `frame` given, small/weak faces
+    are refined on native-resolution crops and everything is embedded from
+    the full frame.
+    """
+    two_pass = COARSE_TO_FINE and frame is not None
+    det_input, offset = roi.crop(small_frame) if roi else (small_frame, (0, 0))
+    detections = face_model.detect(det_input, threshold=COARSE_THRESHOLD if two_pass else None)
+    if roi:
+        small_h, small_w = small_frame.shape[:2]
+        detections = roi.to_frame(detections, offset, (small_w, small_h))
+    if timer is not None:
+        timer.lap("detect")
+
+    if two_pass:
+        to_frame_coords(detections, 1 / frame_scale)
+        detections = refine_detections(face_model, frame, detections, roi=roi)
+        if timer is not None:
+            timer.lap("refine")
+        face_model.embed(frame, detections)
+    else:
+        face_model.embed(small_frame, detections)
+        # Scale back coordinates to original frame
+        to_frame_coords(detections, 1 / frame_scale)
+    if timer is not None:
+        timer.lap("embed")
+    return detections
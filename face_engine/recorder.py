@@ -0,0 +1,218 @@
+"""
+Frame recording and deterministic replay.
+
+A recording is a directory with:
+- frames.mjpeg: JPEG images back to back
+- index.bin: one little-endian (offset u64, length u32, timestamp f64) per frame
+- meta.json: frame size, JPEG quality, frame count, wall-clock start time
+
+Replay output (written by real_time_face_recognition) is a directory with
+decisions.jsonl and stats.jsonl; `python -m face_engine.recorder compare A B`
+diffs two of them.
+"""
+
+import argparse
+import json
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+FRAMES_FILE = "frames.mjpeg"
+INDEX_FILE = "index.bin"
+META_FILE = "meta.json"
+DECISIONS_FILE = "decisions.jsonl"
+STATS_FILE = "stats.jsonl"
+
+_INDEX_ENTRY = struct.Struct("<QId")
+
+
+class FrameRecorder:
+    """
+    Appends camera frames and their capture timestamps to a recording.
+    """
+
+    def __init__(self, path: str, jpeg_quality: int = 90):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self._frames = open(os.path.join(path, FRAMES_FILE), "wb")
+        self._index = open(os.path.join(path, INDEX_FILE), "wb")
+        self._offset = 0
+        self._count = 0
+        self._size: Optional[Tuple[int, int]] = None
+        self._started_at = time.time()
+
+    def write(self, frame_bgr: np.ndarray, timestamp: float) -> None:
+        ok, jpeg = cv2.imencode(
+            ".jpg", frame_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
+        )
+        if not ok:
+            return
+        data = jpeg.tobytes()
+        self._frames.write(data)
+        self._index.write(_INDEX_ENTRY.pack(self._offset, len(data), timestamp))
+        self._offset += len(data)
+        self._count += 1
+        if self._size is None:
+            self._size = (frame_bgr.shape[1], frame_bgr.shape[0])
+
+    def close(self) -> None:
+        self._frames.close()
+        self._index.close()
+        width, height = self._size or (0, 0)
+        meta = {
+            "frames": self._count,
+            "width": width,
+            "height": height,
+            "jpeg_quality": self.jpeg_quality,
+            "started_at": self._started_at,
+        }
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        print(f"[RECORDER] Saved {self._count} frames to {self.path}")
+
+
+def read_index(path: str) -> List[Tuple[int, int, float]]:
+    with open(os.path.join(path, INDEX_FILE), "rb") as f:
+        data = f.read()
+    return [entry for entry in _INDEX_ENTRY.iter_unpack(data)]
+
+
+class ReplaySource:
+    """
+    cv2.VideoCapture-like source that plays a recording back.
+
+    With realtime=False frames are returned as fast as they are consumed;
+    with realtime=True read() sleeps to keep the original spacing.
+    `timestamp` holds the recorded capture time of the last frame read.
+    """
+
+    def __init__(self, path: str, realtime: bool = False):
+        self.path = path
+        self.realtime = realtime
+        self._index = read_index(path) if os.path.exists(os.path.join(path, INDEX_FILE)) else []
+        self._frames = open(os.path.join(path, FRAMES_FILE), "rb") if self._index else None
+        self._pos = 0
+        self._wall_start: Optional[float] = None
+        self.timestamp: Optional[float] = None
+
+    def isOpened(self) -> bool:
+        return self._frames is not None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Like VideoCapture.read(): if `image` has the frame's shape the frame
+        is decoded into it.
+        """
+        if self._frames is None or self._pos >= len(self._index):
+            return False, None
+        offset, length, ts = self._index[self._pos]
+        self._pos += 1
+
+        if self.realtime:
+            first_ts = self._index[0][2]
+            if self._wall_start is None:
+                self._wall_start = time.monotonic()
+            delay = (ts - first_ts) - (time.monotonic() - self._wall_start)
+            if delay > 0:
+                time.sleep(delay)
+
+        self._frames.seek(offset)
+        buf = np.frombuffer(self._frames.read(length), dtype=np.uint8)
+        self.timestamp = ts
+        frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        if image is not None and frame is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def release(self) -> None:
+        if self._frames is not None:
+            self._frames.close()
+            self._frames = None
+
+
+def _load_jsonl(path: str) -> List[Dict[str, object]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_runs(dir_a: str, dir_b: str) -> bool:
+    """
+    Prints the differences between two replay outputs.
+    Returns True when both runs marked the same students on the same frames.
+    """
+    runs = []
+    for path in (dir_a, dir_b):
+        decisions = _load_jsonl(os.path.join(path, DECISIONS_FILE))
+        marks = {(d["frame"], d["student_id"]) for d in decisions if d.get("marked")}
+        labels = {(d["frame"], tuple(d["bbox"])): d["student_id"] for d in decisions}
+        runs.append((decisions, marks, labels))
+
+    (_, marks_a, labels_a), (_, marks_b, labels_b) = runs
+    students_a = {sid for _, sid in marks_a}
+    students_b = {sid for _, sid in marks_b}
+    print(f"Marked students: A={len(students_a)} B={len(students_b)}")
+    for sid in sorted(students_a - students_b):
+        print(f"  only in A: {sid}")
+    for sid in sorted(students_b - students_a):
+        print(f"  only in B: {sid}")
+    if marks_a != marks_b:
+        print(f"Mark events differ: {len(marks_a ^ marks_b)} (frame, student) pairs")
+
+    shared = labels_a.keys() & labels_b.keys()
+    changed = sum(1 for key in shared if labels_a[key] != labels_b[key])
+    print(
+        f"Face decisions: A={len(labels_a)} B={len(labels_b)} "
+        f"same-box={len(shared)} changed-label={changed}"
+    )
+
+    for name, path in (("A", dir_a), ("B", dir_b)):
+        windows = _load_jsonl(os.path.join(path, STATS_FILE))
+        totals: Dict[str, Tuple[float, int]] = {}
+        for window in windows:
+            for stage, item in window.get("stages", {}).items():
+                total, count = totals.get(stage, (0.0, 0))
+                totals[stage] = (total + item["total_ms"], count + item["count"])
+        line = ", ".join(
+            f"{stage} {total / count:.2f}ms" for stage, (total, count) in totals.items() if count
+        )
+        print(f"Stage means {name}: {line}")
+
+    return students_a == students_b and marks_a == marks_b
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recording / replay utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmp_parser = sub.add_parser("compare", help="Diff two replay output directories")
+    cmp_parser.add_argument("run_a")
+    cmp_parser.add_argument("run_b")
+    info_parser = sub.add_parser("info", help="Show a recording's metadata")
+    info_parser.add_argument("recording")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        same = compare_runs(args.run_a, args.run_b)
+        print("RESULT:", "same attendance" if same else "attendance differs")
+        raise SystemExit(0 if same else 1)
+
+    index = read_index(args.recording)
+    with open(os.path.join(args.recording, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    duration = index[-1][2] - index[0][2] if index else 0.0
+    print(json.dumps(meta, indent=2))
+    print(f"duration: {duration:.1f}s, avg fps: {len(index) / duration if duration else 0:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import json
+import os
+import socket
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Normalized (x1, y1, x2, y2) rectangle, 0..1 relative to the frame size.
+NormRect = Tuple[float, float, float, float]
+
+
+def parse_norm_rect(spec: Optional[str]) -> Optional[NormRect]:
+    """
+    Parses "x1,y1,x2,y2" (fractions of width/height) into a rectangle.
+    Returns None for an empty spec.
+    """
+    if not spec:
+        return None
+    parts = [float(p) for p in spec.split(",")]
+    if len(parts) != 4:
+        raise ValueError(f"Expected x1,y1,x2,y2 but got {spec!r}")
+    x1, y1, x2, y2 = (min(max(p, 0.0), 1.0) for p in parts)
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"Empty rectangle {spec!r}")
+    return x1, y1, x2, y2
+
+
+class RegionOfInterest:
+    """
+    Rectangle or polygon (normalized 0..1 points) the detector is limited to.
+
+    crop() cuts the bounding box of the region out of a frame and, for
+    polygons, blanks the pixels outside it. to_frame() maps detections from
+    crop coordinates back and drops faces whose centre lies outside.
+    """
+
+    def __init__(self, points: Sequence[Tuple[float, float]]):
+        if len(points) < 3:
+            raise ValueError("ROI needs at least 3 points")
+        self.points = np.asarray(
+            [(min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)) for x, y in points],
+            dtype=np.float32,
+        )
+        xs, ys = self.points[:, 0], self.points[:, 1]
+        self.bounds: NormRect = (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max()))
+        self.is_rect = len(points) == 4 and len(set(map(float, xs))) == 2 and len(set(map(float, ys))) == 2
+        self._mask_key: Optional[Tuple[int, int]] = None
+        self._mask: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_spec(cls, spec) -> Optional["RegionOfInterest"]:
+        """
+        Accepts "x1,y1,x2,y2", a JSON list of [x, y] points, or the decoded
+        equivalents. Returns None for an empty spec.
+        """
+        if not spec:
+            return None
+        if isinstance(spec, str):
+            spec = spec.strip()
+            if not spec.startswith("["):
+                x1, y1, x2, y2 = parse_norm_rect(spec)
+                return cls([(x1, y1), (x2, y1), (x2, y2), (x1, y2)])
+            spec = json.loads(spec)
+        if len(spec) == 4 and all(isinstance(v, (int, float)) for v in spec):
+            x1, y1, x2, y2 = spec
+            return cls([(x1, y1), (x2, y1), (x2, y2), (x1, y2)])
+        return cls([(float(x), float(y)) for x, y in spec])
+
+    def _pixel_bounds(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        x1, y1, x2, y2 = self.bounds
+        return (
+            int(x1 * width),
+            int(y1 * height),
+            max(int(x1 * width) + 1, int(round(x2 * width))),
+            max(int(y1 * height) + 1, int(round(y2 * height))),
+        )
+
+    def crop(self, frame_bgr: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Returns (crop, (offset_x, offset_y)) for the given frame.
+        """
+        height, width = frame_bgr.shape[:2]
+        left, top, right, bottom = self._pixel_bounds(width, height)
+        crop = frame_bgr[top:bottom, left:right]
+        if self.is_rect:
+            return crop, (left, top)
+
+        key = (width, height)
+        if self._mask_key != key:
+            pts = self.points * np.array([width, height], dtype=np.float32)
+            pts -= np.array([left, top], dtype=np.float32)
+            mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+            cv2.fillPoly(mask, [np.round(pts).astype(np.int32)], 255)
+            self._mask, self._mask_key = mask, key
+        return cv2.bitwise_and(crop, crop, mask=self._mask), (left, top)
+
+    def contains(self, x: float, y: float, width: int, height: int) -> bool:
+        if self.is_rect:
+            left, top, right, bottom = self._pixel_bounds(width, height)
+            return left <= x < right and top <= y < bottom
+        pts = self.points * np.array([width, height], dtype=np.float32)
+        return cv2.pointPolygonTest(pts.reshape(-1, 1, 2), (float(x), float(y)), False) >= 0
+
+    def to_frame(
+        self,
+        detections: List[Dict[str, np.ndarray]],
+        offset: Tuple[int, int],
+        frame_size: Tuple[int, int],
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        Shifts bbox/kps by the crop offset and drops faces centred outside.
+        frame_size is (width, height) of the frame that was cropped.
+        """
+        ox, oy = offset
+        width, height = frame_size
+        kept = []
+        for item in detections:
+            left, top, right, bottom = item["bbox"]
+            item["bbox"] = (left + ox, top + oy, right + ox, bottom + oy)
+            if item.get("kps") is not None:
+                item["kps"] = item["kps"] + np.array([ox, oy], dtype=np.float32)
+            cx = (item["bbox"][0] + item["bbox"][2]) / 2.0
+            cy = (item["bbox"][1] + item["bbox"][3]) / 2.0
+            if self.contains(cx, cy, width, height):
+                kept.append(item)
+        return kept
+
+
+def roi_from_env() -> Optional[RegionOfInterest]:
+    """
+    FACE_ROI holds the region for this device directly. Alternatively
+    FACE_ROI_FILE points at a JSON object keyed by device id
+    (FACE_DEVICE_ID, default: hostname) with the same spec formats.
+    """
+    spec = os.environ.get("FACE_ROI")
+    roi_file = os.environ.get("FACE_ROI_FILE")
+    if not spec and roi_file and os.path.exists(roi_file):
+        device_id = os.environ.get("FACE_DEVICE_ID") or socket.gethostname()
+        with open(roi_file, "r", encoding="utf-8") as f:
+            spec = json.load(f).get(device_id)
+        if spec:
+            print(f"[ROI] Using region for device '{device_id}'")
+    return RegionOfInterest.from_spec(spec)
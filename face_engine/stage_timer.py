@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Log-spaced latency buckets: 0.05 ms .. ~6.5 s, ~25% apart. Fixed size, so a
+# histogram costs the same memory no matter how long the loop runs.
+BUCKET_EDGES_MS: List[float] = [0.05 * (1.25 ** i) for i in range(54)]
+
+
+class StageHistogram:
+    """
+    Fixed-memory latency histogram for one pipeline stage.
+    """
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect_right(BUCKET_EDGES_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q: float) -> float:
+        """
+        Upper edge of the bucket holding the q-th percentile (ms).
+        """
+        if self.count == 0:
+            return 0.0
+        target = q / 100.0 * self.count
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            seen += c
+            if seen >= target and c:
+                if idx >= len(BUCKET_EDGES_MS):
+                    return self.max_ms
+                return min(BUCKET_EDGES_MS[idx], self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> Dict[str, float]:
+        mean = self.total_ms / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "mean_ms": round(mean, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p90_ms": round(self.percentile(90), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+        }
+
+
+class StageTimer:
+    """
+    Lap timer for the recognition loop.
+
+    Call begin_frame() once per frame, then lap(stage) after each stage; the
+    time since the previous mark is added to that stage's histogram. Every
+    `interval_sec` the current window is summarised, optionally appended to a
+    JSON-lines file, published to the stats HTTP endpoint, and reset.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[str],
+        dump_path: Optional[str] = None,
+        interval_sec: float = 10.0,
+        http_port: Optional[int] = None,
+    ):
+        self.stages = list(stages)
+        self.dump_path = dump_path
+        self.interval_sec = interval_sec
+        self._hist = {name: StageHistogram() for name in self.stages}
+        self._frames = 0
+        self._mark = time.perf_counter()
+        self._window_start = self._mark
+        self.last_summary: Dict[str, object] = {}
+        self._server = None
+        if http_port:
+            self._start_http(http_port)
+
+    def begin_frame(self) -> None:
+        self._mark = time.perf_counter()
+        self._frames += 1
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self._hist[stage].add((now - self._mark) * 1000.0)
+        self._mark = now
+
+    def record(self, stage: str, ms: float) -> None:
+        """
+        Adds a duration measured elsewhere (e.g. in a worker process).
+        """
+        self._hist[stage].add(ms)
+
+    def skip(self) -> None:
+        """
+        Move the mark forward without recording (for untimed work).
+        """
+        self._mark = time.perf_counter()
+
+    def maybe_flush(self) -> Optional[Dict[str, object]]:
+        now = time.perf_counter()
+        if now - self._window_start < self.interval_sec:
+            return None
+        return self.flush(now)
+
+    def flush(self, now: Optional[float] = None) -> Dict[str, object]:
+        now = time.perf_counter() if now is None else now
+        elapsed = now - self._window_start
+        summary: Dict[str, object] = {
+            "ts": round(time.time(), 3),
+            "window_sec": round(elapsed, 3),
+            "frames": self._frames,
+            "fps": round(self._frames / elapsed, 2) if elapsed > 0 else 0.0,
+            "stages": {
+                name: hist.summary()
+                for name, hist in self._hist.items()
+                if hist.count
+            },
+        }
+        self.last_summary = summary
+        if self.dump_path:
+            with open(self.dump_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary) + "\n")
+
+        self._hist = {name: StageHistogram() for name in self.stages}
+        self._frames = 0
+        self._window_start = now
+        self._mark = time.perf_counter()
+        return summary
+
+    def draw_overlay(self, frame: np.ndarray) -> None:
+        """
+        Draws the last window's per-stage p50/p90 in the top-left corner.
+        """
+        import cv2
+
+        stages = self.last_summary.get("stages") or {}
+        lines = [f"fps {self.last_summary.get('fps', 0.0)}"]
+        for name in self.stages:
+            item = stages.get(name)
+            if item:
+                lines.append(f"{name:<10} {item['p50_ms']:>7.1f} / {item['p90_ms']:>7.1f} ms")
+        for i, text in enumerate(lines):
+            cv2.putText(
+                frame,
+                text,
+                (10, 20 + i * 18),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.45,
+                (0, 255, 255),
+                1,
+            )
+
+    def _start_http(self, port: int) -> None:
+        timer = self
+
+        class _StatsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/stats"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(timer.last_summary).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _StatsHandler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        print(f"[STATS] Serving stage timings on http://127.0.0.1:{port}/stats")
+
+    def close(self) -> None:
+        if self._frames:
+            self.flush()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+def timer_from_env(stages: Sequence[str], dump_path: Optional[str] = None) -> StageTimer:
+    port = os.environ.get("FACE_STATS_PORT")
+    return StageTimer(
+        stages,
+        dump_path=dump_path or os.environ.get("FACE_STATS_FILE") or None,
+        interval_sec=float(os.environ.get("FACE_STATS_INTERVAL_SEC", "10")),
+        http_port=int(port) if port else None,
+    )
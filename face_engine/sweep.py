@@ -0,0 +1,313 @@
+"""
+Accuracy-versus-cost sweep over model, det_size, FRAME_SCALE and the
+matching thresholds.
+
+    python -m face_engine.sweep recordings/run1 \
+        --models buffalo_s,buffalo_l --det-sizes 320,480,640 --scales 0.5,0.75,1.0 \
+        --min-precision 0.98 --min-recall 0.9 --csv sweep.csv
+
+The recording needs a labels.jsonl with one line per labelled frame (frame
+number as in the recording index):
+
+    {"frame": 120, "students": ["ekc23cs004", "ekc23cs011"]}
+
+Unlabelled frames are skipped. Detection + embedding run once per
+(model, det_size, scale); every FACE_SIM_THRESHOLD x FACE_MIN_MARGIN pair is
+then scored in one vectorized pass over the cached best/second scores.
+
+Identification is scored per frame like attendance: each (frame, student)
+counts once (the highest-scoring face for that student), an accepted face is
+a true positive if its student is in the frame's label set, and recall is
+over all labelled (frame, student) pairs.
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from typing import Dict, List, Sequence, Set, Tuple
+
+import cv2
+import numpy as np
+
+from face_engine.face_model import FaceModel
+from face_engine.face_recognize import load_known_faces
+from face_engine.recorder import ReplaySource
+from face_engine.stage_timer import StageHistogram
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUDENTS_DIR = os.path.join(BASE_DIR, "data", "students")
+LABELS_FILE = "labels.jsonl"
+
+THRESHOLDS = np.round(np.arange(0.30, 0.701, 0.025), 3)
+MARGINS = np.round(np.arange(0.0, 0.151, 0.01), 3)
+
+
+def load_labels(recording: str) -> Dict[int, Set[str]]:
+    path = os.path.join(recording, LABELS_FILE)
+    if not os.path.exists(path):
+        raise SystemExit(f"No {LABELS_FILE} in {recording}")
+    labels: Dict[int, Set[str]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                labels[int(item["frame"])] = set(item.get("students") or [])
+    return labels
+
+
+def score_config(
+    recording: str,
+    labels: Dict[int, Set[str]],
+    face_model: FaceModel,
+    known_matrix: np.ndarray,
+    frame_scale: float,
+) -> Tuple[Dict[str, np.ndarray], StageHistogram]:
+    """
+    Runs detect + embed on every labelled frame. Returns per-face arrays
+    (frame, best_idx, best, second) and the per-frame latency histogram.
+    """
+    frames, best_idx, best, second = [], [], [], []
+    latency = StageHistogram()
+    source = ReplaySource(recording)
+    frame_no = -1
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frame_no += 1
+        if frame_no not in labels:
+            continue
+
+        started = time.perf_counter()
+        small_frame = cv2.resize(frame, (0, 0), fx=frame_scale, fy=frame_scale)
+        detections = face_model.detect_and_embed(small_frame)
+        # (0, D) when nothing was detected, so the frame still counts for
+        # latency and its labelled students count as misses.
+        embeddings = np.asarray(
+            [d["embedding"] for d in detections], dtype=np.float32
+        ).reshape(len(detections), known_matrix.shape[1])
+        sims = embeddings @ known_matrix.T
+        latency.add((time.perf_counter() - started) * 1000.0)
+
+        for row in sims:
+            top2 = np.argsort(row)[-2:][::-1]
+            frames.append(frame_no)
+            best_idx.append(int(top2[0]))
+            best.append(float(row[top2[0]]))
+            second.append(float(row[top2[1]]) if len(row) > 1 else -1.0)
+    source.release()
+
+    faces = {
+        "frame": np.asarray(frames, dtype=np.int64),
+        "best_idx": np.asarray(best_idx, dtype=np.int64),
+        "best": np.asarray(best, dtype=np.float32),
+        "second": np.asarray(second, dtype=np.float32),
+    }
+    return faces, latency
+
+
+def sweep_thresholds(
+    faces: Dict[str, np.ndarray],
+    labels: Dict[int, Set[str]],
+    known_ids: Sequence[str],
+    thresholds: np.ndarray = THRESHOLDS,
+    margins: np.ndarray = MARGINS,
+) -> Dict[str, np.ndarray]:
+    """
+    Precision/recall for every (threshold, margin) pair, shape (T, M).
+    """
+    total_pairs = sum(len(students) for students in labels.values())
+    frame, best_idx, best, second = faces["frame"], faces["best_idx"], faces["best"], faces["second"]
+
+    # Keep only the strongest face per (frame, predicted student).
+    order = np.lexsort((-best, best_idx, frame))
+    key = frame[order] * len(known_ids) + best_idx[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = key[1:] != key[:-1]
+    keep = order[first]
+    frame, best_idx, best, second = frame[keep], best_idx[keep], best[keep], second[keep]
+
+    correct = np.array(
+        [known_ids[i] in labels[f] for f, i in zip(frame, best_idx)], dtype=bool
+    )
+    margin = best - second
+    # (T, 1, F) & (1, M, F) -> (T, M, F)
+    accepted = (best[None, None, :] >= thresholds[:, None, None]) & (
+        margin[None, None, :] >= margins[None, :, None]
+    )
+    tp = (accepted & correct).sum(axis=2)
+    fp = (accepted & ~correct).sum(axis=2)
+    precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 1.0)
+    recall = tp / total_pairs if total_pairs else np.zeros_like(tp, dtype=float)
+    return {"tp": tp, "fp": fp, "precision": precision, "recall": recall}
+
+
+def best_operating_point(
+    result: Dict[str, np.ndarray], min_precision: float, min_recall: float = 0.0
+) -> Dict[str, object]:
+    """
+    Highest-recall (threshold, margin) pair with precision >= min_precision.
+    With no such pair, "feasible" is False and the point's fields are None
+    rather than a made-up zero. "meets_bar" also needs recall >= min_recall.
+    """
+    ok = result["precision"] >= min_precision
+    if not ok.any():
+        return {
+            "feasible": False, "meets_bar": False,
+            "threshold": None, "margin": None, "precision": None, "recall": None,
+        }
+    recall = np.where(ok, result["recall"], -1.0)
+    t_idx, m_idx = np.unravel_index(int(np.argmax(recall)), recall.shape)
+    best_recall = float(result["recall"][t_idx, m_idx])
+    return {
+        "feasible": True,
+        "meets_bar": best_recall >= min_recall,
+        "threshold": float(THRESHOLDS[t_idx]),
+        "margin": float(MARGINS[m_idx]),
+        "precision": float(result["precision"][t_idx, m_idx]),
+        "recall": best_recall,
+    }
+
+
+def pareto_front(points: List[Tuple[float, float]]) -> List[bool]:
+    """
+    (cost, accuracy) points; True where no other point is cheaper-or-equal
+    and at least as accurate (strictly better in one).
+    """
+    flags = []
+    for i, (cost, acc) in enumerate(points):
+        dominated = any(
+            c <= cost and a >= acc and (c < cost or a > acc)
+            for j, (c, a) in enumerate(points)
+            if j != i
+        )
+        flags.append(not dominated)
+    return flags
+
+
+def run_sweep(
+    recording: str,
+    models: Sequence[str],
+    det_sizes: Sequence[int],
+    scales: Sequence[float],
+    min_precision: float,
+    min_recall: float = 0.0,
+    students_dir: str = STUDENTS_DIR,
+    csv_path: str = "",
+) -> List[Dict[str, object]]:
+    labels = load_labels(recording)
+    rows: List[Dict[str, object]] = []
+    csv_rows: List[List[object]] = []
+
+    for model_name in models:
+        for det_size in det_sizes:
+            face_model = FaceModel(det_size=(det_size, det_size), model_name=model_name)
+            encodings, known_ids = load_known_faces(students_dir, face_model=face_model)
+            if not known_ids:
+                raise SystemExit(f"No enrolled students for {model_name}")
+            known_matrix = np.asarray(encodings, dtype=np.float32)
+
+            for scale in scales:
+                faces, latency = score_config(recording, labels, face_model, known_matrix, scale)
+                result = sweep_thresholds(faces, labels, known_ids)
+                lat = latency.summary()
+
+                rows.append(
+                    {
+                        "model": model_name,
+                        "det_size": det_size,
+                        "scale": scale,
+                        "mean_ms": lat["mean_ms"],
+                        "p90_ms": lat["p90_ms"],
+                        **best_operating_point(result, min_precision, min_recall),
+                    }
+                )
+                for ti, threshold in enumerate(THRESHOLDS):
+                    for mi, margin in enumerate(MARGINS):
+                        csv_rows.append(
+                            [
+                                model_name, det_size, scale, lat["mean_ms"], lat["p90_ms"],
+                                float(threshold), float(margin),
+                                int(result["tp"][ti, mi]), int(result["fp"][ti, mi]),
+                                round(float(result["precision"][ti, mi]), 4),
+                                round(float(result["recall"][ti, mi]), 4),
+                            ]
+                        )
+
+    # Only configurations that meet the bar compete on the front.
+    candidates = [row for row in rows if row["meets_bar"]]
+    flags = pareto_front([(row["mean_ms"], row["recall"]) for row in candidates])
+    for row in rows:
+        row["pareto"] = False
+    for row, flag in zip(candidates, flags):
+        row["pareto"] = flag
+
+    if csv_path:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["model", "det_size", "scale", "mean_ms", "p90_ms", "threshold",
+                 "margin", "tp", "fp", "precision", "recall"]
+            )
+            writer.writerows(csv_rows)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Accuracy vs cost sweep on a labelled recording")
+    parser.add_argument("recording")
+    parser.add_argument("--models", default="buffalo_s,buffalo_l")
+    parser.add_argument("--det-sizes", default="320,480,640")
+    parser.add_argument("--scales", default="0.5,0.75,1.0")
+    parser.add_argument("--min-precision", type=float, default=0.98)
+    parser.add_argument("--min-recall", type=float, default=0.0, help="accuracy bar for 'cheapest'")
+    parser.add_argument("--students-dir", default=STUDENTS_DIR)
+    parser.add_argument("--csv", default="", help="write every (config, threshold, margin) row here")
+    args = parser.parse_args()
+
+    rows = run_sweep(
+        args.recording,
+        [m.strip() for m in args.models.split(",") if m.strip()],
+        [int(s) for s in args.det_sizes.split(",") if s.strip()],
+        [float(s) for s in args.scales.split(",") if s.strip()],
+        args.min_precision,
+        min_recall=args.min_recall,
+        students_dir=args.students_dir,
+        csv_path=args.csv,
+    )
+
+    rows.sort(key=lambda row: row["mean_ms"])
+    print(
+        f"{'':1} {'model':<10} {'det':>4} {'scale':>5} {'mean ms':>8} {'p90 ms':>7} "
+        f"{'thr':>6} {'margin':>6} {'prec':>6} {'recall':>6}"
+    )
+    for row in rows:
+        mark = "*" if row["pareto"] else ("-" if not row["meets_bar"] else " ")
+        config = (
+            f"{mark:1} {row['model']:<10} {row['det_size']:>4} {row['scale']:>5.2f} "
+            f"{row['mean_ms']:>8.1f} {row['p90_ms']:>7.1f} "
+        )
+        if not row["feasible"]:
+            print(config + f"no threshold reaches precision {args.min_precision}")
+            continue
+        print(
+            config + f"{row['threshold']:>6.3f} {row['margin']:>6.3f} "
+            f"{row['precision']:>6.3f} {row['recall']:>6.3f}"
+        )
+    print(
+        f"* Pareto-optimal (latency vs recall at precision >= {args.min_precision}); "
+        f"- misses the bar (recall >= {args.min_recall})"
+    )
+    cheapest = next((row for row in rows if row["meets_bar"]), None)
+    if cheapest:
+        print(
+            f"Cheapest config meeting the bar: {cheapest['model']} det_size={cheapest['det_size']} "
+            f"FRAME_SCALE={cheapest['scale']} FACE_SIM_THRESHOLD={cheapest['threshold']} "
+            f"FACE_MIN_MARGIN={cheapest['margin']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 import click
-from database.db import init_db, get_connection
+from database.db import init_db, get_connection, rebuild_daily_stats, rebuild_student_presence
 from backend.auth import create_user, hash_password
 import os
 
@@ -62,6 +62,95 @@ def seed():
     conn.close()
 
 
+@cli.command()
+@click.option("--student", "student_ids", multiple=True, help="Only these student IDs (repeatable).")
+def embed_students(student_ids):
+    """Precompute face embeddings for students' stored photos (student_embeddings)."""
+    from backend.embedding_jobs import EMBEDDING_MODELS, compute_student_embeddings
+
+    data_dir = os.path.join(os.path.dirname(__file__), 'data', 'students')
+    conn = get_connection()
+    rows = conn.execute("SELECT student_id FROM students ORDER BY student_id").fetchall()
+    conn.close()
+
+    targets = [r[0] for r in rows if not student_ids or r[0] in student_ids]
+    click.echo(f"Models: {', '.join(EMBEDDING_MODELS)}")
+    total = 0
+    for student_id in targets:
+        written = compute_student_embeddings(student_id, os.path.join(data_dir, student_id))
+        total += written
+        click.echo(f"{student_id}: {written} new vector(s)")
+    click.echo(f"Done. {total} vector(s) written for {len(targets)} student(s).")
+
+
+@cli.command("backfill-presence")
+def backfill_presence():
+    """Rebuild student_presence (who is on which bus) from driver_logs."""
+    conn = get_connection()
+    try:
+        written = rebuild_student_presence(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    click.echo(f"student_presence rebuilt: {written} student(s).")
+
+
+@cli.command("rebuild-daily-stats")
+@click.option("--from", "start_day", default=None, help="First day, YYYY-MM-DD (default: oldest live row).")
+@click.option("--to", "end_day", default=None, help="Last day, YYYY-MM-DD (default: no limit).")
+def rebuild_daily_stats_cmd(start_day, end_day):
+    """Recompute daily_trip_stats from driver_logs and attendance."""
+    conn = get_connection()
+    try:
+        written = rebuild_daily_stats(conn, start_day, end_day)
+        conn.commit()
+    finally:
+        conn.close()
+    click.echo(f"daily_trip_stats rebuilt: {written} row(s) written.")
+
+
+@cli.command()
+@click.option("--days", type=int, default=None, help="Keep this many days live (default ARCHIVE_RETENTION_DAYS).")
+@click.option("--table", "tables", multiple=True, help="Only these tables (repeatable).")
+@click.option("--dry-run", is_flag=True, help="Only count the rows that would be archived.")
+@click.option("--vacuum", is_flag=True, help="First switch the DB to auto_vacuum=INCREMENTAL (one-time full VACUUM).")
+def archive(days, tables, dry_run, vacuum):
+    """Move old locations, driver logs and notifications into per-day gzip files."""
+    from database.archive import (
+        ARCHIVE_RETENTION_DAYS, ARCHIVE_TABLES, archive_old_rows, enable_incremental_vacuum,
+    )
+
+    if vacuum and not dry_run:
+        click.echo("Switching to incremental auto-vacuum (full VACUUM)...")
+        enable_incremental_vacuum()
+    report = archive_old_rows(
+        retention_days=ARCHIVE_RETENTION_DAYS if days is None else days,
+        tables=tables or ARCHIVE_TABLES,
+        dry_run=dry_run,
+    )
+    click.echo(f"Cutoff: rows before {report['cutoff']} (UTC)")
+    for table, per_day in report["tables"].items():
+        verb = "would archive" if dry_run else "archived"
+        click.echo(f"{table}: {verb} {sum(per_day.values())} row(s) over {len(per_day)} day(s)")
+    if report["pages_freed"] is None and not dry_run:
+        click.echo("auto_vacuum is not INCREMENTAL; run with --vacuum once to reclaim space.")
+    elif report["pages_freed"] is not None:
+        click.echo(f"Pages freed: {report['pages_freed']}")
+
+
+@cli.command("archive-export")
+@click.argument("table")
+@click.option("--from", "start_day", required=True, help="First day, YYYY-MM-DD.")
+@click.option("--to", "end_day", default=None, help="Last day, YYYY-MM-DD (default: --from).")
+def archive_export(table, start_day, end_day):
+    """Stream archived rows of TABLE as JSON lines on stdout."""
+    import json
+    from database.archive import iter_archived
+
+    for row in iter_archived(table, start_day, end_day):
+        click.echo(json.dumps(row))
+
+
 @cli.command()
 @click.option("--password", default="pass123", show_default=True, help="Default password for new student logins.")
 def init_student_logins(password):
@@ -66,8 +66,9 @@ def _save_notification(conn, student_id, trip_id, trip_type, event_type, send_re
     conn.execute(
         """
         INSERT OR IGNORE INTO notifications (
-            student_id, trip_id, trip_type, event_type, status, provider_sid, error_message, created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            student_id, trip_id, trip_type, event_type, status, provider_sid, error_message,
+            created_at, ts_epoch
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CAST(strftime('%s', ?8) AS INTEGER))
         """,
         (
             student_id,
@@ -90,9 +91,8 @@ def _has_boarded_in_trip(conn, student_id, trip):
         WHERE student_id = ?
           AND driver_id = ?
           AND action = 'IN'
-          AND timestamp >= ?
-          AND (? IS NULL OR timestamp <= ?)
-        ORDER BY timestamp DESC
+          AND ts_epoch >= CAST(strftime('%s', ?) AS INTEGER)
+          AND (? IS NULL OR ts_epoch <= CAST(strftime('%s', ?) AS INTEGER))
         LIMIT 1
         """,
         (
@@ -1,11 +1,31 @@
+import os
+
 from backend.client import mark_attendance as mark_attendance_backend
 
+# "http": POST to the backend's /mark_attendance (default).
+# "direct": recognizer and backend share a host and database; mark in-process.
+ATTENDANCE_MODE = os.getenv("ATTENDANCE_MODE", "http").lower()
+
+
+def _mark_attendance_direct(student_id):
+    from database.attendance_db import mark_student_attendance
+
+    result = mark_student_attendance(student_id)
+    if result is None:
+        return {"error": "unknown student_id"}
+    return result
+
+
 def mark_attendance(student_id):
     try:
-        result = mark_attendance_backend(student_id)
+        if ATTENDANCE_MODE == "direct":
+            result = _mark_attendance_direct(student_id)
+        else:
+            result = mark_attendance_backend(student_id)
         trip_type = result.get("trip_type") or "UNKNOWN"
-        print(f"[ATTENDANCE] {result.get('status')} for {trip_type}")
+        print(f"[ATTENDANCE] {result.get('status') or result.get('error')} for {trip_type}")
     except Exception as e:
-        print("[ATTENDANCE] Backend unavailable")
-
-    
+        if ATTENDANCE_MODE == "direct":
+            print(f"[ATTENDANCE] Database unavailable: {e}")
+        else:
+            print("[ATTENDANCE] Backend unavailable")
@@ -5,6 +5,7 @@ Handles driver operations: registration, student logging (boarding/alighting), b
 
 import sqlite3
 from datetime import datetime, timedelta
+from database import write_queue
 from database.db import get_connection
 
 # ============================================================================
@@ -141,12 +142,11 @@ def log_student_boarding(driver_id, student_id):
         if row[0] != row[1]:
             return {"success": False, "error": f"Student is not assigned to your bus"}
         
-        cursor.execute("""
-            INSERT INTO driver_logs (driver_id, student_id, action)
-            VALUES (?, ?, 'IN')
+        # Batched with other writes by the writer thread; returns once committed.
+        write_queue.execute("""
+            INSERT INTO driver_logs (driver_id, student_id, action, ts_epoch)
+            VALUES (?, ?, 'IN', CAST(strftime('%s', 'now') AS INTEGER))
         """, (driver_id, student_id))
-        
-        conn.commit()
         return {"success": True, "message": f"Student {student_id} boarded"}
     except sqlite3.IntegrityError as e:
         return {"success": False, "error": "Student or Driver not found"}
@@ -190,12 +190,11 @@ def log_student_alighting(driver_id, student_id):
         if row[0] != row[1]:
             return {"success": False, "error": f"Student is not assigned to your bus"}
         
-        cursor.execute("""
-            INSERT INTO driver_logs (driver_id, student_id, action)
-            VALUES (?, ?, 'OUT')
+        # Batched with other writes by the writer thread; returns once committed.
+        write_queue.execute("""
+            INSERT INTO driver_logs (driver_id, student_id, action, ts_epoch)
+            VALUES (?, ?, 'OUT', CAST(strftime('%s', 'now') AS INTEGER))
         """, (driver_id, student_id))
-        
-        conn.commit()
         return {"success": True, "message": f"Student {student_id} alighted"}
     except sqlite3.IntegrityError as e:
         return {"success": False, "error": "Student or Driver not found"}
@@ -220,11 +219,10 @@ def is_student_on_bus(student_id):
         conn = get_connection()
         cursor = conn.cursor()
         
+        # student_presence holds each student's latest log (see migration 020)
         cursor.execute("""
-            SELECT action FROM driver_logs
+            SELECT state FROM student_presence
             WHERE student_id = ?
-            ORDER BY timestamp DESC
-            LIMIT 1
         """, (student_id,))
         
         row = cursor.fetchone()
@@ -251,20 +249,11 @@ def get_students_on_bus(driver_id):
         
         # Get all students assigned to this driver's bus whose last log is 'IN'
         cursor.execute("""
-            SELECT DISTINCT dl.student_id, s.name, s.bus_stop
-            FROM driver_logs dl
-            JOIN students s ON dl.student_id = s.student_id
-            JOIN drivers d ON d.driver_id = dl.driver_id
-            WHERE dl.driver_id = ? AND s.bus_number = d.bus_number AND
-                  dl.student_id IN (
-                      SELECT student_id FROM driver_logs
-                      WHERE action = 'IN'
-                      GROUP BY student_id
-                      HAVING MAX(timestamp) = (
-                          SELECT MAX(timestamp) FROM driver_logs
-                          WHERE student_id = driver_logs.student_id
-                      )
-                  )
+            SELECT p.student_id, s.name, s.bus_stop
+            FROM student_presence p
+            JOIN students s ON p.student_id = s.student_id
+            JOIN drivers d ON d.driver_id = p.driver_id
+            WHERE p.driver_id = ? AND p.state = 'IN' AND s.bus_number = d.bus_number
             ORDER BY s.name
         """, (driver_id,))
         
@@ -301,7 +290,7 @@ def get_recent_logs(driver_id, limit=20):
             JOIN students s ON dl.student_id = s.student_id
             JOIN drivers d ON d.driver_id = dl.driver_id
             WHERE dl.driver_id = ? AND s.bus_number = d.bus_number
-            ORDER BY dl.timestamp DESC
+            ORDER BY dl.ts_epoch DESC, dl.id DESC
             LIMIT ?
         """, (driver_id, limit))
         
@@ -336,22 +325,16 @@ def get_driver_stats(driver_id):
         conn = get_connection()
         cursor = conn.cursor()
         
-        # Get count of students boarded and alighted (only for this bus)
+        # Today's boarded/alighted counts for this bus (daily_trip_stats rollup)
         cursor.execute("""
-            SELECT action, COUNT(*) FROM driver_logs dl
-            JOIN students s ON dl.student_id = s.student_id
-            JOIN drivers d ON d.driver_id = dl.driver_id
-            WHERE dl.driver_id = ? AND s.bus_number = d.bus_number
-            AND DATE(dl.timestamp) = DATE('now')
-            GROUP BY action
+            SELECT COALESCE(SUM(ds.boarded), 0), COALESCE(SUM(ds.alighted), 0)
+            FROM daily_trip_stats ds
+            JOIN drivers d ON d.driver_id = ds.driver_id
+            WHERE ds.driver_id = ? AND ds.date = date('now', 'localtime') AND ds.bus_number = d.bus_number
         """, (driver_id,))
         
-        stats = {"boarded": 0, "alighted": 0, "on_bus": 0}
-        for row in cursor.fetchall():
-            if row[0] == 'IN':
-                stats["boarded"] = row[1]
-            elif row[0] == 'OUT':
-                stats["alighted"] = row[1]
+        row = cursor.fetchone()
+        stats = {"boarded": row[0], "alighted": row[1], "on_bus": 0}
         
         stats["on_bus"] = len(get_students_on_bus(driver_id))
         
@@ -378,24 +361,21 @@ def get_daily_summary(driver_id, date=None):
         conn = get_connection()
         cursor = conn.cursor()
         
-        # Get all logs for the day (only for this bus)
+        # The day's counts for this bus (daily_trip_stats rollup)
         cursor.execute("""
-            SELECT dl.student_id, dl.action, dl.timestamp FROM driver_logs dl
-            JOIN students s ON dl.student_id = s.student_id
-            JOIN drivers d ON d.driver_id = dl.driver_id
-            WHERE dl.driver_id = ? AND s.bus_number = d.bus_number AND DATE(dl.timestamp) = ?
-            ORDER BY dl.timestamp
+            SELECT COALESCE(SUM(ds.boarded), 0), COALESCE(SUM(ds.alighted), 0)
+            FROM daily_trip_stats ds
+            JOIN drivers d ON d.driver_id = ds.driver_id
+            WHERE ds.driver_id = ? AND ds.date = ? AND ds.bus_number = d.bus_number
         """, (driver_id, date))
         
-        logs = cursor.fetchall()
-        boarded = sum(1 for log in logs if log[1] == 'IN')
-        alighted = sum(1 for log in logs if log[1] == 'OUT')
+        boarded, alighted = cursor.fetchone()
         
         return {
             "date": date,
             "total_boarded": boarded,
             "total_alighted": alighted,
-            "logs_count": len(logs)
+            "logs_count": boarded + alighted
         }
     finally:
         conn.close()
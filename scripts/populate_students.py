@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 import os
-import sqlite3
+import sys
 
-DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'bus.db')
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'students')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database.db import get_connection  # noqa: E402  (DB_PATH / configure())
+
+DATA_DIR = os.path.join(ROOT, 'data', 'students')
 
 def main():
-    conn = sqlite3.connect(DB)
+    conn = get_connection()
     c = conn.cursor()
 
     for name in sorted(os.listdir(DATA_DIR)):
@@ -0,0 +1,34 @@
+import pytest
+
+from database import db, testdb
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh migrated database in tmp_path; DB_PATH points at it."""
+    with testdb.isolated_database(directory=str(tmp_path)) as path:
+        yield path
+
+
+@pytest.fixture
+def conn(database):
+    connection = db.get_connection()
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def bus(conn):
+    """Driver D1 on bus B1 with students S1 and S2 assigned to it."""
+    conn.execute(
+        "INSERT INTO drivers (driver_id, name, bus_number) VALUES ('D1', 'Driver', 'B1')"
+    )
+    for student_id in ("S1", "S2"):
+        conn.execute(
+            "INSERT INTO students (student_id, name, bus_number) VALUES (?, ?, 'B1')",
+            (student_id, student_id),
+        )
+    conn.commit()
+    return "B1"
@@ -0,0 +1,54 @@
+import time
+
+from database import archive
+
+
+def _insert_locations(conn, days_ago, count):
+    base = (int(time.time()) // archive.DAY_SECONDS - days_ago) * archive.DAY_SECONDS
+    for i in range(count):
+        conn.execute(
+            """
+            INSERT INTO bus_locations (trip_id, bus_number, source, lat, lng, timestamp, ts_epoch)
+            VALUES (1, 'B1', 'GPS_DEVICE', ?, ?, datetime(?, 'unixepoch'), ?)
+            """,
+            (10.0 + i, 76.0, base + i * 60, base + i * 60),
+        )
+    conn.commit()
+
+
+def test_archive_round_trip(conn, tmp_path):
+    _insert_locations(conn, days_ago=40, count=5)
+    _insert_locations(conn, days_ago=1, count=2)
+    old = [dict(row) for row in conn.execute("SELECT * FROM bus_locations ORDER BY id LIMIT 5")]
+    day = archive._day_name(old[0]["ts_epoch"] // archive.DAY_SECONDS)
+
+    report = archive.archive_old_rows(retention_days=30, tables=["bus_locations"], archive_dir=str(tmp_path))
+    assert report["tables"]["bus_locations"] == {day: 5}
+    assert conn.execute("SELECT COUNT(*) FROM bus_locations").fetchone()[0] == 2
+
+    assert archive.archived_days("bus_locations", str(tmp_path)) == [day]
+    assert list(archive.iter_archived("bus_locations", day, archive_dir=str(tmp_path))) == old
+
+
+def test_rerun_after_interruption_does_not_duplicate(conn, tmp_path):
+    _insert_locations(conn, days_ago=40, count=3)
+    day_index = conn.execute("SELECT ts_epoch FROM bus_locations").fetchone()[0] // archive.DAY_SECONDS
+    day = archive._day_name(day_index)
+    path = archive.archive_path("bus_locations", day, str(tmp_path))
+    # A run that wrote the file but stopped before deleting the rows.
+    archive._write_day(conn, "bus_locations", day_index, path)
+
+    archive.archive_old_rows(retention_days=30, tables=["bus_locations"], archive_dir=str(tmp_path))
+    rows = list(archive.iter_archived("bus_locations", day, archive_dir=str(tmp_path)))
+    assert len(rows) == 3
+    assert conn.execute("SELECT COUNT(*) FROM bus_locations").fetchone()[0] == 0
+
+
+def test_dry_run_keeps_rows(conn, tmp_path):
+    _insert_locations(conn, days_ago=40, count=2)
+    report = archive.archive_old_rows(
+        retention_days=30, tables=["bus_locations"], archive_dir=str(tmp_path), dry_run=True
+    )
+    assert sum(report["tables"]["bus_locations"].values()) == 2
+    assert conn.execute("SELECT COUNT(*) FROM bus_locations").fetchone()[0] == 2
+    assert archive.archived_days("bus_locations", str(tmp_path)) == []
@@ -0,0 +1,28 @@
+from database.attendance_db import mark_attendance_db
+
+
+def _rows(conn):
+    return conn.execute(
+        "SELECT student_id, date, time, trip_type, ts_epoch FROM attendance ORDER BY id"
+    ).fetchall()
+
+
+def test_duplicate_mark_for_same_trip_type_is_rejected(bus, conn):
+    assert mark_attendance_db("S1", trip_type="TO_SCHOOL", bus_number=bus) is True
+    assert mark_attendance_db("S1", trip_type="TO_SCHOOL", bus_number=bus) is False
+    assert mark_attendance_db("S1", trip_type="TO_HOME", bus_number=bus) is True
+    assert mark_attendance_db("S2", trip_type="TO_SCHOOL", bus_number=bus) is True
+
+    rows = _rows(conn)
+    assert [(row["student_id"], row["trip_type"]) for row in rows] == [
+        ("S1", "TO_SCHOOL"),
+        ("S1", "TO_HOME"),
+        ("S2", "TO_SCHOOL"),
+    ]
+
+
+def test_mark_without_trip_type_is_once_per_day(bus, conn):
+    assert mark_attendance_db("S1") is True
+    assert mark_attendance_db("S1") is False
+    assert len(_rows(conn)) == 1
+
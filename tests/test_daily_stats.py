@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from database.attendance_db import mark_attendance_db
+from database.db import rebuild_daily_stats
+from modules.driver_manager import log_student_alighting, log_student_boarding
+
+QUERY = """
+    SELECT date, bus_number, driver_id, trip_type, boarded, alighted, attended
+    FROM daily_trip_stats
+    ORDER BY date, bus_number, driver_id, trip_type
+"""
+
+
+def _stats(conn):
+    return [tuple(row) for row in conn.execute(QUERY)]
+
+
+@pytest.fixture
+def trip(bus, conn):
+    cur = conn.execute(
+        """
+        INSERT INTO bus_trips (driver_id, bus_number, trip_type, status, started_at, service_date)
+        VALUES ('D1', 'B1', 'TO_SCHOOL', 'ACTIVE', datetime('now', '-1 hour'), date('now'))
+        """
+    )
+    conn.commit()
+    return cur.lastrowid
+
+
+def _ride(trip_id):
+    for student_id in ("S1", "S2"):
+        assert log_student_boarding("D1", student_id)["success"]
+        assert mark_attendance_db(student_id, trip_id=trip_id, trip_type="TO_SCHOOL", bus_number="B1")
+    assert log_student_alighting("D1", "S1")["success"]
+
+
+def test_triggers_count_boarding_and_attendance(trip, conn):
+    _ride(trip)
+    rows = _stats(conn)
+    assert len(rows) == 1
+    _, bus_number, driver_id, trip_type, boarded, alighted, attended = rows[0]
+    assert (bus_number, driver_id, trip_type) == ("B1", "D1", "TO_SCHOOL")
+    assert (boarded, alighted, attended) == (2, 1, 2)
+
+
+def test_rebuild_matches_triggers(trip, conn):
+    _ride(trip)
+    maintained = _stats(conn)
+
+    conn.execute("DELETE FROM daily_trip_stats")
+    rebuild_daily_stats(conn)
+    conn.commit()
+    assert _stats(conn) == maintained
+
+
+def test_deleting_a_student_recounts_their_days(trip, conn):
+    from backend.app import app
+    from backend.auth import generate_token
+
+    _ride(trip)
+    with app.app_context():
+        token = generate_token(1, "admin", "admin")
+    response = app.test_client().delete(
+        "/students/S1", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+
+    (row,) = _stats(conn)
+    assert row[4:] == (1, 0, 1)
+
+    conn.execute("DELETE FROM daily_trip_stats")
+    rebuild_daily_stats(conn)
+    conn.commit()
+    assert _stats(conn) == [row]
+
+
+def test_days_are_local_dates(bus, conn, monkeypatch):
+    # UTC+5:30: 20:00 UTC is already the next local day.
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    try:
+        conn.execute(
+            """
+            INSERT INTO driver_logs (driver_id, student_id, timestamp, action, ts_epoch)
+            VALUES ('D1', 'S1', '2026-03-14 20:00:00', 'IN', CAST(strftime('%s', '2026-03-14 20:00:00') AS INTEGER))
+            """
+        )
+        conn.execute(
+            "INSERT INTO attendance (student_id, date, time, bus_number) VALUES ('S1', '2026-03-15', '01:30:00', 'B1')"
+        )
+        conn.commit()
+        maintained = _stats(conn)
+        assert {row[0] for row in maintained} == {"2026-03-15"}
+
+        conn.execute("DELETE FROM daily_trip_stats")
+        rebuild_daily_stats(conn)
+        conn.commit()
+        assert _stats(conn) == maintained
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,12 @@
+from database import db
+
+
+def test_with_block_yields_the_pooled_proxy(database):
+    with db.get_connection() as conn:
+        assert isinstance(conn, db.PooledConnection)
+        conn.execute("INSERT INTO students (student_id, name) VALUES ('S1', 'S1')")
+    check = db.get_connection()
+    try:
+        assert check.execute("SELECT COUNT(*) FROM students").fetchone()[0] == 1
+    finally:
+        check.close()
@@ -0,0 +1,23 @@
+from face_engine.detector_bench import _match_boxes
+
+
+def test_match_boxes_is_one_to_one():
+    reference = [(0, 0, 10, 10), (20, 0, 30, 10)]
+    # Two detections overlap the first reference box; only one may count.
+    found = [(0, 0, 10, 10), (1, 0, 11, 10)]
+    assert _match_boxes(reference, found, 0.5) == 1
+
+
+def test_match_boxes_prefers_best_overlap():
+    reference = [(0, 0, 10, 10), (4, 0, 14, 10)]
+    found = [(4, 0, 14, 10), (0, 0, 10, 10)]
+    assert _match_boxes(reference, found, 0.5) == 2
+
+
+def test_match_boxes_respects_iou_threshold():
+    reference = [(0, 0, 10, 10)]
+    found = [(5, 0, 15, 10)]  # IoU 1/3
+    assert _match_boxes(reference, found, 0.5) == 0
+    assert _match_boxes(reference, found, 0.3) == 1
+    assert _match_boxes([], found, 0.5) == 0
+    assert _match_boxes(reference, [], 0.5) == 0
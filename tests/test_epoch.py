@@ -0,0 +1,39 @@
+from datetime import datetime, timezone
+
+from database.attendance_db import mark_attendance_db
+from modules.alerts import _save_notification
+from modules.driver_manager import log_student_boarding
+
+
+def _utc_epoch(text):
+    return int(datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp())
+
+
+def test_attendance_insert_sets_local_epoch(bus, conn):
+    mark_attendance_db("S1", trip_type="TO_SCHOOL", bus_number=bus)
+    row = conn.execute("SELECT date, time, ts_epoch FROM attendance").fetchone()
+    marked_at = datetime.strptime(f"{row['date']} {row['time']}", "%Y-%m-%d %H:%M:%S")
+    assert row["ts_epoch"] == int(marked_at.timestamp())
+
+
+def test_driver_log_insert_sets_utc_epoch(bus, conn):
+    assert log_student_boarding("D1", "S1")["success"]
+    row = conn.execute("SELECT timestamp, ts_epoch FROM driver_logs").fetchone()
+    assert row["ts_epoch"] == _utc_epoch(row["timestamp"])
+
+
+def test_notification_insert_sets_utc_epoch(bus, conn):
+    _save_notification(conn, "S1", 1, "TO_SCHOOL", "BOARDED", {"status": "SKIPPED"})
+    conn.commit()
+    row = conn.execute("SELECT created_at, ts_epoch FROM notifications").fetchone()
+    assert row["ts_epoch"] == _utc_epoch(row["created_at"])
+
+
+def test_trigger_fills_epoch_for_inserts_that_omit_it(bus, conn):
+    conn.execute(
+        "INSERT INTO driver_logs (driver_id, student_id, timestamp, action) "
+        "VALUES ('D1', 'S1', '2026-03-14 08:00:00', 'IN')"
+    )
+    conn.commit()
+    row = conn.execute("SELECT ts_epoch FROM driver_logs").fetchone()
+    assert row["ts_epoch"] == _utc_epoch("2026-03-14 08:00:00")
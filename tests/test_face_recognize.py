@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+from face_engine.face_recognize import _load_student_embeddings, save_student_embeddings
+
+
+def _touch(folder, name):
+    with open(os.path.join(folder, name), "wb") as f:
+        f.write(b"")
+
+
+def test_cache_drops_deleted_photos(tmp_path):
+    folder = str(tmp_path)
+    for name in ("a.jpg", "b.jpg"):
+        _touch(folder, name)
+    save_student_embeddings(
+        folder,
+        "buffalo_s",
+        [{"image": "a.jpg", "embedding": np.ones(4)}, {"image": "b.jpg", "embedding": None}],
+    )
+    assert set(_load_student_embeddings(folder, "buffalo_s")) == {"a.jpg", "b.jpg"}
+
+    os.remove(os.path.join(folder, "a.jpg"))
+    assert _load_student_embeddings(folder, "buffalo_s") is None
+
+    # Re-embedding what is left makes the cache fresh again.
+    save_student_embeddings(folder, "buffalo_s", [{"image": "b.jpg", "embedding": np.ones(4)}])
+    assert set(_load_student_embeddings(folder, "buffalo_s")) == {"b.jpg"}
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from face_engine.gallery_bundle import GalleryBundle, apply_delta
+
+SECRET = "bus-secret"
+DIM = 8
+
+
+@pytest.fixture
+def client(bus, monkeypatch):
+    from backend.app import app
+
+    monkeypatch.setenv("GALLERY_DEVICE_SECRET", SECRET)
+    return app.test_client()
+
+
+def _add_embedding(conn, student_id, seed):
+    vector = np.random.default_rng(seed).standard_normal(DIM).astype("<f4")
+    conn.execute(
+        """
+        INSERT INTO student_embeddings (student_id, model_name, dim, vector, photo_hash)
+        VALUES (?, 'buffalo_s', ?, ?, ?)
+        """,
+        (student_id, DIM, vector.tobytes(), f"{student_id}-{seed}"),
+    )
+    conn.commit()
+
+
+def _get(client, **kwargs):
+    headers = {"X-DEVICE-SECRET": SECRET}
+    if "etag" in kwargs:
+        headers["If-None-Match"] = kwargs.pop("etag")
+    query = "&".join(f"{k}={v}" for k, v in kwargs.items())
+    return client.get(f"/bus/B1/gallery?model=buffalo_s&dtype=float32&{query}", headers=headers)
+
+
+def test_requires_device_secret(client):
+    assert client.get("/bus/B1/gallery").status_code == 401
+
+
+def test_etag_and_delta(client, conn):
+    _add_embedding(conn, "S1", 1)
+    _add_embedding(conn, "S2", 2)
+
+    full = _get(client)
+    assert full.status_code == 200
+    base = GalleryBundle.from_bytes(full.data)
+    assert base.ids == ["S1", "S2"]
+    assert not base.is_delta
+
+    assert _get(client, etag=full.headers["ETag"]).status_code == 304
+
+    _add_embedding(conn, "S2", 3)
+    changed = _get(client, etag=full.headers["ETag"], since=base.version)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != full.headers["ETag"]
+    delta = GalleryBundle.from_bytes(changed.data)
+    assert delta.is_delta
+    assert delta.ids == ["S2"]
+
+    ids, matrix = apply_delta(base, delta)
+    current = GalleryBundle.from_bytes(_get(client).data)
+    assert ids == current.ids
+    np.testing.assert_allclose(matrix, current.matrix, rtol=1e-6)
+
+
+def test_delta_needs_full_download_when_base_is_stale(client, conn):
+    _add_embedding(conn, "S1", 1)
+    base = GalleryBundle.from_bytes(_get(client).data)
+
+    _add_embedding(conn, "S2", 2)
+    _add_embedding(conn, "S1", 3)
+    # Asked from a newer version than `base` has, the delta leaves out S2,
+    # which `base` doesn't have either.
+    delta = GalleryBundle.from_bytes(_get(client, since=base.version + 1).data)
+    assert delta.ids == ["S1"]
+    assert apply_delta(base, delta) is None
+
+
+def test_deleted_student_leaves_db_gallery(client, conn):
+    from backend.auth import generate_token
+    from face_engine.face_recognize import load_known_faces_db
+
+    _add_embedding(conn, "S1", 1)
+    _add_embedding(conn, "S2", 2)
+    # A row left behind for a student that no longer exists.
+    _add_embedding(conn, "GONE", 3)
+    assert load_known_faces_db("buffalo_s")[1] == ["S1", "S2"]
+
+    with client.application.app_context():
+        token = generate_token(1, "admin", "admin")
+    response = client.delete("/students/S1", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+    assert load_known_faces_db("buffalo_s")[1] == ["S2"]
+    assert conn.execute(
+        "SELECT COUNT(*) FROM student_embeddings WHERE student_id = 'S1'"
+    ).fetchone()[0] == 0
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from face_engine.gallery_pca import build_index, fit_basis, save_basis
+
+
+@pytest.fixture
+def basis_file(tmp_path):
+    rng = np.random.default_rng(0)
+    training = rng.standard_normal((500, 64)).astype(np.float32)
+    mean, components = fit_basis(training, 16)
+    path = str(tmp_path / "pca_test.npz")
+    save_basis(path, "test", mean, components, len(training))
+    return path
+
+
+def test_fit_needs_more_samples_than_dims():
+    with pytest.raises(ValueError):
+        fit_basis(np.ones((8, 64), dtype=np.float32), 8)
+
+
+def test_index_finds_enrolled_faces(basis_file):
+    rng = np.random.default_rng(1)
+    gallery = rng.standard_normal((40, 64)).astype(np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    ids = [f"S{i}" for i in range(len(gallery))]
+
+    index = build_index("test", gallery, ids, dim=8, path=basis_file)
+    assert index is not None and index.dim == 8
+    # Resident gallery is smaller than the float32 matrix; the basis is separate.
+    assert index.nbytes() < gallery.nbytes
+
+    for i, row in enumerate(gallery):
+        noisy = row + 0.05 * rng.standard_normal(64).astype(np.float32)
+        best_idx, best, second = index.score(noisy)
+        assert best_idx == i
+        assert best > second
+
+
+def test_index_is_skipped_when_not_worth_it(basis_file, tmp_path):
+    gallery = np.eye(8, 64, dtype=np.float32)
+    ids = [f"S{i}" for i in range(8)]
+    assert build_index("test", gallery, ids, dim=8, path=basis_file) is None  # n <= D
+    assert build_index("test", gallery, ids, dim=32, path=basis_file) is None  # basis too small
+    assert build_index("test", gallery, ids, dim=4, path=str(tmp_path / "missing.npz")) is None
+    assert build_index("test", gallery, ids, dim=0, path=basis_file) is None
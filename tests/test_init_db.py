@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from database import db, testdb
+
+
+@pytest.fixture
+def fresh_path(tmp_path):
+    path = str(tmp_path / "fresh.db")
+    yield path
+    testdb.drop_database(path)
+
+
+def _user_version(path):
+    conn = db._acquire(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_init_db_migrates_and_stamps_user_version(fresh_path):
+    report = db.init_db(fresh_path)
+    assert report["migrations_applied"] == [name for name, _ in db.MIGRATIONS]
+    assert _user_version(fresh_path) == db.SCHEMA_VERSION
+
+    assert db.init_db(fresh_path)["migrations_applied"] == []
+
+
+def test_current_database_skips_the_schema_script(database, monkeypatch):
+    # The fast path must not even read schema.sql.
+    monkeypatch.setattr(db, "SCHEMA_PATH", os.path.join(os.path.dirname(database), "missing.sql"))
+    report = db.init_db()
+    assert report == {"migrations_applied": [], "columns_added": [], "indexes_added": []}
+
+
+def test_failed_migration_rolls_back_everything(fresh_path, monkeypatch):
+    def broken(conn, report):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("migration failed")
+
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS + [("999_broken", broken)])
+    monkeypatch.setattr(db, "SCHEMA_VERSION", db.SCHEMA_VERSION + 1)
+
+    with pytest.raises(RuntimeError):
+        db.init_db(fresh_path)
+
+    assert _user_version(fresh_path) == 0
+    conn = db._acquire(fresh_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+    assert tables == set()
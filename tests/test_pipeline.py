@@ -0,0 +1,43 @@
+import numpy as np
+
+from face_engine import pipeline
+from face_engine.roi import RegionOfInterest
+
+
+class _CropModel:
+    """detect() finds one face in the middle of every crop it is given."""
+
+    def __init__(self):
+        self.crops = []
+
+    def detect(self, image, native=False, threshold=None):
+        h, w = image.shape[:2]
+        self.crops.append((w, h))
+        return [{"bbox": (w // 2 - 5, h // 2 - 5, w // 2 + 5, h // 2 + 5), "det_score": 0.9, "kps": None}]
+
+
+def _weak(cx, cy):
+    return {"bbox": (cx - 5, cy - 5, cx + 5, cy + 5), "det_score": 0.35, "kps": None}
+
+
+def test_refined_faces_outside_roi_are_dropped():
+    frame = np.zeros((400, 800, 3), dtype=np.uint8)
+    roi = RegionOfInterest.from_spec("0,0,0.5,1")
+    found = pipeline.refine_detections(
+        _CropModel(), frame, [_weak(100, 200), _weak(700, 200)], zone=None, roi=roi
+    )
+    centres = [((b[0] + b[2]) // 2, (b[1] + b[3]) // 2) for b in (d["bbox"] for d in found)]
+    assert centres == [(100, 200)]
+
+
+def test_zone_is_kept_when_candidates_hit_the_cap(monkeypatch):
+    monkeypatch.setattr(pipeline, "REFINE_MAX_REGIONS", 1)
+    monkeypatch.setattr(pipeline, "refine_dropped_regions", 0)
+    frame = np.zeros((400, 1600, 3), dtype=np.uint8)
+    model = _CropModel()
+    zone = (0.9, 0.0, 1.0, 0.25)  # 160 x 100 px in the top-right corner
+    pipeline.refine_detections(model, frame, [_weak(100, 300), _weak(600, 300)], zone=zone)
+
+    assert len(model.crops) == 2
+    assert (160, 100) in model.crops
+    assert pipeline.refine_dropped_regions == 1
@@ -0,0 +1,46 @@
+from database.db import rebuild_student_presence
+from modules.driver_manager import (
+    get_students_on_bus,
+    is_student_on_bus,
+    log_student_alighting,
+    log_student_boarding,
+)
+
+
+def test_presence_follows_latest_log(bus, conn):
+    assert not is_student_on_bus("S1")
+
+    assert log_student_boarding("D1", "S1")["success"]
+    assert log_student_boarding("D1", "S2")["success"]
+    assert is_student_on_bus("S1")
+    assert [s["student_id"] for s in get_students_on_bus("D1")] == ["S1", "S2"]
+
+    assert log_student_alighting("D1", "S1")["success"]
+    assert not is_student_on_bus("S1")
+    assert [s["student_id"] for s in get_students_on_bus("D1")] == ["S2"]
+
+    row = conn.execute(
+        "SELECT driver_id, state, log_id FROM student_presence WHERE student_id = 'S1'"
+    ).fetchone()
+    latest = conn.execute(
+        "SELECT id FROM driver_logs WHERE student_id = 'S1' ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    assert (row["driver_id"], row["state"], row["log_id"]) == ("D1", "OUT", latest["id"])
+
+
+def test_double_boarding_is_rejected(bus):
+    assert log_student_boarding("D1", "S1")["success"]
+    assert not log_student_boarding("D1", "S1")["success"]
+    assert not log_student_alighting("D1", "S2")["success"]
+
+
+def test_rebuild_matches_trigger(bus, conn):
+    log_student_boarding("D1", "S1")
+    log_student_boarding("D1", "S2")
+    log_student_alighting("D1", "S2")
+    query = "SELECT * FROM student_presence ORDER BY student_id"
+    maintained = [tuple(row) for row in conn.execute(query)]
+
+    assert rebuild_student_presence(conn) == 2
+    conn.commit()
+    assert [tuple(row) for row in conn.execute(query)] == maintained
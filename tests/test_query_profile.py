@@ -0,0 +1,24 @@
+import sqlite3
+
+from database.query_profile import STATS, ProfilingCursor, query_shape
+
+
+def test_fetch_before_execute():
+    cursor = sqlite3.connect(":memory:").cursor(ProfilingCursor)
+    assert cursor.fetchone() is None
+    assert cursor.fetchall() == []
+    cursor.close()
+
+
+def test_statement_recorded_by_shape():
+    STATS.reset()
+    cursor = sqlite3.connect(":memory:").cursor(ProfilingCursor)
+    for value in (1, 2):
+        cursor.execute("SELECT ? WHERE 1 IN (1, 2, 3)", (value,))
+        assert cursor.fetchall() == [(value,)]
+    cursor.close()
+
+    (entry,) = STATS.snapshot()
+    assert entry["query"] == query_shape("SELECT ? WHERE 1 IN (1, 2, 3)")
+    assert (entry["count"], entry["rows"]) == (2, 2)
+    STATS.reset()
@@ -0,0 +1,101 @@
+import numpy as np
+
+from face_engine.recorder import FrameRecorder
+from face_engine.sweep import (
+    MARGINS,
+    THRESHOLDS,
+    best_operating_point,
+    pareto_front,
+    score_config,
+    sweep_thresholds,
+)
+
+KNOWN_IDS = ["alice", "bob", "carol"]
+
+
+def _faces(rows):
+    frame, best_idx, best, second = zip(*rows)
+    return {
+        "frame": np.asarray(frame, dtype=np.int64),
+        "best_idx": np.asarray(best_idx, dtype=np.int64),
+        "best": np.asarray(best, dtype=np.float32),
+        "second": np.asarray(second, dtype=np.float32),
+    }
+
+
+def test_sweep_thresholds_counts_strongest_face_per_student_and_frame():
+    labels = {0: {"alice"}, 1: {"alice", "bob"}}
+    faces = _faces(
+        [
+            (0, 0, 0.60, 0.20),  # alice, correct
+            (0, 0, 0.40, 0.30),  # weaker duplicate of the same prediction: ignored
+            (1, 1, 0.55, 0.50),  # bob, correct but a small margin
+            (1, 2, 0.45, 0.10),  # carol isn't in frame 1: false positive
+        ]
+    )
+    result = sweep_thresholds(
+        faces, labels, KNOWN_IDS, thresholds=np.array([0.4, 0.5]), margins=np.array([0.0, 0.1])
+    )
+
+    assert result["tp"].tolist() == [[2, 1], [2, 1]]
+    assert result["fp"].tolist() == [[1, 1], [0, 0]]
+    np.testing.assert_allclose(result["recall"], [[2 / 3, 1 / 3], [2 / 3, 1 / 3]])
+    np.testing.assert_allclose(result["precision"], [[2 / 3, 0.5], [1.0, 1.0]])
+
+
+def test_pareto_front():
+    points = [(1.0, 0.80), (2.0, 0.90), (2.0, 0.85), (3.0, 0.90), (0.5, 0.50)]
+    assert pareto_front(points) == [True, True, False, False, True]
+
+
+class _FixedModel:
+    """detect_and_embed() returning one preset list of detections per call."""
+
+    def __init__(self, per_frame):
+        self.per_frame = list(per_frame)
+
+    def detect_and_embed(self, frame):
+        return self.per_frame.pop(0)
+
+
+def test_score_config_handles_frames_without_detections(tmp_path):
+    recording = str(tmp_path / "rec")
+    recorder = FrameRecorder(recording)
+    for i in range(3):
+        recorder.write(np.zeros((32, 32, 3), dtype=np.uint8), float(i))
+    recorder.close()
+
+    known = np.eye(3, 4, dtype=np.float32)
+    model = _FixedModel([[], [{"embedding": known[1]}], []])
+    labels = {0: {"alice"}, 1: {"bob"}, 2: set()}
+
+    faces, latency = score_config(recording, labels, model, known, frame_scale=1.0)
+
+    assert faces["frame"].tolist() == [1]
+    assert faces["best_idx"].tolist() == [1]
+    np.testing.assert_allclose(faces["best"], [1.0])
+
+
+def _grid(precision, recall):
+    shape = (len(THRESHOLDS), len(MARGINS))
+    return {
+        "precision": np.full(shape, precision, dtype=float),
+        "recall": np.full(shape, recall, dtype=float),
+    }
+
+
+def test_best_operating_point_reports_infeasible_explicitly():
+    point = best_operating_point(_grid(0.5, 0.9), min_precision=0.98)
+    assert point["feasible"] is False and point["meets_bar"] is False
+    assert point["threshold"] is None and point["recall"] is None
+
+
+def test_best_operating_point_keeps_real_recall_below_the_bar():
+    result = _grid(0.99, 0.4)
+    result["recall"][2, 3] = 0.6
+    point = best_operating_point(result, min_precision=0.98, min_recall=0.9)
+    assert point["feasible"] is True and point["meets_bar"] is False
+    assert (point["threshold"], point["margin"], point["recall"]) == (
+        float(THRESHOLDS[2]), float(MARGINS[3]), 0.6
+    )
+    assert best_operating_point(result, min_precision=0.98, min_recall=0.5)["meets_bar"] is True
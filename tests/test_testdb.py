@@ -0,0 +1,40 @@
+import os
+
+from database import db, testdb
+
+
+def test_new_database_is_a_migrated_file(tmp_path):
+    path = testdb.new_database(directory=str(tmp_path))
+    try:
+        assert not db.is_memory_path(path)
+        assert os.path.dirname(path) == str(tmp_path)
+        conn = db._acquire(path)
+        try:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+            assert conn.execute("SELECT COUNT(*) FROM students").fetchone()[0] == 0
+        finally:
+            conn.close()
+    finally:
+        testdb.drop_database(path)
+    assert not os.path.exists(path)
+
+
+def test_isolated_database_restores_db_path(tmp_path):
+    previous = db.DB_PATH
+    with testdb.isolated_database(directory=str(tmp_path)) as path:
+        assert db.DB_PATH == path
+        conn = db.get_connection()
+        try:
+            conn.execute("INSERT INTO students (student_id, name) VALUES ('S1', 'S1')")
+            conn.commit()
+        finally:
+            conn.close()
+    assert db.DB_PATH == previous
+
+    with testdb.isolated_database(directory=str(tmp_path)) as other:
+        assert other != path
+        conn = db.get_connection()
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM students").fetchone()[0] == 0
+        finally:
+            conn.close()
@@ -0,0 +1,54 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def app_module(bus):
+    from backend import app as app_module
+
+    return app_module
+
+
+def _start_trip(conn, app_module):
+    conn.execute(
+        """
+        INSERT INTO bus_trips (driver_id, bus_number, trip_type, status, started_at, service_date)
+        VALUES ('D1', 'B1', 'TO_SCHOOL', 'ACTIVE', datetime('now'), date('now'))
+        """
+    )
+    conn.commit()
+    app_module._notify_trip_state_changed()
+
+
+def test_etag_and_304(app_module):
+    client = app_module.app.test_client()
+    first = client.get("/bus/B1/trip-state")
+    assert first.status_code == 200
+    assert first.json["active"] is False
+    assert client.get("/bus/B1/trip-state", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+
+def test_long_poll_wakes_on_trip_start(app_module, conn):
+    client = app_module.app.test_client()
+    etag = client.get("/bus/B1/trip-state").headers["ETag"]
+    timer = threading.Timer(0.2, _start_trip, (conn, app_module))
+    timer.start()
+    started = time.monotonic()
+    response = client.get("/bus/B1/trip-state?wait=10", headers={"If-None-Match": etag})
+    timer.join()
+    assert response.status_code == 200
+    assert response.json["active"] is True
+    assert time.monotonic() - started < 5
+
+
+def test_waiters_beyond_the_cap_answer_at_once(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "_trip_state_waiters", threading.BoundedSemaphore(1))
+    assert app_module._trip_state_waiters.acquire(blocking=False)
+    client = app_module.app.test_client()
+    etag = client.get("/bus/B1/trip-state").headers["ETag"]
+    started = time.monotonic()
+    response = client.get("/bus/B1/trip-state?wait=10", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert time.monotonic() - started < 1